@@ -0,0 +1,80 @@
+import argparse
+import filecmp
+import os
+import random
+import sys
+import tempfile
+import time
+
+import main as converter
+
+FIXTURE_VERSION = 1
+DEFAULT_ROWS = 1000000
+# Values cycled through the text column, including quoted commas, quotes and newlines
+TEXT_VALUES = ['plain text', 'comma, inside', 'with "quotes"', 'two\nlines', 'café']
+
+def create_fixture(fixture_dir, rows):
+    # Reuse a fixture written by an earlier run with the same settings
+    path = os.path.join(fixture_dir, f"bench_v{FIXTURE_VERSION}_{rows}.csv")
+    if os.path.exists(path):
+        return path
+    generator = random.Random(rows)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8', newline='') as csv_file:
+        csv_file.write('id,name,text,amount,flag\n')
+        for i in range(1, rows + 1):
+            text = TEXT_VALUES[i % len(TEXT_VALUES)].replace('"', '""')
+            csv_file.write(f'{i},name {i},"{text}",{generator.random() * 1000:.2f},{i % 2 == 0}\n')
+    os.replace(temp_path, path)
+    return path
+
+def run_conversion(csv_path, json_path, jobs, chunk_mb, output_format, types):
+    # Start from an empty output, so every run writes the same file
+    for suffix in ['', '.lock']:
+        if os.path.exists(json_path + suffix):
+            os.remove(json_path + suffix)
+    start = time.perf_counter()
+    message = converter.csv_to_json([csv_path], json_path, jobs=jobs, chunk_mb=chunk_mb, output_format=output_format, types=types, use_cache=False)
+    seconds = time.perf_counter() - start
+    if not message.endswith('successfully.'):
+        raise RuntimeError(message)
+    return seconds
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure how converting one large CSV file scales with --jobs.')
+    parser.add_argument('--rows', type=int, default=DEFAULT_ROWS, help='Number of rows in the synthetic CSV file.')
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1], help='Job counts to compare. The first one is the reference for the speedup.')
+    parser.add_argument('--chunk_mb', type=int, default=converter.DEFAULT_CHUNK_MB, help='Size in megabytes of the byte ranges parsed by each job.')
+    parser.add_argument('--format', choices=['json', 'ndjson'], default='json', help='Output format.')
+    parser.add_argument('--types', action='store_true', help='Convert with typed columns.')
+    parser.add_argument('--fixture_dir', help='Directory where the CSV file is kept and reused by later runs. Defaults to a temporary directory.')
+    args = parser.parse_args()
+
+    jobs_list = list(dict.fromkeys(args.jobs))
+    with tempfile.TemporaryDirectory() as work_dir:
+        fixture_dir = args.fixture_dir or work_dir
+        os.makedirs(fixture_dir, exist_ok=True)
+        print(f"Writing a CSV file with {args.rows} rows...")
+        csv_path = create_fixture(fixture_dir, args.rows)
+        size_mb = os.path.getsize(csv_path) / (1024 * 1024)
+        print(f"{csv_path}: {size_mb:.1f} MB\n")
+
+        print(f"{'jobs':>5} {'seconds':>9} {'rows/sec':>12} {'MB/sec':>8} {'speedup':>8}")
+        reference_path = None
+        reference_seconds = None
+        mismatched = []
+        for jobs in jobs_list:
+            json_path = os.path.join(work_dir, f"out_{jobs}.json")
+            seconds = run_conversion(csv_path, json_path, jobs, args.chunk_mb, args.format, args.types)
+            if reference_path is None:
+                reference_path, reference_seconds = json_path, seconds
+            elif not filecmp.cmp(reference_path, json_path, shallow=False):
+                mismatched.append(jobs)
+            print(f"{jobs:>5} {seconds:>9.2f} {args.rows / seconds:>12.0f} {size_mb / seconds:>8.1f} {reference_seconds / seconds:>7.2f}x")
+
+    if mismatched:
+        print(f"\nOutput differs from the run with {jobs_list[0]} jobs for jobs: {', '.join(map(str, mismatched))}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Typed columns for cvs2json.
+
+A schema maps column names to one of COLUMN_TYPES. It is inferred from the first rows of the CSV files, or read
+from a schema file. Records are then converted a batch at a time: the batch is turned into one list per column,
+every column is formatted as JSON in one go, and the rows are assembled from the formatted columns with a
+template, so no dict is built per row.
+
+Numbers and booleans are written as JSON numbers and booleans. Empty cells are written as null, except in
+string columns where they stay "". Dates stay ISO 8601 strings, as JSON has no date type. A value that doesn't
+fit the type of its column is written as a string, so nothing is lost when the sample missed it.
+"""
+import json
+import math
+import re
+from datetime import date
+from json.encoder import encode_basestring_ascii as encode_string
+
+from json_store import COMPACT_ENCODER, INDENT, format_json_value, get_item_separator
+
+COLUMN_TYPES = ['int', 'float', 'bool', 'date', 'null', 'string']
+DEFAULT_SAMPLE_ROWS = 1000
+
+# Integers without leading zeros, so codes such as 007 stay strings
+INT_PATTERN = r'-?(?:0|[1-9]\d*)'
+# Numbers as JSON writes them. Values matching this are copied to the output unchanged.
+JSON_NUMBER_PATTERN = r'-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?'
+# Numbers that are floats in a CSV file, such as +1.5, 2. or .5
+FLOAT_PATTERN = r'[-+]?(?:(?:0|[1-9]\d*)(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?'
+BOOL_PATTERN = r'true|false'
+DATE_PATTERN = r'\d{4}-\d{2}-\d{2}'
+
+INT_VALUE = re.compile(INT_PATTERN)
+JSON_NUMBER_VALUE = re.compile(JSON_NUMBER_PATTERN)
+FLOAT_VALUE = re.compile(FLOAT_PATTERN)
+BOOL_VALUE = re.compile(BOOL_PATTERN, re.IGNORECASE)
+DATE_VALUE = re.compile(DATE_PATTERN)
+
+def column_pattern(pattern, flags=0):
+    # Matches a whole column of values joined with newlines
+    return re.compile(f'(?:{pattern})(?:\n(?:{pattern}))*', flags)
+
+INT_COLUMN = column_pattern(INT_PATTERN)
+JSON_NUMBER_COLUMN = column_pattern(JSON_NUMBER_PATTERN)
+BOOL_COLUMN = column_pattern(BOOL_PATTERN, re.IGNORECASE)
+
+def is_date(value):
+    """
+    Check whether a value is an ISO 8601 date such as 2024-02-29.
+
+    Parameters:
+    - value (str): The value to check.
+
+    Returns:
+    - bool: True if the value is a valid date.
+    """
+    if not DATE_VALUE.fullmatch(value):
+        return False
+    try:
+        date.fromisoformat(value)
+    except ValueError:
+        return False
+    return True
+
+def infer_column_type(values):
+    """
+    Infer the type of a column from a sample of its values.
+
+    Parameters:
+    - values (iterable of str): Values of the column. Empty values are ignored.
+
+    Returns:
+    - str: The narrowest of COLUMN_TYPES that fits every value. 'null' if every value is empty.
+    """
+    values = [value for value in values if value]
+    if not values:
+        return 'null'
+    if all(INT_VALUE.fullmatch(value) for value in values):
+        return 'int'
+    if all(FLOAT_VALUE.fullmatch(value) and math.isfinite(float(value)) for value in values):
+        return 'float'
+    if all(BOOL_VALUE.fullmatch(value) for value in values):
+        return 'bool'
+    if all(is_date(value) for value in values):
+        return 'date'
+    return 'string'
+
+def infer_schema(header, records, schema=None):
+    """
+    Infer the types of the columns of a CSV file from a sample of its records.
+
+    Parameters:
+    - header (list of str): The column names from the header of the file.
+    - records (list of list): The sampled records, as parsed by csv.reader.
+    - schema (dict, optional): Types already known. Only the other columns are inferred.
+
+    Returns:
+    - dict: The schema, with a type for every column of the header.
+    """
+    schema = dict(schema or {})
+    # A repeated column name takes its values from its last position, as in a dict
+    last_positions = {col: position for position, col in enumerate(header)}
+    for col, position in last_positions.items():
+        if col not in schema:
+            schema[col] = infer_column_type(row[position] for row in records if position < len(row))
+    return schema
+
+def load_schema(schema_file_path):
+    """
+    Read a schema file, a JSON object mapping column names to types such as {"id": "int", "price": "float"}.
+
+    Parameters:
+    - schema_file_path (str): Path to the schema file.
+
+    Returns:
+    - dict: The schema.
+    """
+    with open(schema_file_path, 'r') as schema_file:
+        schema = json.load(schema_file)
+    if not isinstance(schema, dict):
+        raise ValueError(f"{schema_file_path} must hold a JSON object mapping column names to types.")
+    unknown = sorted(set(map(str, schema.values())) - set(COLUMN_TYPES))
+    if unknown:
+        raise ValueError(f"Unknown column types in {schema_file_path}: {', '.join(unknown)}. Use one of: {', '.join(COLUMN_TYPES)}.")
+    return schema
+
+def save_schema(schema_file_path, schema):
+    """
+    Write a schema to a file that can be passed back with --schema.
+
+    Parameters:
+    - schema_file_path (str): Path to the schema file.
+    - schema (dict): The schema to save.
+    """
+    with open(schema_file_path, 'w') as schema_file:
+        json.dump(schema, schema_file, indent=4)
+
+def encode_value(value, column_type):
+    """
+    Format one value of a typed column as JSON.
+
+    Parameters:
+    - value (str or None): The value, or None if the record is too short to have it.
+    - column_type (str): One of COLUMN_TYPES.
+
+    Returns:
+    - str: The JSON text of the value.
+    """
+    if value is None:
+        return 'null'
+    if column_type == 'string':
+        return encode_string(value)
+    if not value:
+        return 'null'
+    if column_type == 'int' and INT_VALUE.fullmatch(value):
+        return value
+    if column_type == 'float':
+        if JSON_NUMBER_VALUE.fullmatch(value):
+            return value
+        if FLOAT_VALUE.fullmatch(value) and math.isfinite(float(value)):
+            return repr(float(value))
+    if column_type == 'bool' and BOOL_VALUE.fullmatch(value):
+        return value.lower()
+    return encode_string(value)
+
+def encode_column(values, column_type):
+    """
+    Format a whole column as JSON.
+
+    Number and boolean columns are checked with one regular expression over all their values. When every value
+    fits, the values are copied as they are, which avoids a Python call per value.
+
+    Parameters:
+    - values (list of str or None): The values of the column.
+    - column_type (str): One of COLUMN_TYPES.
+
+    Returns:
+    - list of str: The JSON text of every value.
+    """
+    if None not in values:
+        if column_type == 'string':
+            return list(map(encode_string, values))
+        joined = '\n'.join(values)
+        # A value with a newline in it would look like two values
+        if joined.count('\n') == len(values) - 1:
+            if column_type == 'int' and INT_COLUMN.fullmatch(joined):
+                return list(values)
+            if column_type == 'float' and JSON_NUMBER_COLUMN.fullmatch(joined):
+                return list(values)
+            if column_type == 'bool' and BOOL_COLUMN.fullmatch(joined):
+                return joined.lower().split('\n')
+    return [encode_value(value, column_type) for value in values]
+
+def encode_typed_records(records, header, columns=None, schema=None, output_format='json', encoder=None):
+    """
+    Format CSV records as JSON objects with typed values.
+
+    Parameters:
+    - records (iterable of list): The records after the header, as parsed by csv.reader. Empty records are skipped.
+    - header (list of str): The column names from the header of the file.
+    - columns (list of str, optional): List of columns to include.
+    - schema (dict, optional): Type of each column. Columns not in the schema are strings.
+    - output_format (str, optional): 'json' for items of a JSON array, or 'ndjson' for JSON lines. Defaults to 'json'.
+    - encoder (dict, optional): The encoder from json_store.get_json_encoder. Only its compact setting matters here;
+      values are formatted by this module.
+
+    Returns:
+    - tuple: (text, count), the formatted records and their number, as taken by append_encoded_items or
+      append_encoded_lines.
+    """
+    schema = schema or {}
+    records = [row for row in records if row]
+    if not records:
+        return '', 0
+
+    width = len(header)
+    if columns:
+        names = columns
+        positions = [header.index(col) if col in header else None for col in columns]
+    else:
+        # A repeated column name keeps its first place and its last value, as in a dict
+        last_positions = {col: position for position, col in enumerate(header)}
+        names = list(last_positions)
+        positions = list(last_positions.values())
+    if set(map(len, records)) == {width}:
+        # Every record has every field; transpose the batch in one go
+        values_by_position = list(zip(*records))
+    else:
+        values_by_position = [[row[position] if position < len(row) else None for row in records] for position in range(width)]
+    missing = [None] * len(records)
+    arrays = [encode_column(list(values_by_position[position]) if position is not None else missing, schema.get(col, 'string'))
+              for col, position in zip(names, positions)]
+
+    # One template per batch; each row fills it with its formatted values
+    compact = bool(encoder and encoder['compact'])
+    if compact:
+        fields = [encode_string(col).replace('%', '%%') + ':%s' for col in names]
+        template = '{' + ','.join(fields) + '}'
+    elif output_format == 'ndjson':
+        fields = [encode_string(col).replace('%', '%%') + ': %s' for col in names]
+        template = '{' + ', '.join(fields) + '}'
+    elif names:
+        padding = '\n' + INDENT * 3
+        fields = [padding + encode_string(col).replace('%', '%%') + ': %s' for col in names]
+        template = '{' + ','.join(fields) + '\n' + INDENT * 2 + '}'
+    else:
+        template = '{}'
+    items = [template % values for values in zip(*arrays)] if arrays else [template] * len(records)
+
+    # Extra fields go under null, as csv.DictReader puts them under None
+    if not columns:
+        for number, row in enumerate(records):
+            if len(row) > width:
+                extra = row[width:]
+                if compact:
+                    items[number] = items[number][:-1] + (',' if names else '') + '"null":' + COMPACT_ENCODER.encode(extra) + '}'
+                elif output_format == 'ndjson':
+                    items[number] = items[number][:-1] + (', ' if names else '') + '"null": ' + json.dumps(extra) + '}'
+                else:
+                    closing = '\n' + INDENT * 2 + '}'
+                    body = items[number][:-len(closing)] if names else '{'
+                    items[number] = body + (',' if names else '') + '\n' + INDENT * 3 + '"null": ' + format_json_value(extra, 3) + closing
+
+    if output_format == 'ndjson':
+        return ''.join(item + '\n' for item in items), len(items)
+    return get_item_separator(encoder).join(items), len(items)
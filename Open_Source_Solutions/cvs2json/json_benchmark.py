@@ -0,0 +1,79 @@
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+from json_store import append_json_items, append_json_lines, get_available_json_backends, get_json_encoder
+
+DEFAULT_ITEMS = 200000
+# Output modes compared for every backend: (name, format, compact)
+MODES = [('indented', 'json', False), ('compact', 'json', True), ('ndjson', 'ndjson', False), ('ndjson compact', 'ndjson', True)]
+
+def create_dataset(kind, items):
+    # The same items on every run, so results can be compared between machines and versions
+    generator = random.Random(items)
+    if kind == 'csv':
+        # Rows as cvs2json reads them: every value a string
+        return [{'id': str(i), 'name': f'name {i}', 'city': generator.choice(['Paris', 'Zürich', 'Kraków']),
+                 'amount': f'{generator.random() * 1000:.2f}', 'flag': str(i % 2 == 0)} for i in range(items)]
+    if kind == 'typed':
+        # Rows as exl2json reads them: numbers, booleans and empty cells
+        return [{'id': i, 'name': f'name {i}', 'amount': generator.random() * 1000, 'flag': i % 2 == 0, 'note': None} for i in range(items)]
+    # Records as xml2json reads them with a record path: attributes, nested and repeated elements
+    return [{'@id': str(i), 'title': f'item {i}', 'tags': {'tag': ['a', 'b', 'c']},
+             'price': {'@currency': 'EUR', '#text': f'{generator.random() * 100:.2f}'}} for i in range(items)]
+
+def write_dataset(data, path, output_format, encoder):
+    for suffix in ['', '.lock']:
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    start = time.perf_counter()
+    if output_format == 'ndjson':
+        append_json_lines(path, data, encoder)
+    else:
+        append_json_items(path, 'root', data, encoder)
+    return time.perf_counter() - start
+
+def read_dataset(path, output_format):
+    with open(path, 'r') as json_file:
+        if output_format == 'ndjson':
+            return [json.loads(line) for line in json_file]
+        return json.load(json_file)['root']
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the JSON backends on a fixed dataset.')
+    parser.add_argument('--items', type=int, default=DEFAULT_ITEMS, help='Number of items in the dataset.')
+    parser.add_argument('--dataset', choices=['csv', 'typed', 'nested'], nargs='+', default=['csv', 'typed', 'nested'], help='Datasets to write.')
+    parser.add_argument('--backends', nargs='+', default=get_available_json_backends()[::-1], help='Backends to compare. The first one is the reference for the speedup. Defaults to every installed one, the standard library first.')
+    args = parser.parse_args()
+
+    failed = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for kind in args.dataset:
+            data = create_dataset(kind, args.items)
+            # The values as they read back from JSON, such as the None key of an extra CSV field as "null"
+            expected = json.loads(json.dumps(data))
+            print(f"\n{kind}: {args.items} items")
+            print(f"{'mode':<16} {'backend':<8} {'seconds':>8} {'items/sec':>11} {'MB':>7} {'MB/sec':>7} {'speedup':>8}")
+            for mode, output_format, compact in MODES:
+                reference_seconds = None
+                for backend in args.backends:
+                    encoder = get_json_encoder(backend, compact)
+                    path = os.path.join(work_dir, f"{kind}_{backend}.json")
+                    seconds = write_dataset(data, path, output_format, encoder)
+                    size_mb = os.path.getsize(path) / (1024 * 1024)
+                    if reference_seconds is None:
+                        reference_seconds = seconds
+                    if read_dataset(path, output_format) != expected:
+                        failed.append(f"{kind} {mode} {backend}")
+                    print(f"{mode:<16} {backend:<8} {seconds:>8.2f} {args.items / seconds:>11.0f} {size_mb:>7.1f} {size_mb / seconds:>7.1f} {reference_seconds / seconds:>7.2f}x")
+
+    if failed:
+        print(f"\nOutput doesn't read back as the dataset for: {', '.join(failed)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,73 +1,413 @@
-
 import csv
-import json
-import argparse
+import io
 import os
+import sqlite3
+import argparse
+from functools import partial
+from itertools import islice
+from conversion_cache import DEFAULT_CACHE_MB, close_cache, iter_cached_files, open_cache
+from csv_schema import DEFAULT_SAMPLE_ROWS, encode_typed_records, infer_schema, load_schema, save_schema
+from file_batch import describe_file_errors, expand_input_paths, iter_converted_files, map_in_order
+from json_store import JSON_BACKENDS, append_encoded_items, append_encoded_lines, encode_chunks, format_json_items, format_json_lines, get_item_separator, get_json_encoder
+
+# Files picked from input directories
+CSV_EXTENSIONS = ['.csv', '.tsv']
+# Size of the byte ranges CSV files are split into when they are parsed with several jobs
+DEFAULT_CHUNK_MB = 32
+# Bytes read at a time while looking for record boundaries
+SCAN_BLOCK_SIZE = 16 * 1024 * 1024
+# Records converted at a time in typed mode
+TYPED_BATCH_ROWS = 10000
 
-def csv_to_json(csv_file_paths, json_file_path, delimiter=',', encoding='utf-8', columns=None, key=None):
+def read_csv_rows(csv_file_path, delimiter=',', encoding='utf-8', columns=None):
+    """
+    Read a CSV file one row at a time.
+
+    Parameters:
+    - csv_file_path (str): Path to the CSV file to read.
+    - delimiter (str, optional): The delimiter used in the CSV file. Defaults to ','.
+    - encoding (str, optional): The encoding used in the CSV file. Defaults to 'utf-8'.
+    - columns (list of str, optional): List of columns to include. Only these fields are picked out of each row.
+
+    Yields:
+    - dict: One row of the CSV file, keyed by column name.
+    """
+    with open(csv_file_path, 'r', encoding=encoding, newline='') as csv_file:
+        if not columns:
+            yield from csv.DictReader(csv_file, delimiter=delimiter)
+            return
+
+        csv_reader = csv.reader(csv_file, delimiter=delimiter)
+        header = next(csv_reader, [])
+        yield from records_to_rows(csv_reader, header, columns)
+
+def records_to_rows(records, header, columns=None):
+    """
+    Key parsed CSV records by column name, the way csv.DictReader does.
+
+    Parameters:
+    - records (iterable of list): The records after the header, as parsed by csv.reader.
+    - header (list of str): The column names from the header of the file.
+    - columns (list of str, optional): List of columns to include. Only these fields are picked out of each record.
+
+    Yields:
+    - dict: One row for every record that is not empty.
+    """
+    if columns:
+        # Position of each wanted column, or None if the file doesn't have it
+        positions = [(col, header.index(col) if col in header else None) for col in columns]
+        for row in records:
+            if not row:
+                continue
+            yield {col: row[position] if position is not None and position < len(row) else None for col, position in positions}
+        return
+
+    width = len(header)
+    for row in records:
+        if not row:
+            continue
+        item = dict(zip(header, row))
+        # Extra fields go under None and missing fields are None, as in csv.DictReader
+        if len(row) > width:
+            item[None] = row[width:]
+        elif len(row) < width:
+            for col in header[len(row):]:
+                item[col] = None
+        yield item
+
+def encode_csv_file(csv_file_path, delimiter=',', encoding='utf-8', columns=None, output_format='json', encoder=None):
+    """
+    Read a CSV file one row at a time and format the rows in chunks, with every value as a string.
+
+    Parameters:
+    - csv_file_path (str): Path to the CSV file to read.
+    - delimiter (str, optional): The delimiter used in the CSV file. Defaults to ','.
+    - encoding (str, optional): The encoding used in the CSV file. Defaults to 'utf-8'.
+    - columns (list of str, optional): List of columns to include.
+    - output_format (str, optional): 'json' or 'ndjson'. Defaults to 'json'.
+    - encoder (dict, optional): The JSON encoder from get_json_encoder.
+
+    Yields:
+    - tuple: (text, count) for every chunk of rows, as taken by append_encoded_items or append_encoded_lines.
+    """
+    yield from encode_chunks(read_csv_rows(csv_file_path, delimiter, encoding, columns), output_format == 'ndjson', encoder)
+
+def infer_csv_schema(csv_file_paths, delimiter=',', encoding='utf-8', sample_rows=DEFAULT_SAMPLE_ROWS):
+    """
+    Infer the column types of CSV files from their first rows.
+
+    Parameters:
+    - csv_file_paths (list of str): Paths to the CSV files.
+    - delimiter (str, optional): The delimiter used in the CSV files. Defaults to ','.
+    - encoding (str, optional): The encoding used in the CSV files. Defaults to 'utf-8'.
+    - sample_rows (int, optional): Number of rows read from each file. Defaults to DEFAULT_SAMPLE_ROWS.
+
+    Returns:
+    - dict: Type of every column. A column found in several files keeps the type inferred from the first one.
+    """
+    schema = {}
+    for csv_file_path in csv_file_paths:
+        try:
+            with open(csv_file_path, 'r', encoding=encoding, newline='') as csv_file:
+                csv_reader = csv.reader(csv_file, delimiter=delimiter)
+                header = next(csv_reader, [])
+                sample = list(islice(csv_reader, sample_rows))
+        except (OSError, UnicodeDecodeError, csv.Error):
+            continue  # Reported when the file is converted
+        schema = infer_schema(header, sample, schema)
+    return schema
+
+def encode_typed_csv_file(csv_file_path, delimiter=',', encoding='utf-8', columns=None, schema=None, output_format='json', encoder=None):
+    """
+    Read a CSV file in batches of records and format them with typed values.
+
+    Parameters:
+    - csv_file_path (str): Path to the CSV file to read.
+    - delimiter (str, optional): The delimiter used in the CSV file. Defaults to ','.
+    - encoding (str, optional): The encoding used in the CSV file. Defaults to 'utf-8'.
+    - columns (list of str, optional): List of columns to include.
+    - schema (dict, optional): Type of each column.
+    - output_format (str, optional): 'json' or 'ndjson'. Defaults to 'json'.
+    - encoder (dict, optional): The JSON encoder from get_json_encoder.
+
+    Yields:
+    - tuple: (text, count) for every batch of records, as taken by append_encoded_items or append_encoded_lines.
+    """
+    with open(csv_file_path, 'r', encoding=encoding, newline='') as csv_file:
+        csv_reader = csv.reader(csv_file, delimiter=delimiter)
+        header = next(csv_reader, [])
+        while True:
+            batch = list(islice(csv_reader, TYPED_BATCH_ROWS))
+            if not batch:
+                break
+            yield encode_typed_records(batch, header, columns, schema, output_format, encoder)
+
+def can_split_csv(encoding):
+    """
+    Check whether files in an encoding can be split into byte ranges at newlines.
+
+    Parameters:
+    - encoding (str): The encoding used in the CSV files.
+
+    Returns:
+    - bool: True if quotes and newlines are written as single ASCII bytes, as in UTF-8 and Latin-1.
+    """
+    try:
+        return '"\n'.encode(encoding) == b'"\n'
+    except LookupError:
+        return False
+
+def find_record_boundaries(csv_file_path, chunk_size):
+    """
+    Find byte offsets that split a CSV file into ranges of whole records.
+
+    A newline ends a record only if it is outside quotes. Quotes inside quoted fields are doubled, so a newline is
+    outside quotes when an even number of quote characters come before it. The file is read once, and quotes are
+    counted block by block.
+
+    Parameters:
+    - csv_file_path (str): Path to the CSV file.
+    - chunk_size (int): Size in bytes each range grows to before it is cut at the next record boundary.
+
+    Yields:
+    - int: The end of the header record first, then the end of every range. The last offset is the size of the file.
+    """
+    size = os.path.getsize(csv_file_path)
+    target = 0
+    last = None
+    with open(csv_file_path, 'rb') as csv_file:
+        block_start = 0
+        quotes = 0
+        while target < size:
+            block = csv_file.read(SCAN_BLOCK_SIZE)
+            if not block:
+                break
+            counted = 0
+            position = max(target - block_start, 0)
+            while position < len(block):
+                newline = block.find(b'\n', position)
+                if newline < 0:
+                    break
+                quotes += block.count(b'"', counted, newline)
+                counted = newline
+                position = newline + 1
+                if quotes % 2 == 0:
+                    last = block_start + position
+                    yield last
+                    target = last + chunk_size
+                    position = max(target - block_start, position)
+            quotes += block.count(b'"', counted)
+            block_start += len(block)
+    if last != size:
+        yield size
+
+def plan_csv_ranges(csv_file_paths, delimiter=',', encoding='utf-8', chunk_size=DEFAULT_CHUNK_MB * 1024 * 1024, errors=None):
+    """
+    Split CSV files into byte ranges of whole records, read their headers, and yield the ranges in order.
+
+    Parameters:
+    - csv_file_paths (list of str): Paths to the CSV files.
+    - delimiter (str, optional): The delimiter used in the CSV files. Defaults to ','.
+    - encoding (str, optional): The encoding used in the CSV files. Defaults to 'utf-8'.
+    - chunk_size (int, optional): Size in bytes of each range. Defaults to DEFAULT_CHUNK_MB megabytes.
+    - errors (list, optional): (path, message) is appended to this list for every file that can't be split.
+
+    Yields:
+    - tuple: (csv_file_path, header, start, end) for every range after the header of a file.
+    """
+    errors = errors if errors is not None else []
+    for csv_file_path in csv_file_paths:
+        try:
+            boundaries = find_record_boundaries(csv_file_path, chunk_size)
+            start = next(boundaries)
+            with open(csv_file_path, 'rb') as csv_file:
+                header_text = csv_file.read(start).decode(encoding)
+            header = next(csv.reader(io.StringIO(header_text, newline=''), delimiter=delimiter), [])
+            for end in boundaries:
+                yield csv_file_path, header, start, end
+                start = end
+        except Exception as e:
+            errors.append((csv_file_path, str(e)))
+
+def encode_csv_range(csv_range, delimiter=',', encoding='utf-8', columns=None, output_format='json', schema=None, encoder=None):
+    """
+    Parse one byte range of a CSV file and format its rows for the output, in a worker process.
+
+    Parameters:
+    - csv_range (tuple): (csv_file_path, header, start, end) from plan_csv_ranges.
+    - delimiter (str, optional): The delimiter used in the CSV file. Defaults to ','.
+    - encoding (str, optional): The encoding used in the CSV file. Defaults to 'utf-8'.
+    - columns (list of str, optional): List of columns to include.
+    - output_format (str, optional): 'json' or 'ndjson'. Defaults to 'json'.
+    - schema (dict, optional): Type of each column. Without a schema every value is written as a string.
+    - encoder (dict, optional): The JSON encoder from get_json_encoder.
+
+    Returns:
+    - tuple: (text, count), the formatted rows and their number, as taken by append_encoded_items or
+      append_encoded_lines.
+    """
+    csv_file_path, header, start, end = csv_range
+    with open(csv_file_path, 'rb') as csv_file:
+        csv_file.seek(start)
+        text = csv_file.read(end - start).decode(encoding)
+    records = csv.reader(io.StringIO(text, newline=''), delimiter=delimiter)
+    if schema is not None:
+        return encode_typed_records(records, header, columns, schema, output_format, encoder)
+    rows = list(records_to_rows(records, header, columns))
+    if output_format == 'ndjson':
+        return format_json_lines(rows, encoder), len(rows)
+    return format_json_items(rows, 2, encoder), len(rows)
+
+def iter_encoded_csv_ranges(csv_file_paths, delimiter=',', encoding='utf-8', columns=None, output_format='json', jobs=2, chunk_size=DEFAULT_CHUNK_MB * 1024 * 1024, errors=None, schema=None,
+                            encoder=None):
+    """
+    Parse CSV files in byte ranges in a process pool and yield the formatted ranges in input order.
+
+    Parameters:
+    - csv_file_paths (list of str): Paths to the CSV files.
+    - delimiter (str, optional): The delimiter used in the CSV files. Defaults to ','.
+    - encoding (str, optional): The encoding used in the CSV files. Defaults to 'utf-8'.
+    - columns (list of str, optional): List of columns to include.
+    - output_format (str, optional): 'json' or 'ndjson'. Defaults to 'json'.
+    - jobs (int, optional): Number of worker processes. Defaults to 2.
+    - chunk_size (int, optional): Size in bytes of each range. Defaults to DEFAULT_CHUNK_MB megabytes.
+    - errors (list, optional): (path, message) is appended to this list for every file that fails.
+    - schema (dict, optional): Type of each column. Without a schema every value is written as a string.
+    - encoder (dict, optional): The JSON encoder from get_json_encoder.
+
+    Yields:
+    - tuple: (csv_file_path, (text, count)) for every range that could be converted.
+    """
+    errors = errors if errors is not None else []
+    encode_range = partial(encode_csv_range, delimiter=delimiter, encoding=encoding, columns=columns, output_format=output_format, schema=schema, encoder=encoder)
+    ranges = plan_csv_ranges(csv_file_paths, delimiter, encoding, chunk_size, errors)
+    for (csv_file_path, header, start, end), chunk, error in map_in_order(encode_range, ranges, jobs):
+        if error is not None:
+            # Report a file once, at the first range that failed
+            if all(csv_file_path != path for path, message in errors):
+                errors.append((csv_file_path, f"{error} (bytes {start}-{end})"))
+            continue
+        yield csv_file_path, chunk
+
+def csv_to_json(csv_file_paths, json_file_path, delimiter=',', encoding='utf-8', columns=None, key=None, *, output_format='json', jobs=1, chunk_mb=DEFAULT_CHUNK_MB,
+                types=False, schema_file=None, save_schema_file=None, sample_rows=DEFAULT_SAMPLE_ROWS, use_cache=False, cache_dir=None, cache_mb=DEFAULT_CACHE_MB,
+                compact=False, json_backend=None):
     """
     Convert one or more CSV files to a JSON file.
-    
+
+    Rows are appended to the JSON file as they are read, so memory use does not grow with the size of the CSV files
+    or of the JSON file. With more than one job the CSV files are split into byte ranges of whole records, which are
+    parsed and formatted in parallel and appended in input order, so a single large file also uses several cores.
+
+    By default every value is written as a string. With types, or with a schema file, numbers, booleans and empty
+    cells are written as JSON numbers, booleans and nulls; see csv_schema.
+
+    With use_cache, the output of every CSV file is kept in a conversion cache. A file converted before with the same
+    options is copied from the cache instead of being parsed again; see conversion_cache.
+
     Parameters:
-    - csv_file_paths (list of str): Paths to the CSV files to convert.
+    - csv_file_paths (list of str): Paths to the CSV files to convert. Directories and glob patterns are expanded.
     - json_file_path (str): Path to the JSON file where the data will be saved.
     - delimiter (str, optional): The delimiter used in the CSV files. Defaults to ','.
     - encoding (str, optional): The encoding used in the CSV files. Defaults to 'utf-8'.
     - columns (list of str, optional): List of columns to include in the JSON output.
     - key (str, optional): The key under which the CSV data will be saved in the JSON file.
-    
+    - output_format (str, optional): 'json' for one JSON document, or 'ndjson' to append one JSON object per line. Defaults to 'json'.
+    - jobs (int, optional): Number of worker processes parsing the CSV files. Defaults to 1.
+    - chunk_mb (int, optional): Size in megabytes of the byte ranges parsed by each job. Defaults to DEFAULT_CHUNK_MB.
+    - types (bool, optional): Write typed values, with column types inferred from the first rows of each file. Defaults to False.
+    - schema_file (str, optional): Path to a schema file with the column types. Types are then not inferred.
+    - save_schema_file (str, optional): Path where the column types are saved, to be reused as a schema file.
+    - sample_rows (int, optional): Number of rows of each file used to infer the column types. Defaults to DEFAULT_SAMPLE_ROWS.
+    - use_cache (bool, optional): Take unchanged files from the conversion cache and save the others to it. Defaults to False.
+    - cache_dir (str, optional): Directory of the conversion cache. Defaults to get_default_cache_dir('cvs2json').
+    - cache_mb (int, optional): Size limit of the conversion cache in megabytes. Defaults to DEFAULT_CACHE_MB.
+    - compact (bool, optional): Write the JSON without indentation or spaces. Defaults to False.
+    - json_backend (str, optional): 'orjson', 'ujson' or 'json'. Defaults to the fastest one installed.
+
     Returns:
     - str: A message indicating the success or failure of the operation.
     """
-    
-    # Existing JSON data
-    existing_data = {}
-    if os.path.exists(json_file_path):
-        with open(json_file_path, 'r') as json_file:
-            existing_data = json.load(json_file)
-    
-    if key:
-        nested_data = existing_data.get(key, [])
-    else:
-        nested_data = existing_data.get('root', [])
-    
-    for csv_file_path in csv_file_paths:
+    try:
+        encoder = get_json_encoder(json_backend, compact)
+    except ValueError as e:
+        return str(e)
+    paths = expand_input_paths(csv_file_paths, CSV_EXTENSIONS)
+    schema = None
+    if schema_file:
         try:
-            # Read CSV file
-            with open(csv_file_path, 'r', encoding=encoding) as csv_file:
-                csv_reader = csv.DictReader(csv_file, delimiter=delimiter)
-                data = [row for row in csv_reader]
-                
-                # Filter columns if specified
-                if columns:
-                    filtered_data = [{col: row.get(col, None) for col in columns} for row in data]
-                    data = filtered_data
-                
-            nested_data.extend(data)
-        except Exception as e:
-            print(f"An error occurred while converting {csv_file_path}: {e}")
-    
-    # Update existing JSON data
-    if key:
-        existing_data[key] = nested_data
+            schema = load_schema(schema_file)
+        except (OSError, ValueError) as e:
+            return f"Could not read the schema file: {e}"
+    elif types:
+        schema = infer_csv_schema(paths, delimiter, encoding, sample_rows)
+    if schema is not None and save_schema_file:
+        save_schema(save_schema_file, schema)
+
+    errors = []
+    if jobs > 1 and can_split_csv(encoding):
+        convert_paths = partial(iter_encoded_csv_ranges, delimiter=delimiter, encoding=encoding, columns=columns, output_format=output_format, jobs=jobs,
+                                chunk_size=chunk_mb * 1024 * 1024, errors=errors, schema=schema, encoder=encoder)
+    elif schema is not None:
+        encode_file = partial(encode_typed_csv_file, delimiter=delimiter, encoding=encoding, columns=columns, schema=schema, output_format=output_format, encoder=encoder)
+        convert_paths = partial(iter_converted_files, convert_file=encode_file, jobs=jobs, errors=errors, with_paths=True)
+    else:
+        # One job, or an encoding such as UTF-16 that can't be split at newline bytes
+        encode_file = partial(encode_csv_file, delimiter=delimiter, encoding=encoding, columns=columns, output_format=output_format, encoder=encoder)
+        convert_paths = partial(iter_converted_files, convert_file=encode_file, jobs=jobs, errors=errors, with_paths=True)
+
+    try:
+        cache = open_cache('cvs2json', cache_dir, cache_mb) if use_cache else None
+    except (OSError, sqlite3.Error) as e:
+        return f"Could not open the conversion cache: {e}"
+    try:
+        # The options that change the output of a file; jobs and chunk_mb don't
+        options = {'delimiter': delimiter, 'encoding': encoding, 'columns': columns, 'format': output_format, 'schema': schema, 'encoder': encoder}
+        separator = '' if output_format == 'ndjson' else get_item_separator(encoder)
+        chunks = iter_cached_files(cache, paths, options, convert_paths, separator, errors)
+        if output_format == 'ndjson':
+            append_encoded_lines(json_file_path, chunks)
+        else:
+            append_encoded_items(json_file_path, key if key else 'root', chunks, encoder)
+    finally:
+        close_cache(cache)
+
+    if output_format == 'ndjson':
+        message = "CSV files converted and appended to NDJSON successfully."
     else:
-        existing_data['root'] = nested_data
-    
-    # Write updated data to JSON file
-    with open(json_file_path, 'w') as json_file:
-        json.dump(existing_data, json_file, indent=4)
-
-    return "CSV files converted and appended to JSON successfully."
-
-# Command-line arguments
-parser = argparse.ArgumentParser(description='Convert CSV files to JSON.')
-parser.add_argument('--csv_files', type=str, nargs='+', required=True, help='The file paths to the CSV files you want to convert.')
-parser.add_argument('--json_file', type=str, required=True, help='The file path where the JSON data will be saved.')
-parser.add_argument('--delimiter', type=str, default=',', help='The delimiter used in the CSV files. Optional.')
-parser.add_argument('--encoding', type=str, default='utf-8', help='The encoding used in the CSV files. Optional.')
-parser.add_argument('--columns', type=str, nargs='*', help='List of columns to include in the JSON. Optional.')
-parser.add_argument('--key', type=str, help='The key in the JSON file where the CSV data will be saved. Optional.')
-args = parser.parse_args()
-
-message = csv_to_json(args.csv_files, args.json_file, args.delimiter, args.encoding, args.columns, args.key)
-print(message)
+        message = "CSV files converted and appended to JSON successfully."
+
+    if errors:
+        return describe_file_errors(errors, len(paths), 'CSV')
+    return message
+
+def main():
+    # Command-line arguments
+    parser = argparse.ArgumentParser(description='Convert CSV files to JSON.')
+    parser.add_argument('--csv_files', type=str, nargs='+', required=True, help='The file paths to the CSV files you want to convert. Directories and glob patterns such as "drops/*.csv" are expanded.')
+    parser.add_argument('--json_file', type=str, required=True, help='The file path where the JSON data will be saved.')
+    parser.add_argument('--delimiter', type=str, default=',', help='The delimiter used in the CSV files. Optional.')
+    parser.add_argument('--encoding', type=str, default='utf-8', help='The encoding used in the CSV files. Optional.')
+    parser.add_argument('--columns', type=str, nargs='*', help='List of columns to include in the JSON. Optional.')
+    parser.add_argument('--key', type=str, help='The key in the JSON file where the CSV data will be saved. Optional.')
+    parser.add_argument('--format', type=str, choices=['json', 'ndjson'], default='json', help='Write one JSON document, or append one JSON object per line (the key is not used). Optional.')
+    parser.add_argument('--jobs', type=int, default=1, help='Number of worker processes. Large CSV files are split into byte ranges parsed in parallel. Optional.')
+    parser.add_argument('--chunk_mb', type=int, default=DEFAULT_CHUNK_MB, help='Size in megabytes of the byte ranges parsed by each job. Optional.')
+    parser.add_argument('--types', action='store_true', help='Write numbers, booleans and empty cells as JSON numbers, booleans and nulls, with column types inferred from the first rows. Optional.')
+    parser.add_argument('--schema', type=str, help='A JSON file mapping column names to types (int, float, bool, date, null or string), used instead of inferring them. Implies --types. Optional.')
+    parser.add_argument('--save_schema', type=str, help='Save the column types to this file, to be passed to --schema for later files of the same feed. Optional.')
+    parser.add_argument('--sample_rows', type=int, default=DEFAULT_SAMPLE_ROWS, help='Number of rows of each file used to infer the column types. Optional.')
+    parser.add_argument('--cache', action='store_true', help='Keep the output of every file in a conversion cache, and copy unchanged files from it instead of converting them again. Optional.')
+    parser.add_argument('--cache_dir', type=str, help='With --cache: directory of the conversion cache. Defaults to ~/.cache/opendata_dynamics/cvs2json, or $OPENDATA_CACHE_DIR/cvs2json. Optional.')
+    parser.add_argument('--cache_mb', type=int, default=DEFAULT_CACHE_MB, help='With --cache: size limit of the conversion cache in megabytes, 256 by default. The least recently used outputs are removed past it. Optional.')
+    parser.add_argument('--compact', action='store_true', help='Write the JSON without indentation or spaces. Optional.')
+    parser.add_argument('--json_backend', type=str, choices=['auto'] + JSON_BACKENDS, default='auto', help='JSON encoder. auto uses orjson or ujson when installed, and the standard library otherwise. Optional.')
+    args = parser.parse_args()
+
+    message = csv_to_json(args.csv_files, args.json_file, args.delimiter, args.encoding, args.columns, args.key, output_format=args.format, jobs=args.jobs,
+                          chunk_mb=args.chunk_mb, types=args.types, schema_file=args.schema, save_schema_file=args.save_schema, sample_rows=args.sample_rows,
+                          use_cache=args.cache, cache_dir=args.cache_dir, cache_mb=args.cache_mb, compact=args.compact, json_backend=args.json_backend)
+    print(message)
+
+if __name__ == "__main__":
+    main()
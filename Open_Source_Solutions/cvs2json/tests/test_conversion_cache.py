@@ -0,0 +1,103 @@
+import os
+
+from conversion_cache import close_cache, iter_cached_files, open_cache
+from json_store import CHECKPOINT, ROLLBACK
+
+OPTIONS = {'format': 'json'}
+
+class Converter:
+    # Stands in for the convert_paths of a converter: one chunk per line of every file
+    def __init__(self, failing=()):
+        self.converted = []
+        self.failing = failing
+        self.errors = []
+
+    def __call__(self, paths):
+        for path in paths:
+            self.converted.append(os.path.basename(path))
+            with open(path) as input_file:
+                lines = input_file.read().splitlines()
+            for number, line in enumerate(lines):
+                if os.path.basename(path) in self.failing and number == 1:
+                    self.errors.append((path, 'bad line'))
+                    break
+                yield path, (line, 1)
+
+def convert(cache, paths, converter):
+    # Cached chunks come back joined into frames, so the output is compared as text
+    chunks = list(iter_cached_files(cache, paths, OPTIONS, converter, ',', converter.errors))
+    return ','.join(text for text, count in chunks if count), chunks
+
+def write_input(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+def test_unchanged_files_come_from_the_cache(tmp_path):
+    paths = [write_input(tmp_path, 'a.txt', 'a1\na2\n'), write_input(tmp_path, 'b.txt', 'b1\n')]
+    cache = open_cache('test', str(tmp_path / 'cache'))
+    converter = Converter()
+    assert convert(cache, paths, converter)[0] == 'a1,a2,b1'
+    assert converter.converted == ['a.txt', 'b.txt']
+
+    converter = Converter()
+    assert convert(cache, paths, converter)[0] == 'a1,a2,b1'
+    assert converter.converted == []
+    assert cache['hits'] == 2
+    close_cache(cache)
+
+def test_changed_file_is_converted_again(tmp_path):
+    path = write_input(tmp_path, 'a.txt', 'a1\n')
+    cache = open_cache('test', str(tmp_path / 'cache'))
+    convert(cache, [path], Converter())
+    write_input(tmp_path, 'a.txt', 'a1\nnew\n')
+    converter = Converter()
+    assert convert(cache, [path], converter)[0] == 'a1,new'
+    assert converter.converted == ['a.txt']
+
+    # A copy with the same content is found by its hash
+    copy = write_input(tmp_path, 'copy.txt', 'a1\nnew\n')
+    converter = Converter()
+    assert convert(cache, [copy], converter)[0] == 'a1,new'
+    assert converter.converted == []
+    close_cache(cache)
+
+def test_other_options_miss(tmp_path):
+    path = write_input(tmp_path, 'a.txt', 'a1\n')
+    cache = open_cache('test', str(tmp_path / 'cache'))
+    convert(cache, [path], Converter())
+    converter = Converter()
+    list(iter_cached_files(cache, [path], {'format': 'ndjson'}, converter))
+    assert converter.converted == ['a.txt']
+    close_cache(cache)
+
+def test_failed_file_is_rolled_back_and_not_cached(tmp_path):
+    paths = [write_input(tmp_path, 'good.txt', 'g1\n'), write_input(tmp_path, 'bad.txt', 'b1\nb2\n')]
+    for cache in [None, open_cache('test', str(tmp_path / 'cache'))]:
+        converter = Converter(failing=['bad.txt'])
+        texts, chunks = convert(cache, paths, converter)
+        assert chunks == [CHECKPOINT, ('g1', 1), CHECKPOINT, ('b1', 1), ROLLBACK]
+        close_cache(cache)
+
+    cache = open_cache('test', str(tmp_path / 'cache'))
+    converter = Converter()
+    convert(cache, paths, converter)
+    assert converter.converted == ['bad.txt']
+    close_cache(cache)
+
+def test_least_recently_used_blobs_are_evicted(tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    old = write_input(tmp_path, 'old.txt', 'x' * 100 + '\n')
+    new = write_input(tmp_path, 'new.txt', 'y' * 100 + '\n')
+    cache = open_cache('test', cache_dir)
+    convert(cache, [old], Converter())
+    close_cache(cache)
+
+    cache = open_cache('test', cache_dir)
+    cache['max_bytes'] = 150
+    convert(cache, [new], Converter())
+    # The new blob is kept, the older one removed to stay under the limit
+    converter = Converter()
+    convert(cache, [old, new], converter)
+    assert converter.converted == ['old.txt']
+    close_cache(cache)
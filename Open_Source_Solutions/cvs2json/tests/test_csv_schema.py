@@ -0,0 +1,22 @@
+from csv_schema import encode_column, encode_value
+
+def test_encode_column_copies_valid_numbers():
+    assert encode_column(['1', '-20', '0'], 'int') == ['1', '-20', '0']
+    assert encode_column(['1.5', '2e3', '-0.25'], 'float') == ['1.5', '2e3', '-0.25']
+    assert encode_column(['True', 'false'], 'bool') == ['true', 'false']
+    assert encode_column(['a"b', 'ü'], 'string') == ['"a\\"b"', '"\\u00fc"']
+
+def test_encode_column_falls_back_per_value():
+    # Empty cells, short records and values that don't fit the type
+    assert encode_column(['1', '', None, 'x', '007'], 'int') == ['1', 'null', 'null', '"x"', '"007"']
+    assert encode_column(['+1.5', '.5', 'nan'], 'float') == ['1.5', '0.5', '"nan"']
+    assert encode_column(['yes', 'TRUE'], 'bool') == ['"yes"', 'true']
+
+def test_encode_column_value_with_newline():
+    # Joined with newlines, "1\n2" would look like two valid values
+    assert encode_column(['1\n2', '3'], 'int') == ['"1\\n2"', '3']
+
+def test_encode_column_matches_encode_value():
+    values = ['1', '2.50', 'true', '', '2024-01-31', 'text', '-0', '1e5']
+    for column_type in ['int', 'float', 'bool', 'date', 'null', 'string']:
+        assert encode_column(values, column_type) == [encode_value(value, column_type) for value in values]
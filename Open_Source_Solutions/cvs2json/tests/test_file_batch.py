@@ -0,0 +1,53 @@
+import os
+import tempfile
+
+import pytest
+
+from file_batch import iter_converted_files
+
+def convert_lines(path):
+    # Yields every line of a file as an item, and fails on a line that says so
+    with open(path) as f:
+        for line in f:
+            if line.strip() == 'fail':
+                raise ValueError('bad line')
+            yield line.strip()
+
+@pytest.fixture
+def files(tmp_path):
+    paths = []
+    for name, lines in [('a.txt', ['a1', 'a2']), ('b.txt', ['b1', 'fail']), ('c.txt', ['c%d' % i for i in range(1000)])]:
+        path = tmp_path / name
+        path.write_text('\n'.join(lines) + '\n')
+        paths.append(str(path))
+    return paths
+
+@pytest.fixture
+def spool_root(tmp_path, monkeypatch):
+    # The temporary files of the workers go here, so the test can see them removed
+    root = tmp_path / 'spool'
+    root.mkdir()
+    monkeypatch.setattr(tempfile, 'tempdir', str(root))
+    return root
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_items_come_in_input_order(files, spool_root, jobs):
+    errors = []
+    items = list(iter_converted_files(files, convert_lines, jobs, errors, with_paths=True))
+    expected = [(files[0], 'a1'), (files[0], 'a2')] + [(files[2], 'c%d' % i) for i in range(1000)]
+    if jobs == 1:
+        # Streamed: the items before the error are already out
+        expected.insert(2, (files[1], 'b1'))
+        assert errors == [(files[1], 'bad line (after 1 items)')]
+    else:
+        assert errors == [(files[1], 'bad line')]
+    assert items == expected
+    assert os.listdir(spool_root) == []
+
+def test_workers_spool_to_files_that_are_removed(files, spool_root):
+    converted = iter_converted_files(files, convert_lines, jobs=2)
+    assert next(converted) == 'a1'
+    # The temporary files of the workers are kept in one directory
+    assert len(os.listdir(spool_root)) == 1
+    converted.close()
+    assert os.listdir(spool_root) == []
@@ -0,0 +1,150 @@
+import json
+import os
+
+from json_store import (CHECKPOINT, ROLLBACK, append_encoded_items, append_encoded_lines, append_json_items, dump_json, encode_chunks,
+                        get_available_json_backends, get_json_encoder, save_restore_point, scan_json_document, set_json_string,
+                        set_json_value)
+
+def load(path):
+    with open(path) as json_file:
+        return json.load(json_file)
+
+def test_append_creates_and_extends_the_array(tmp_path):
+    path = str(tmp_path / 'output.json')
+    assert append_json_items(path, 'root', [{'id': 1}]) == 1
+    assert append_json_items(path, 'root', [{'id': 2}, {'id': 3}]) == 2
+    assert load(path) == {'root': [{'id': 1}, {'id': 2}, {'id': 3}]}
+    # Laid out like json.dump, and nothing left next to the file
+    with open(path) as json_file:
+        assert json_file.read() == json.dumps(load(path), indent=4)
+    assert os.listdir(tmp_path) == ['output.json']
+
+def test_append_in_place(tmp_path):
+    path = str(tmp_path / 'output.json')
+    append_json_items(path, 'root', [{'id': 1}])
+    inode = os.stat(path).st_ino
+    append_json_items(path, 'root', [{'id': 2, 'text': 'a "quoted" ]\\'}])
+    # Written over the end of the same file, not replaced by a rewrite
+    assert os.stat(path).st_ino == inode
+    assert load(path) == {'root': [{'id': 1}, {'id': 2, 'text': 'a "quoted" ]\\'}]}
+    assert os.listdir(tmp_path) == ['output.json']
+
+    # A new key is added in place after the last member
+    append_json_items(path, 'more', [1, 2])
+    set_json_value(path, 'name', 'x')
+    assert os.stat(path).st_ino == inode
+    with open(path) as json_file:
+        assert json_file.read() == json.dumps({'root': [{'id': 1}, {'id': 2, 'text': 'a "quoted" ]\\'}], 'more': [1, 2], 'name': 'x'}, indent=4)
+
+def test_append_compact(tmp_path):
+    path = str(tmp_path / 'output.json')
+    encoder = get_json_encoder('json', compact=True)
+    append_json_items(path, 'root', [{'id': 1, 'tags': ['a]', '{b']}], encoder)
+    inode = os.stat(path).st_ino
+    append_json_items(path, 'root', [{'id': 2}], encoder)
+    assert os.stat(path).st_ino == inode
+    assert scan_json_document(path, encoder)['items'] == 2
+    with open(path) as json_file:
+        assert json_file.read() == '{"root":[{"id":1,"tags":["a]","{b"]},{"id":2}]}'
+
+def test_append_does_not_load_the_document(tmp_path, monkeypatch):
+    import json_store
+    for compact in [False, True]:
+        path = str(tmp_path / f'output_{compact}.json')
+        encoder = get_json_encoder('json', compact)
+        append_json_items(path, 'root', range(3000), encoder)
+        monkeypatch.setattr(json_store, 'load_json_document', None)
+        # A small window makes the compact document be decoded in many pieces
+        monkeypatch.setattr(json_store, 'SCAN_WINDOW', 100)
+        append_json_items(path, 'root', [3000], encoder)
+        set_json_value(path, 'done', True, encoder)
+        monkeypatch.undo()
+        assert load(path) == {'root': list(range(3001)), 'done': True}
+
+def test_killed_append_is_repaired(tmp_path):
+    path = str(tmp_path / 'output.json')
+    append_json_items(path, 'root', [{'id': 1}])
+    # A writer killed after saving its restore point and writing part of an item over the end of the file
+    offset = scan_json_document(path)['items_end']
+    with open(path, 'r+b') as json_file, open(path + '.lock', 'wb') as lock_file:
+        json_file.seek(offset)
+        save_restore_point(lock_file, offset, json_file.read())
+        json_file.seek(offset)
+        json_file.write(b',\n        {"id": ')
+        json_file.truncate()
+    append_json_items(path, 'root', [{'id': 2}])
+    assert load(path) == {'root': [{'id': 1}, {'id': 2}]}
+    assert os.listdir(tmp_path) == ['output.json']
+
+def test_other_layouts_fall_back_to_a_rewrite(tmp_path):
+    path = str(tmp_path / 'output.json')
+    with open(path, 'w') as json_file:
+        json.dump({'other': True, 'root': [{'id': 0}]}, json_file, indent=2)
+    assert scan_json_document(path) is None
+    append_json_items(path, 'root', [{'id': 2}])
+    assert load(path) == {'other': True, 'root': [{'id': 0}, {'id': 2}]}
+    with open(path) as json_file:
+        assert json_file.read() == json.dumps(load(path), indent=4)
+
+    # An array that isn't the last member is moved to the end
+    append_json_items(path, 'more', [1, 2])
+    append_json_items(path, 'root', [{'id': 3}])
+    assert list(load(path)) == ['other', 'more', 'root']
+    assert load(path)['root'] == [{'id': 0}, {'id': 2}, {'id': 3}]
+
+def test_every_backend_writes_the_same_values():
+    value = {'n': [1e16, 1e-07, 0.1, 2 ** 53, None], 'special': [float('inf'), float('-inf')], 'text': 'caf\u00e9 \U0001f600'}
+    for backend in get_available_json_backends():
+        for indent in [False, True]:
+            text = dump_json(value, backend, indent)
+            assert text.isascii()
+            # The text can differ, such as 1e-7 for 1e-07, but not the values; infinity is not written as null
+            assert json.loads(text) == value
+    assert dump_json(float('nan'), 'orjson' if 'orjson' in get_available_json_backends() else 'json') == 'NaN'
+
+def test_set_json_value(tmp_path):
+    path = str(tmp_path / 'output.json')
+    set_json_value(path, 'a', 'x')
+    set_json_value(path, 'b', {'n': 1})
+    set_json_value(path, 'a', 'y')
+    assert load(path) == {'a': 'y', 'b': {'n': 1}}
+
+def test_set_json_string_from_chunks(tmp_path):
+    path = str(tmp_path / 'output.json')
+    set_json_string(path, 'a', ['ab', 'c\n', '"é"'])
+    assert load(path) == {'a': 'abc\n"é"'}
+    set_json_value(path, 'b', 1)
+    # An existing key is taken out and written again at the end
+    set_json_string(path, 'a', iter(['x', 'y']))
+    assert load(path) == {'b': 1, 'a': 'xy'}
+    with open(path) as f:
+        assert f.read() == json.dumps({'b': 1, 'a': 'xy'}, indent=4)
+
+    compact = get_json_encoder('json', compact=True)
+    set_json_string(path, 'c', ['z'], compact)
+    with open(path) as f:
+        assert f.read() == '{"b":1,"a":"xy","c":"z"}'
+    set_json_string(path, 'd', [], compact)
+    assert load(path) == {'b': 1, 'a': 'xy', 'c': 'z', 'd': ''}
+
+def test_rollback_takes_out_the_items_of_a_failed_file(tmp_path):
+    for compact in [False, True]:
+        path = str(tmp_path / f'output_{compact}.json')
+        encoder = get_json_encoder('json', compact)
+        append_json_items(path, 'root', [0], encoder)
+        chunks = [CHECKPOINT, *encode_chunks([1, 2], encoder=encoder), CHECKPOINT, *encode_chunks([3, 4, 5], encoder=encoder), ROLLBACK,
+                  CHECKPOINT, *encode_chunks([6], encoder=encoder)]
+        assert append_encoded_items(path, 'root', chunks, encoder) == 3
+        assert load(path) == {'root': [0, 1, 2, 6]}
+
+        # Only a failed file: the array is back as it was
+        append_encoded_items(path, 'root', [CHECKPOINT, *encode_chunks([7], encoder=encoder), ROLLBACK], encoder)
+        with open(path) as json_file:
+            assert json_file.read() == (json.dumps({'root': [0, 1, 2, 6]}, separators=(',', ':')) if compact else json.dumps({'root': [0, 1, 2, 6]}, indent=4))
+
+def test_rollback_of_json_lines(tmp_path):
+    path = str(tmp_path / 'output.ndjson')
+    chunks = [CHECKPOINT, *encode_chunks([1], True), CHECKPOINT, *encode_chunks([2, 3], True), ROLLBACK, CHECKPOINT, *encode_chunks([4], True)]
+    assert append_encoded_lines(path, chunks) == 2
+    with open(path) as json_file:
+        assert json_file.read() == '1\n4\n'
@@ -0,0 +1,43 @@
+import csv
+import io
+
+def write_csv(tmp_path, text):
+    path = tmp_path / 'input.csv'
+    path.write_bytes(text.encode('utf-8'))
+    return str(path)
+
+def read_ranges(data, offsets):
+    # Parse every range on its own, as the worker processes do
+    records = []
+    for start, end in zip(offsets, offsets[1:]):
+        records.extend(csv.reader(io.StringIO(data[start:end].decode('utf-8'), newline='')))
+    return records
+
+def test_boundaries_are_record_ends(cvs2json, tmp_path):
+    text = 'id,name\n' + ''.join(f'{i},name {i}\n' for i in range(100))
+    path = write_csv(tmp_path, text)
+    offsets = list(cvs2json.find_record_boundaries(path, 64))
+    data = text.encode('utf-8')
+    assert offsets[0] == len('id,name\n')
+    assert offsets[-1] == len(data)
+    assert all(data[offset - 1:offset] == b'\n' for offset in offsets)
+    assert read_ranges(data, offsets) == list(csv.reader(io.StringIO(text, newline='')))[1:]
+
+def test_quoted_newlines_across_block_edges(cvs2json, tmp_path, monkeypatch):
+    # Blocks of a few bytes put quotes and newlines of one field in different blocks
+    monkeypatch.setattr(cvs2json, 'SCAN_BLOCK_SIZE', 7)
+    rows = [['id', 'note']] + [[str(i), f'line one\nline "two"\n\nend {i}'] for i in range(30)]
+    buffer = io.StringIO(newline='')
+    csv.writer(buffer, lineterminator='\n').writerows(rows)
+    text = buffer.getvalue()
+    path = write_csv(tmp_path, text)
+
+    data = text.encode('utf-8')
+    for chunk_size in [1, 10, 50, 1000]:
+        offsets = list(cvs2json.find_record_boundaries(path, chunk_size))
+        assert all(data[:offset].count(b'"') % 2 == 0 for offset in offsets)
+        assert read_ranges(data, offsets) == rows[1:]
+
+def test_file_without_final_newline(cvs2json, tmp_path):
+    path = write_csv(tmp_path, 'a,b\n1,2\n3,4')
+    assert list(cvs2json.find_record_boundaries(path, 1)) == [4, 8, 11]
@@ -0,0 +1,19 @@
+import os
+import shutil
+
+def test_copies_match_the_originals(sync_shared_modules):
+    assert sync_shared_modules.find_diverged_copies() == []
+
+def test_diverged_copy_is_reported_and_replaced(sync_shared_modules, tmp_path):
+    for tool in [sync_shared_modules.SOURCE_TOOL] + sync_shared_modules.COPY_TOOLS:
+        os.makedirs(tmp_path / tool)
+        for module in sync_shared_modules.SHARED_MODULES:
+            shutil.copyfile(os.path.join(sync_shared_modules.BASE_DIR, sync_shared_modules.SOURCE_TOOL, module), tmp_path / tool / module)
+    with open(tmp_path / 'xml2json' / 'file_batch.py', 'a') as module_file:
+        module_file.write('# edited\n')
+    os.remove(tmp_path / 'file2Base64' / 'json_store.py')
+
+    diverged = sorted(sync_shared_modules.find_diverged_copies(str(tmp_path)))
+    assert diverged == [os.path.join('file2Base64', 'json_store.py'), os.path.join('xml2json', 'file_batch.py')]
+    assert sorted(sync_shared_modules.copy_shared_modules(str(tmp_path))) == diverged
+    assert sync_shared_modules.find_diverged_copies(str(tmp_path)) == []
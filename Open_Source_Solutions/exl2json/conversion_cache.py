@@ -0,0 +1,331 @@
+"""
+Conversion cache for the OpenData Dynamics converters.
+
+The converted output of every input file is kept in a cache directory, so a file that was already converted with
+the same options is copied from the cache instead of being converted again. A SQLite index (cache.sqlite) maps
+each input (path, size, modification time, converter options) to a blob of converted output, named after the
+SHA-256 of the file content and the options. A file that comes back with a new path or modification time but the
+same content is found through its content hash.
+
+Blobs hold the output as frames of formatted text, so they can be written to the output piece by piece. The least
+recently used blobs are removed when the cache grows over its size limit.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+from json_store import CHECKPOINT, ROLLBACK
+
+CACHE_VERSION = 1
+DEFAULT_CACHE_MB = 256
+# Bytes of a file hashed at a time
+HASH_BLOCK_SIZE = 1024 * 1024
+# Small chunks are joined into frames of about this size
+FRAME_BYTES = 1024 * 1024
+# Marks the end of an iterator
+STOP = object()
+
+def get_default_cache_dir(tool):
+    """
+    Find the default cache directory of a converter.
+
+    Parameters:
+    - tool (str): Name of the converter, such as 'cvs2json'.
+
+    Returns:
+    - str: $OPENDATA_CACHE_DIR/<tool> if the variable is set, otherwise ~/.cache/opendata_dynamics/<tool>.
+    """
+    base_dir = os.environ.get('OPENDATA_CACHE_DIR') or os.path.join(os.path.expanduser('~'), '.cache', 'opendata_dynamics')
+    return os.path.join(base_dir, tool)
+
+def open_cache(tool, cache_dir=None, max_mb=DEFAULT_CACHE_MB):
+    """
+    Open the conversion cache of a converter, creating it if needed.
+
+    Parameters:
+    - tool (str): Name of the converter, such as 'cvs2json'.
+    - cache_dir (str, optional): Cache directory. Defaults to get_default_cache_dir(tool).
+    - max_mb (int, optional): Size limit of the cache in megabytes. Defaults to DEFAULT_CACHE_MB.
+
+    Returns:
+    - dict: The cache, passed to the other functions of this module.
+    """
+    cache_dir = cache_dir or get_default_cache_dir(tool)
+    os.makedirs(os.path.join(cache_dir, 'blobs'), exist_ok=True)
+    connection = sqlite3.connect(os.path.join(cache_dir, 'cache.sqlite'), timeout=60)
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("""CREATE TABLE IF NOT EXISTS entries (
+    path TEXT,
+    options TEXT,
+    size INTEGER,
+    mtime_ns INTEGER,
+    content_hash TEXT,
+    blob TEXT,
+    PRIMARY KEY (path, options)
+)""")
+    connection.execute("""CREATE TABLE IF NOT EXISTS blobs (
+    name TEXT PRIMARY KEY,
+    bytes INTEGER,
+    items INTEGER,
+    last_used REAL
+)""")
+    connection.execute("CREATE INDEX IF NOT EXISTS idx_blobs_last_used ON blobs (last_used)")
+    connection.commit()
+    return {'connection': connection, 'directory': cache_dir, 'max_bytes': max_mb * 1024 * 1024, 'tool': tool,
+            'opened': time.time(), 'hits': 0, 'misses': 0}
+
+def close_cache(cache):
+    """
+    Close the conversion cache.
+
+    Parameters:
+    - cache (dict or None): The cache from open_cache.
+    """
+    if cache is not None:
+        cache['connection'].close()
+
+def describe_options(cache, options):
+    # Blobs of another converter, another cache version or other options never match
+    return json.dumps({'tool': cache['tool'], 'version': CACHE_VERSION, 'options': options}, sort_keys=True, default=str)
+
+def hash_file(file_path):
+    """
+    Compute the SHA-256 of a file, reading it in blocks.
+
+    Parameters:
+    - file_path (str): Path to the file.
+
+    Returns:
+    - str: The hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def get_blob_path(cache, name):
+    return os.path.join(cache['directory'], 'blobs', name)
+
+def find_entry(cache, file_path, options):
+    """
+    Look up the converted output of a file.
+
+    The file is first looked up by path, size and modification time. Only if that fails is its content hashed
+    and looked up by hash.
+
+    Parameters:
+    - cache (dict): The cache from open_cache.
+    - file_path (str): The input file.
+    - options (dict): The converter options that change the output.
+
+    Returns:
+    - dict or None: The lookup. 'hit' tells whether the output is in the cache. None if the file can't be read;
+      the converter reports the error.
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    connection = cache['connection']
+    lookup = {'path': os.path.abspath(file_path), 'options': describe_options(cache, options), 'size': stat.st_size,
+              'mtime_ns': stat.st_mtime_ns, 'hit': False}
+    row = connection.execute("SELECT size, mtime_ns, content_hash, blob FROM entries WHERE path = ? AND options = ?",
+                             (lookup['path'], lookup['options'])).fetchone()
+    if row and row[0] == stat.st_size and row[1] == stat.st_mtime_ns:
+        lookup['content_hash'], lookup['blob'] = row[2], row[3]
+    else:
+        try:
+            lookup['content_hash'] = hash_file(file_path)
+        except OSError:
+            return None
+        lookup['blob'] = hashlib.sha256((lookup['options'] + lookup['content_hash']).encode('utf-8')).hexdigest()
+
+    blob = connection.execute("SELECT items FROM blobs WHERE name = ?", (lookup['blob'],)).fetchone()
+    if blob and os.path.exists(get_blob_path(cache, lookup['blob'])):
+        lookup['hit'] = True
+        lookup['items'] = blob[0]
+        with connection:
+            connection.execute("UPDATE blobs SET last_used = ? WHERE name = ?", (time.time(), lookup['blob']))
+            save_entry(connection, lookup)
+    return lookup
+
+def save_entry(connection, lookup):
+    connection.execute("INSERT OR REPLACE INTO entries (path, options, size, mtime_ns, content_hash, blob) VALUES (?, ?, ?, ?, ?, ?)",
+                       (lookup['path'], lookup['options'], lookup['size'], lookup['mtime_ns'], lookup['content_hash'], lookup['blob']))
+
+def read_entry(cache, lookup):
+    """
+    Read the converted output of a file from the cache.
+
+    Parameters:
+    - cache (dict): The cache from open_cache.
+    - lookup (dict): A hit from find_entry.
+
+    Yields:
+    - tuple: (text, count) for every frame, as they were stored.
+    """
+    with open(get_blob_path(cache, lookup['blob']), 'rb') as blob_file:
+        while True:
+            header = blob_file.readline()
+            if not header:
+                break
+            count, size = map(int, header.split())
+            yield blob_file.read(size).decode('utf-8'), count
+
+def write_frame(blob_file, texts, count, separator):
+    data = separator.join(texts).encode('utf-8')
+    blob_file.write(f"{count} {len(data)}\n".encode('ascii'))
+    blob_file.write(data)
+    return len(data)
+
+def store_entry(cache, lookup, chunks, separator='', keep=None):
+    """
+    Pass converted chunks of a file through, saving them to the cache.
+
+    The output is saved only if every chunk was read, keep() returns True, and the file hasn't changed in the
+    meantime. Output larger than the cache is not saved.
+
+    Parameters:
+    - cache (dict): The cache from open_cache.
+    - lookup (dict): A miss from find_entry.
+    - chunks (iterable of tuple): (text, count) chunks of the converted file.
+    - separator (str, optional): Text between two chunks when they are joined into one frame. Defaults to ''.
+    - keep (callable, optional): Called after the last chunk. The output is saved only if it returns True.
+
+    Yields:
+    - tuple: The chunks, unchanged.
+    """
+    cache['misses'] += 1
+    blob_path = get_blob_path(cache, lookup['blob'])
+    temp_path = f"{blob_path}.{os.getpid()}.tmp"
+    blob_file = open(temp_path, 'wb')
+    saved = False
+    try:
+        texts, text_bytes, items = [], 0, 0
+        size = 0
+        total_items = 0
+        for text, count in chunks:
+            yield text, count
+            if blob_file is None or not count and not text:
+                continue
+            texts.append(text)
+            text_bytes += len(text)
+            items += count
+            total_items += count
+            if text_bytes >= FRAME_BYTES:
+                size += write_frame(blob_file, texts, items, separator)
+                texts, text_bytes, items = [], 0, 0
+            if size > cache['max_bytes']:
+                # Too large to keep; stop saving but keep converting
+                blob_file.close()
+                blob_file = None
+        if blob_file is None or (keep is not None and not keep()):
+            return
+        if texts:
+            size += write_frame(blob_file, texts, items, separator)
+        blob_file.close()
+        blob_file = None
+        stat = os.stat(lookup['path'])
+        if stat.st_size != lookup['size'] or stat.st_mtime_ns != lookup['mtime_ns']:
+            return
+        os.replace(temp_path, blob_path)
+        saved = True
+        connection = cache['connection']
+        with connection:
+            connection.execute("INSERT OR REPLACE INTO blobs (name, bytes, items, last_used) VALUES (?, ?, ?, ?)",
+                               (lookup['blob'], size, total_items, time.time()))
+            save_entry(connection, lookup)
+        evict_blobs(cache)
+    finally:
+        if blob_file is not None:
+            blob_file.close()
+        if not saved and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def evict_blobs(cache):
+    """
+    Remove the least recently used blobs until the cache is within its size limit.
+
+    Blobs used since the cache was opened are kept, as the current conversion may still read them.
+
+    Parameters:
+    - cache (dict): The cache from open_cache.
+    """
+    connection = cache['connection']
+    total = connection.execute("SELECT COALESCE(SUM(bytes), 0) FROM blobs").fetchone()[0]
+    if total <= cache['max_bytes']:
+        return
+    rows = connection.execute("SELECT name, bytes FROM blobs WHERE last_used < ? ORDER BY last_used", (cache['opened'],)).fetchall()
+    for name, size in rows:
+        if total <= cache['max_bytes']:
+            break
+        with connection:
+            connection.execute("DELETE FROM blobs WHERE name = ?", (name,))
+            connection.execute("DELETE FROM entries WHERE blob = ?", (name,))
+        if os.path.exists(get_blob_path(cache, name)):
+            os.remove(get_blob_path(cache, name))
+        total -= size
+
+def iter_cached_files(cache, paths, options, convert_paths, separator='', errors=None):
+    """
+    Convert files, taking the output of unchanged files from the cache.
+
+    Files found in the cache are read from it. The others are converted by convert_paths, and their output is
+    saved to the cache as it is written. The output of every file comes in input order, after a CHECKPOINT marker.
+    A file that failed part way is followed by a ROLLBACK marker, so the writer takes its items out again.
+
+    Parameters:
+    - cache (dict or None): The cache from open_cache, or None to convert every file.
+    - paths (list of str): The input files.
+    - options (dict): The converter options that change the output.
+    - convert_paths (callable): Takes a list of files and yields (path, (text, count)) for their chunks in order.
+    - separator (str, optional): Text between two chunks when they are joined. Defaults to ''.
+    - errors (list, optional): (path, message) for every file that failed. A failed file is not saved.
+
+    Yields:
+    - tuple: (text, count) for every chunk, and the CHECKPOINT and ROLLBACK markers of json_store.
+    """
+    errors = errors if errors is not None else []
+
+    def failed(path):
+        # convert_paths records an error before it yields anything from the next file
+        return any(path == failed_path for failed_path, message in errors)
+
+    if cache is None:
+        current = STOP
+        for path, chunk in convert_paths(paths):
+            if path != current:
+                if current is not STOP and failed(current):
+                    yield ROLLBACK
+                yield CHECKPOINT
+                current = path
+            yield chunk
+        if current is not STOP and failed(current):
+            yield ROLLBACK
+        return
+
+    lookups = [find_entry(cache, path, options) for path in paths]
+    converted = iter(convert_paths([path for path, lookup in zip(paths, lookups) if not (lookup and lookup['hit'])]))
+    pending = next(converted, STOP)
+
+    def file_chunks(path):
+        nonlocal pending
+        while pending is not STOP and pending[0] == path:
+            yield pending[1]
+            pending = next(converted, STOP)
+
+    for path, lookup in zip(paths, lookups):
+        yield CHECKPOINT
+        if lookup and lookup['hit']:
+            cache['hits'] += 1
+            yield from read_entry(cache, lookup)
+            continue
+        if lookup:
+            yield from store_entry(cache, lookup, file_chunks(path), separator, lambda: not failed(path))
+        else:
+            yield from file_chunks(path)
+        if failed(path):
+            yield ROLLBACK
@@ -1,76 +1,150 @@
 import argparse
-import os
-import json
+import sqlite3
 import openpyxl
+from functools import partial
+from conversion_cache import DEFAULT_CACHE_MB, close_cache, iter_cached_files, open_cache
+from file_batch import describe_file_errors, expand_input_paths, iter_converted_files
+from json_store import JSON_BACKENDS, append_encoded_items, append_encoded_lines, encode_chunks, get_item_separator, get_json_encoder
 
-def excel_to_json(excel_file_paths, json_file_path, sheet_name=0, encoding='utf-8', key=None):
+# Files picked from input directories
+EXCEL_EXTENSIONS = ['.xlsx', '.xlsm']
+
+def read_excel_rows(excel_file_path, sheet_name=0):
+    '''
+    Read the rows of one Excel sheet, streaming them from the file.
+
+    The workbook is opened read-only, so rows are parsed from the sheet XML as they are needed instead of loading
+    every cell first, and memory use doesn't grow with the size of the sheet. Formulas give their cached values.
+
+    Parameters:
+    - excel_file_path (str): The path to the Excel file.
+    - sheet_name (str or int, optional): The name or index of the sheet to read. Defaults to the first sheet.
+
+    Yields:
+    - dict: One row of the sheet, keyed by the headers in the first row.
+    '''
+    workbook = openpyxl.load_workbook(excel_file_path, read_only=True, data_only=True)
+    try:
+        # The command line gives the index as a string
+        if isinstance(sheet_name, str) and sheet_name.isdigit() and sheet_name not in workbook.sheetnames:
+            sheet_name = int(sheet_name)
+        if isinstance(sheet_name, int):
+            sheet = workbook.worksheets[sheet_name]
+        else:
+            sheet = workbook[sheet_name]
+        # Don't trust the size stored in the file; some programs write it wrong
+        sheet.reset_dimensions()
+
+        rows = sheet.iter_rows(values_only=True)
+        headers = next(rows, None)
+        if headers is None:
+            return
+        for row in rows:
+            item = dict(zip(headers, row))
+            # Cells missing at the end of a row are empty, and cells past the headers go under None
+            for header in headers[len(row):]:
+                item.setdefault(header, None)
+            if len(row) > len(headers):
+                item[None] = list(row[len(headers):])
+            yield item
+    finally:
+        # Release the file as soon as the sheet is read
+        workbook.close()
+
+def encode_excel_file(excel_file_path, sheet_name=0, output_format='json', encoder=None):
+    '''
+    Read the rows of one Excel sheet and format them in chunks for the JSON file.
+
+    Parameters:
+    - excel_file_path (str): The path to the Excel file.
+    - sheet_name (str or int, optional): The name or index of the sheet to read. Defaults to the first sheet.
+    - output_format (str, optional): 'json' or 'ndjson'. Defaults to 'json'.
+    - encoder (dict, optional): The JSON encoder from get_json_encoder.
+
+    Yields:
+    - tuple: (text, count) for every chunk of rows, as taken by append_encoded_items or append_encoded_lines.
+    '''
+    yield from encode_chunks(read_excel_rows(excel_file_path, sheet_name), output_format == 'ndjson', encoder)
+
+def excel_to_json(excel_file_paths, json_file_path, sheet_name=0, encoding='utf-8', key=None, *, jobs=1, use_cache=False, cache_dir=None, cache_mb=DEFAULT_CACHE_MB,
+                  output_format='json', compact=False, json_backend=None):
     '''
     Convert one or multiple Excel sheets to a JSON file.
     
-    If the JSON file already exists, the function appends the new Excel data to it.
+    If the JSON file already exists, the function appends the new Excel data to it in place, without rewriting the file.
     If a key is specified, the new data will be nested under that key in the JSON file.
+    With more than one job the Excel files are read in parallel and appended in input order.
+    With use_cache, Excel files converted before with the same sheet are copied from the conversion cache instead of being read again.
 
     Parameters:
-    - excel_file_paths (list): A list of paths to the Excel files that need to be converted.
+    - excel_file_paths (list): A list of paths to the Excel files that need to be converted. Directories and glob patterns are expanded.
     - json_file_path (str): The path where the JSON file will be saved or updated.
     - sheet_name (str or int, optional): The name or index of the sheet to read. Defaults to the first sheet.
     - encoding (str, optional): The encoding used in the Excel files. Defaults to 'utf-8'.
     - key (str, optional): The key in the JSON file under which the Excel data will be saved.
+    - jobs (int, optional): Number of Excel files read at the same time. Defaults to 1.
+    - use_cache (bool, optional): Take unchanged files from the conversion cache and save the others to it. Defaults to False.
+    - cache_dir (str, optional): Directory of the conversion cache. Defaults to get_default_cache_dir('exl2json').
+    - cache_mb (int, optional): Size limit of the conversion cache in megabytes. Defaults to DEFAULT_CACHE_MB.
+    - output_format (str, optional): 'json' for one JSON document, or 'ndjson' to append one JSON object per line. Defaults to 'json'.
+    - compact (bool, optional): Write the JSON without indentation or spaces. Defaults to False.
+    - json_backend (str, optional): 'orjson', 'ujson' or 'json'. Defaults to the fastest one installed.
 
     Returns:
     - str: A message indicating whether the Excel files were successfully converted and appended to the JSON file.
     '''
-    
-    # Existing JSON data
-    existing_data = {}
-    if os.path.exists(json_file_path):
-        with open(json_file_path, 'r') as json_file:
-            existing_data = json.load(json_file)
-    
-    if key:
-        nested_data = existing_data.get(key, [])
-    else:
-        nested_data = existing_data.get('root', [])
-    
-    for excel_file_path in excel_file_paths:
-        try:
-            # Read Excel file
-            workbook = openpyxl.load_workbook(excel_file_path)
-            if isinstance(sheet_name, int):
-                sheet = workbook.worksheets[sheet_name]
-            else:
-                sheet = workbook[sheet_name]
-            
-            headers = [cell.value for cell in sheet[1]]
-            data = []
-            for row in sheet.iter_rows(min_row=2, values_only=True):
-                data.append({header: value for header, value in zip(headers, row)})
-            
-            nested_data.extend(data)
-        except Exception as e:
-            print(f"An error occurred while converting {excel_file_path}: {e}")
-    
-    # Update existing JSON data
-    if key:
-        existing_data[key] = nested_data
-    else:
-        existing_data['root'] = nested_data
-    
-    # Write updated data to JSON file
-    with open(json_file_path, 'w') as json_file:
-        json.dump(existing_data, json_file, indent=4)
+    try:
+        encoder = get_json_encoder(json_backend, compact)
+    except ValueError as e:
+        return str(e)
+    paths = expand_input_paths(excel_file_paths, EXCEL_EXTENSIONS)
+    errors = []
+    encode_file = partial(encode_excel_file, sheet_name=sheet_name, output_format=output_format, encoder=encoder)
+    convert_paths = partial(iter_converted_files, convert_file=encode_file, jobs=jobs, errors=errors, with_paths=True)
+
+    try:
+        cache = open_cache('exl2json', cache_dir, cache_mb) if use_cache else None
+    except (OSError, sqlite3.Error) as e:
+        return f"Could not open the conversion cache: {e}"
+    try:
+        # Append the rows to the JSON file
+        options = {'sheet_name': str(sheet_name), 'format': output_format, 'encoder': encoder}
+        separator = '' if output_format == 'ndjson' else get_item_separator(encoder)
+        chunks = iter_cached_files(cache, paths, options, convert_paths, separator, errors)
+        if output_format == 'ndjson':
+            append_encoded_lines(json_file_path, chunks)
+        else:
+            append_encoded_items(json_file_path, key if key else 'root', chunks, encoder)
+    finally:
+        close_cache(cache)
 
+    if errors:
+        return describe_file_errors(errors, len(paths), 'Excel')
+    if output_format == 'ndjson':
+        return "Excel files converted and appended to NDJSON successfully."
     return "Excel files converted and appended to JSON successfully."
 
 
-# Command-line arguments
-parser = argparse.ArgumentParser(description='Convert Excel files to JSON.')
-parser.add_argument('--excel_files', type=str, nargs='+', required=True, help='The file paths to the Excel files you want to convert.')
-parser.add_argument('--json_file', type=str, required=True, help='The file path where the JSON data will be saved.')
-parser.add_argument('--sheet_name', type=str, default=0, help='The name or index of the sheet to read. Optional.')
-parser.add_argument('--encoding', type=str, default='utf-8', help='The encoding used in the Excel files. Optional.')
-parser.add_argument('--key', type=str, help='The key in the JSON file where the Excel data will be saved. Optional.')
-args = parser.parse_args()
+def main():
+    # Command-line arguments
+    parser = argparse.ArgumentParser(description='Convert Excel files to JSON.')
+    parser.add_argument('--excel_files', type=str, nargs='+', required=True, help='The file paths to the Excel files you want to convert. Directories and glob patterns such as "drops/*.xlsx" are expanded.')
+    parser.add_argument('--json_file', type=str, required=True, help='The file path where the JSON data will be saved.')
+    parser.add_argument('--sheet_name', type=str, default=0, help='The name or index of the sheet to read. Optional.')
+    parser.add_argument('--encoding', type=str, default='utf-8', help='The encoding used in the Excel files. Optional.')
+    parser.add_argument('--key', type=str, help='The key in the JSON file where the Excel data will be saved. Optional.')
+    parser.add_argument('--jobs', type=int, default=1, help='Number of Excel files read at the same time. Optional.')
+    parser.add_argument('--cache', action='store_true', help='Keep the output of every file in a conversion cache, and copy unchanged files from it instead of converting them again. Optional.')
+    parser.add_argument('--cache_dir', type=str, help='With --cache: directory of the conversion cache. Defaults to ~/.cache/opendata_dynamics/exl2json, or $OPENDATA_CACHE_DIR/exl2json. Optional.')
+    parser.add_argument('--cache_mb', type=int, default=DEFAULT_CACHE_MB, help='With --cache: size limit of the conversion cache in megabytes, 256 by default. The least recently used outputs are removed past it. Optional.')
+    parser.add_argument('--format', type=str, choices=['json', 'ndjson'], default='json', help='Write one JSON document, or append one JSON object per line (the key is not used). Optional.')
+    parser.add_argument('--compact', action='store_true', help='Write the JSON without indentation or spaces. Optional.')
+    parser.add_argument('--json_backend', type=str, choices=['auto'] + JSON_BACKENDS, default='auto', help='JSON encoder. auto uses orjson or ujson when installed, and the standard library otherwise. Optional.')
+    args = parser.parse_args()
+
+    message = excel_to_json(args.excel_files, args.json_file, args.sheet_name, args.encoding, args.key, jobs=args.jobs, use_cache=args.cache,
+                            cache_dir=args.cache_dir, cache_mb=args.cache_mb, output_format=args.format, compact=args.compact, json_backend=args.json_backend)
+    print(message)
 
-message = excel_to_json(args.excel_files, args.json_file, args.sheet_name, args.encoding, args.key)
-print(message)
+if __name__ == "__main__":
+    main()
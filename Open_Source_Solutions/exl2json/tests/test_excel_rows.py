@@ -0,0 +1,20 @@
+import openpyxl
+
+def write_workbook(path, rows):
+    workbook = openpyxl.Workbook()
+    for row in rows:
+        workbook.active.append(row)
+    workbook.save(path)
+
+def test_rows_keyed_by_the_headers(tmp_path, exl2json):
+    path = str(tmp_path / 'sheet.xlsx')
+    write_workbook(path, [['id', 'name', 'note'], [1, 'a', 'x'], [2, 'b']])
+    assert list(exl2json.read_excel_rows(path)) == [{'id': 1, 'name': 'a', 'note': 'x'}, {'id': 2, 'name': 'b', 'note': None}]
+
+def test_cells_past_the_headers_are_kept_as_a_list(tmp_path, exl2json):
+    path = str(tmp_path / 'sheet.xlsx')
+    write_workbook(path, [['id', 'name'], [1, 'a', 'extra', 'more'], [2, 'b']])
+    rows = list(exl2json.read_excel_rows(path))
+    assert rows[0] == {'id': 1, 'name': 'a', None: ['extra', 'more']}
+    # Only rows wider than the headers get the None key
+    assert None not in rows[1]
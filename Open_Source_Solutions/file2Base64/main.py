@@ -1,7 +1,27 @@
 import base64
 import argparse
-import os
+import hashlib
 import json
+import os
+import sqlite3
+import sys
+from functools import partial
+from conversion_cache import DEFAULT_CACHE_MB, close_cache, find_entry, open_cache, read_entry, store_entry
+from file_batch import describe_file_errors, expand_input_paths, map_in_order
+from json_store import INDENT, lock_json_file, set_json_string, set_json_value
+
+# Bytes read at a time. A multiple of 57, the bytes on one 76-character MIME line, and so of 3: every chunk
+# encodes to whole Base64 groups and whole MIME lines.
+CHUNK_SIZE = 57 * 64 * 1024
+# Line length of MIME Base64 (RFC 2045)
+MIME_LINE_LENGTH = 76
+# Bytes skipped when decoding, so wrapped Base64 can be read back
+WHITESPACE = b' \t\r\n'
+# In batch mode, files up to this size are grouped into one task, and their Base64 is sent back to the main process
+TASK_BYTES = 1024 * 1024
+TASK_FILES = 256
+# Base64 of small files waiting to be written to the bundle, at most
+DEFAULT_MAX_IN_FLIGHT_MB = 64
 
 def convert_file_to_base64(file_path):
     """
@@ -21,6 +41,151 @@ def convert_file_to_base64(file_path):
     except Exception as e:
         return f"An error occurred: {e}"
 
+def stream_to_output(write, file_path):
+    """
+    Write to a file, or to standard output if the path is '-'. A file that is only partly written is removed.
+
+    Parameters:
+    - write (callable): Function that takes the binary output and writes to it.
+    - file_path (str): The file path, or '-'.
+    """
+    if file_path == '-':
+        sys.stdout.flush()
+        write(sys.stdout.buffer)
+        sys.stdout.buffer.flush()
+        return
+    try:
+        with open(file_path, 'wb') as output:
+            write(output)
+    except BaseException:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+
+def wrap_base64(encoded, wrap, newline=b'\n'):
+    """
+    Break Base64 text into lines.
+
+    Parameters:
+    - encoded (bytes): The Base64 text. Its length is a multiple of the line length, except for the last line.
+    - wrap (int): Line length, or 0 to leave the text as it is.
+    - newline (bytes, optional): Written after every line. Defaults to b'\n'.
+
+    Returns:
+    - bytes: The wrapped text.
+    """
+    if not wrap or not encoded:
+        return encoded
+    return newline.join([encoded[start:start + wrap] for start in range(0, len(encoded), wrap)]) + newline
+
+def iter_base64_chunks(file, wrap=0, newline=b'\n'):
+    """
+    Encode a file to Base64 one chunk at a time.
+
+    Memory use is the same for any file size.
+
+    Parameters:
+    - file: The binary file to convert.
+    - wrap (int, optional): Line length, a multiple of 4 such as MIME_LINE_LENGTH. Every line ends with a newline.
+      Defaults to 0, one line without a newline.
+    - newline (bytes, optional): Written after every wrapped line. Defaults to b'\n'.
+
+    Yields:
+    - bytes: The Base64 text of every chunk.
+    """
+    chunk_size = CHUNK_SIZE
+    if wrap:
+        line_bytes = wrap // 4 * 3
+        chunk_size -= chunk_size % line_bytes
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    while True:
+        # Fill the buffer, so every chunk but the last is a multiple of 3 bytes
+        size = 0
+        while size < chunk_size:
+            read = file.readinto(view[size:])
+            if not read:
+                break
+            size += read
+        if not size:
+            break
+        yield wrap_base64(base64.b64encode(view[:size]), wrap, newline)
+        if size < chunk_size:
+            break
+
+def encode_file_to_stream(file, output, wrap=0, newline=b'\n'):
+    """
+    Encode a file to Base64 one chunk at a time, writing each chunk as soon as it is encoded.
+
+    Parameters:
+    - file: The binary file to convert.
+    - output: The binary file the Base64 text is written to.
+    - wrap (int, optional): Line length of the Base64 text. See iter_base64_chunks. Defaults to 0, no line breaks.
+    - newline (bytes, optional): Written after every wrapped line. Defaults to b'\n'.
+    """
+    for chunk in iter_base64_chunks(file, wrap, newline):
+        output.write(chunk)
+
+def decode_stream_to_file(base64_file, output):
+    """
+    Decode a Base64 file one chunk at a time, writing the bytes as soon as they are decoded.
+
+    Line breaks and spaces are skipped, so wrapped (MIME) Base64 can be decoded.
+
+    Parameters:
+    - base64_file: The Base64 text, opened in binary mode.
+    - output: The binary file the decoded bytes are written to.
+    """
+    leftover = b''
+    while True:
+        chunk = base64_file.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        data = leftover + chunk.translate(None, WHITESPACE)
+        # Decode whole groups of 4 characters and keep the rest for the next chunk
+        usable = len(data) - len(data) % 4
+        output.write(base64.b64decode(data[:usable], validate=True))
+        leftover = data[usable:]
+    if leftover:
+        raise ValueError("The Base64 text ends in the middle of a group of 4 characters.")
+
+def encode_file_to_base64_file(file_path, base64_file_path, wrap=0):
+    """
+    Convert a file to Base64 and save it to a file, streaming it in chunks.
+
+    Parameters:
+    - file_path (str): The file path to the file you want to convert.
+    - base64_file_path (str): The file path where the Base64 text will be saved, or '-' for standard output.
+    - wrap (int, optional): Line length, a multiple of 4 such as 76 for MIME. Defaults to 0, no line breaks.
+
+    Returns:
+    - str: A message indicating success or failure.
+    """
+    try:
+        with open(file_path, 'rb') as file:
+            stream_to_output(partial(encode_file_to_stream, file, wrap=wrap), base64_file_path)
+        return "Base64 string saved successfully."
+    except Exception as e:
+        return f"An error occurred: {e}"
+
+def decode_base64_file(base64_file_path, file_path):
+    """
+    Convert a Base64 file back to the original file, streaming it in chunks.
+
+    Parameters:
+    - base64_file_path (str): The file path to the Base64 text.
+    - file_path (str): The file path where the decoded file will be saved, or '-' for standard output.
+
+    Returns:
+    - str: A message indicating success or failure.
+    """
+    try:
+        with open(base64_file_path, 'rb') as base64_file:
+            stream_to_output(partial(decode_stream_to_file, base64_file), file_path)
+        return "Base64 string decoded successfully."
+    except Exception as e:
+        return f"An error occurred: {e}"
+
 def save_base64_to_file(base64_string, file_path):
     """
     Save a Base64 string to a specified file.
@@ -43,6 +208,8 @@ def save_base64_to_json(base64_string, json_file_path, json_key):
     """
     Save a Base64 string to a specified key in a JSON file.
 
+    A new key is added without rewriting the JSON file.
+
     Parameters:
     - base64_string (str): The Base64 encoded string.
     - json_file_path (str): The file path to the JSON file.
@@ -52,50 +219,407 @@ def save_base64_to_json(base64_string, json_file_path, json_key):
     - str: A message indicating success or failure.
     """
     try:
-        if os.path.exists(json_file_path):
-            with open(json_file_path, 'r') as f:
-                json_data = json.load(f)
-        else:
-            json_data = {}
-        
-        json_data[json_key] = base64_string
-        with open(json_file_path, 'w') as f:
-            json.dump(json_data, f)
+        set_json_value(json_file_path, json_key, base64_string)
+        return "Base64 string saved to JSON file successfully."
+    except Exception as e:
+        return f"An error occurred while saving to JSON file: {e}"
+
+def encode_file_to_json(file_path, json_file_path, json_key, wrap=0):
+    """
+    Convert a file to Base64 and save it to a key of a JSON file, streaming it in chunks.
+
+    Parameters:
+    - file_path (str): The file path to the file you want to convert.
+    - json_file_path (str): The file path to the JSON file.
+    - json_key (str): The key in the JSON file where the Base64 string will be saved.
+    - wrap (int, optional): Line length, a multiple of 4 such as 76 for MIME. Defaults to 0, no line breaks.
+
+    Returns:
+    - str: A message indicating success or failure.
+    """
+    try:
+        with open(file_path, 'rb') as file:
+            set_json_string(json_file_path, json_key, (chunk.decode('ascii') for chunk in iter_base64_chunks(file, wrap)))
         return "Base64 string saved to JSON file successfully."
     except Exception as e:
         return f"An error occurred while saving to JSON file: {e}"
 
-parser = argparse.ArgumentParser(description='Convert images to Base64 strings.')
-parser.add_argument('default_file', type=str, nargs='?', help='The file path to a single image you want to convert. Used for default behavior.')
-parser.add_argument('--files', type=str, nargs='*', help='The file paths to the images you want to convert.')
-parser.add_argument('--file', type=str, help='The file path where a single Base64 string or JSON data will be saved. Optional.')
-parser.add_argument('--path', type=str, help='The directory path where multiple Base64 text files will be saved. Optional.')
-parser.add_argument('--key', type=str, help='The key in the JSON file where the Base64 string will be saved. Requires --file. Optional.')
-args = parser.parse_args()
-
-if args.default_file:
-    base64_string = convert_file_to_base64(args.default_image)
-    print("Here is your Base64 string, press Enter to continue:")
-    input(base64_string)
-elif args.key and not args.file:
-    print("The --key argument requires --file.")
-elif args.file and args.path:
-    print("Please choose either --file or --path, not both.")
-elif args.file:
-    base64_string = convert_file_to_base64(args.files[0])
-    if args.key:
-        message = save_base64_to_json(base64_string, args.file, args.key)
+class HashingFile:
+    """
+    A binary file that feeds everything read from it to a hash.
+    """
+
+    def __init__(self, file, digest):
+        self.file = file
+        self.digest = digest
+        self.size = 0
+
+    def readinto(self, buffer):
+        read = self.file.readinto(buffer)
+        if read:
+            self.digest.update(memoryview(buffer)[:read])
+            self.size += read
+        return read
+
+def encode_batch_file(file_path, output_path=None, inline=True, wrap=0):
+    """
+    Encode one file of a batch, hashing it on the way.
+
+    Parameters:
+    - file_path (str): The file to encode.
+    - output_path (str, optional): Where the Base64 text is saved. Missing directories are created.
+    - inline (bool, optional): Return the Base64 text too. Only used for small files. Defaults to True.
+    - wrap (int, optional): Line length of the Base64 text. Defaults to 0, no line breaks.
+
+    Returns:
+    - dict: 'size' and 'sha256' of the file, and 'data', the Base64 text, if inline.
+    """
+    digest = hashlib.sha256()
+    result = {}
+    if output_path:
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+    with open(file_path, 'rb') as file:
+        if inline:
+            data = file.read()
+            digest.update(data)
+            encoded = wrap_base64(base64.b64encode(data), wrap)
+            if output_path:
+                with open(output_path, 'wb') as output:
+                    output.write(encoded)
+            result['size'] = len(data)
+            result['data'] = encoded.decode('ascii')
+        else:
+            hashing_file = HashingFile(file, digest)
+            if output_path:
+                stream_to_output(partial(encode_file_to_stream, hashing_file, wrap=wrap), output_path)
+            else:
+                # The main process encodes it into the bundle; only hash it here
+                buffer = bytearray(CHUNK_SIZE)
+                while hashing_file.readinto(buffer):
+                    pass
+            result['size'] = hashing_file.size
+    result['sha256'] = digest.hexdigest()
+    return result
+
+def encode_batch_task(task, wrap=0):
+    """
+    Encode a group of files in a worker process.
+
+    Parameters:
+    - task (list of tuple): (file_path, output_path, size, inline) for every file. See encode_batch_file.
+    - wrap (int, optional): Line length of the Base64 text. Defaults to 0, no line breaks.
+
+    Returns:
+    - list of dict: The result of every file, or {'error': message} for a file that failed.
+    """
+    results = []
+    for file_path, output_path, size, inline in task:
+        try:
+            results.append(encode_batch_file(file_path, output_path, inline, wrap))
+        except Exception as e:
+            results.append({'error': str(e)})
+    return results
+
+def get_batch_output_paths(file_paths, output_dir=None):
+    """
+    Place the Base64 text files of a batch. They keep the folders of the inputs below the folder they have in common.
+
+    Parameters:
+    - file_paths (list of str): The files to encode.
+    - output_dir (str, optional): Directory where Base64 text files are saved.
+
+    Returns:
+    - dict: The output path of every file, or None for every file without output_dir.
+    """
+    if not output_dir or not file_paths:
+        return dict.fromkeys(file_paths)
+    base_dir = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in file_paths])
+    return {path: os.path.join(output_dir, os.path.relpath(os.path.abspath(path), base_dir) + '.txt') for path in file_paths}
+
+def plan_batch_tasks(file_paths, output_paths, skip=()):
+    """
+    Group files into tasks for the batch mode.
+
+    Small files are grouped, so each task is worth sending to a worker process.
+
+    Parameters:
+    - file_paths (list of str): The files to encode.
+    - output_paths (dict): The output path of every file, from get_batch_output_paths.
+    - skip (set, optional): Files left out, such as files found in the conversion cache.
+
+    Yields:
+    - list of tuple: (file_path, output_path, size, inline) for every file of a task. Files up to TASK_BYTES are
+      inline: they are read whole and their Base64 text is sent back. Larger files are streamed.
+    """
+    task = []
+    task_bytes = 0
+    for file_path in file_paths:
+        if file_path in skip:
+            continue
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            size = 0  # The worker reports the error
+        inline = size <= TASK_BYTES
+        if task and (task_bytes + size > TASK_BYTES or len(task) >= TASK_FILES):
+            yield task
+            task = []
+            task_bytes = 0
+        task.append((file_path, output_paths[file_path], size, inline))
+        task_bytes += size
+    if task:
+        yield task
+
+def get_task_weight(task):
+    # Bytes of Base64 text the task sends back to the main process
+    return sum(size * 4 // 3 for file_path, output_path, size, inline in task if inline)
+
+def iter_task_results(results):
+    """
+    Take the results of batch tasks apart, file by file.
+
+    Parameters:
+    - results (iterable of tuple): (task, task_results, error) for every task, as yielded by map_in_order.
+
+    Yields:
+    - tuple: ((file_path, output_path, size, inline), result) for every file. A file of a task that failed gets
+      {'error': message}.
+    """
+    for task, task_results, error in results:
+        if error is not None:
+            task_results = [{'error': str(error)}] * len(task)
+        yield from zip(task, task_results)
+
+def read_text_chunks(file_path):
+    # The Base64 text of a file written by a worker, to be saved to the conversion cache
+    with open(file_path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            yield chunk.decode('ascii'), 1
+
+def encode_text_chunks(file_path, wrap=0):
+    # The Base64 text of a large file, encoded by the main process for the bundle
+    with open(file_path, 'rb') as file:
+        for chunk in iter_base64_chunks(file, wrap):
+            yield chunk.decode('ascii'), 1
+
+def encode_files_in_batch(file_paths, output_dir=None, bundle_path=None, manifest_path=None, jobs=1, wrap=0, max_in_flight_mb=DEFAULT_MAX_IN_FLIGHT_MB,
+                          use_cache=False, cache_dir=None, cache_mb=DEFAULT_CACHE_MB):
+    """
+    Encode many files to Base64 in a process pool.
+
+    Each file can be saved as a Base64 text file, added to one JSON bundle keyed by file path, and listed in a
+    manifest. The bundle is written as the files are encoded, in input order, and replaces the file at bundle_path
+    when it is complete.
+
+    With use_cache, the Base64 text of every file is kept in a conversion cache. Files encoded before with the same
+    wrap are copied from the cache instead of being read and encoded again, and their size and sha256 come from it.
+
+    Parameters:
+    - file_paths (list of str): The files to encode. Directories and glob patterns are expanded.
+    - output_dir (str, optional): Directory where Base64 text files are saved.
+    - bundle_path (str, optional): JSON file holding the Base64 text of every file.
+    - manifest_path (str, optional): JSON lines file listing the path, size, sha256 and output of every file.
+    - jobs (int, optional): Number of worker processes. Defaults to 1.
+    - wrap (int, optional): Line length of the Base64 text. Defaults to 0, no line breaks.
+    - max_in_flight_mb (int, optional): Megabytes of Base64 text of small files held for the bundle, at most.
+    - use_cache (bool, optional): Take unchanged files from the conversion cache and save the others to it. Only
+      used when the Base64 text is saved. Defaults to False.
+    - cache_dir (str, optional): Directory of the conversion cache. Defaults to get_default_cache_dir('file2Base64').
+    - cache_mb (int, optional): Size limit of the conversion cache in megabytes. Defaults to DEFAULT_CACHE_MB.
+
+    Returns:
+    - str: A message indicating success or failure.
+    """
+    paths = expand_input_paths(file_paths, None)
+    output_paths = get_batch_output_paths(paths, output_dir)
+    try:
+        cache = open_cache('file2Base64', cache_dir, cache_mb) if use_cache and (output_dir or bundle_path) else None
+    except (OSError, sqlite3.Error) as e:
+        return f"Could not open the conversion cache: {e}"
+
+    errors = []
+    keys = []
+    bundle_file = open(bundle_path + '.tmp', 'wb') if bundle_path else None
+    manifest_file = open(manifest_path, 'w') if manifest_path else None
+    try:
+        lookups = {}
+        if cache is not None:
+            for path in paths:
+                lookups[path] = find_entry(cache, path, {'wrap': wrap})
+        hits = {path for path, lookup in lookups.items() if lookup and lookup['hit']}
+
+        tasks = plan_batch_tasks(paths, output_paths, hits)
+        encode_task = partial(encode_batch_task, wrap=wrap)
+        if jobs > 1:
+            results = map_in_order(encode_task, tasks, jobs, get_task_weight if bundle_path else None, max_in_flight_mb * 1024 * 1024)
+        else:
+            results = ((task, encode_task(task), None) for task in tasks)
+        encoded_files = iter_task_results(results)
+
+        if bundle_file:
+            bundle_file.write(b'{')
+        for file_path in paths:
+            output_path = output_paths[file_path]
+            lookup = lookups.get(file_path)
+            if file_path in hits:
+                if output_path:
+                    try:
+                        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+                        stream_to_output(lambda output: output.writelines(text.encode('ascii') for text, count in read_entry(cache, lookup)), output_path)
+                    except OSError as e:
+                        errors.append((file_path, str(e)))
+                        continue
+                cache['hits'] += 1
+                chunks = read_entry(cache, lookup)
+                result = {'size': lookup['size'], 'sha256': lookup['content_hash']}
+            else:
+                (file_path, output_path, size, inline), result = next(encoded_files)
+                if 'error' in result:
+                    errors.append((file_path, result['error']))
+                    continue
+                if inline:
+                    chunks = [(result['data'], 1)]
+                elif bundle_file:
+                    # The main process encodes it into the bundle
+                    chunks = encode_text_chunks(file_path, wrap)
+                elif lookup:
+                    chunks = read_text_chunks(output_path)
+                else:
+                    chunks = []
+                if lookup:
+                    chunks = store_entry(cache, lookup, chunks)
+
+            if bundle_file:
+                bundle_file.write(((',\n' if keys else '\n') + INDENT + json.dumps(file_path) + ': "').encode('ascii'))
+            for text, count in chunks:
+                # Line breaks are escaped inside the JSON string
+                if bundle_file:
+                    bundle_file.write(text.replace('\n', '\\n').encode('ascii'))
+            if bundle_file:
+                bundle_file.write(b'"')
+                keys.append(file_path)
+            if manifest_file:
+                manifest_file.write(json.dumps({'path': file_path, 'size': result['size'], 'sha256': result['sha256'],
+                                                'output': output_path or bundle_path}) + '\n')
+        if bundle_file:
+            bundle_file.write(b'\n}' if keys else b'}')
+            bundle_file.flush()
+            os.fsync(bundle_file.fileno())
+    except BaseException:
+        if bundle_file:
+            bundle_file.close()
+            os.remove(bundle_path + '.tmp')
+        raise
+    finally:
+        if bundle_file:
+            bundle_file.close()
+        if manifest_file:
+            manifest_file.close()
+        close_cache(cache)
+
+    if bundle_path:
+        with lock_json_file(bundle_path):
+            os.replace(bundle_path + '.tmp', bundle_path)
+
+    if errors:
+        return describe_file_errors(errors, len(paths), 'input')
+    return f"{len(paths)} files encoded successfully."
+
+def get_output_name(file_path, decode=False):
+    """
+    Name the output file of a file converted into a directory.
+
+    Parameters:
+    - file_path (str): The file being converted.
+    - decode (bool, optional): True when decoding Base64 back to the original file.
+
+    Returns:
+    - str: 'name.txt' when encoding. When decoding, the name without '.txt', or 'name.bin' if it has no '.txt'.
+    """
+    file_name = os.path.basename(file_path)
+    if not decode:
+        return file_name + '.txt'
+    if file_name.endswith('.txt'):
+        return file_name[:-len('.txt')]
+    return file_name + '.bin'
+
+def report(message, output_path):
+    # Keep messages out of the data when it goes to standard output
+    if output_path == '-':
+        if message.startswith("An error occurred"):
+            print(message, file=sys.stderr)
     else:
-        message = save_base64_to_json(base64_string, args.file)
-    print(message)
-elif args.path:
-    for image in args.files:
-        base64_string = convert_file_to_base64(image)
-        file_name = os.path.basename(image) + '.txt'
-        file_path = os.path.join(args.path, file_name)
-        message = save_base64_to_file(base64_string, file_path)
-        print(f"{image}: {message}")
-else:
-    for image in args.files:
-        base64_string = convert_file_to_base64(image)
-        print(f"{image}: {base64_string}")
\ No newline at end of file
+        print(message)
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert images to Base64 strings.')
+    parser.add_argument('default_file', type=str, nargs='?', help='The file path to a single image you want to convert. Used for default behavior.')
+    parser.add_argument('default_output', type=str, nargs='?', help='The file path where the Base64 string of default_file will be saved. Optional.')
+    parser.add_argument('--files', type=str, nargs='*', help='The file paths to the images you want to convert.')
+    parser.add_argument('--file', type=str, help='The file path where a single Base64 string or JSON data will be saved, or - for standard output. Optional.')
+    parser.add_argument('--path', type=str, help='The directory path where multiple Base64 text files will be saved. Optional.')
+    parser.add_argument('--key', type=str, help='The key in the JSON file where the Base64 string will be saved. Requires --file. Optional.')
+    parser.add_argument('--wrap', type=int, default=0, help='Break the Base64 text into lines of this length, a multiple of 4. Use 76 for MIME. Optional.')
+    parser.add_argument('--decode', action='store_true', help='Convert Base64 text files back to the original files. Optional.')
+    parser.add_argument('--bundle', type=str, help='Batch mode: save the Base64 strings of all the files to this JSON file, keyed by file path. Optional.')
+    parser.add_argument('--manifest', type=str, help='Batch mode: list the path, size, sha256 and output of every file in this JSON lines file. Optional.')
+    parser.add_argument('--jobs', type=int, default=1, help='Batch mode: number of worker processes encoding files. Optional.')
+    parser.add_argument('--max_in_flight_mb', type=int, default=DEFAULT_MAX_IN_FLIGHT_MB, help='Batch mode: megabytes of Base64 strings held for the bundle at most. Optional.')
+    parser.add_argument('--cache', action='store_true', help='Batch mode: keep the Base64 text of every file in a conversion cache, and copy unchanged files from it instead of encoding them again. Optional.')
+    parser.add_argument('--cache_dir', type=str, help='With --cache: directory of the conversion cache. Defaults to ~/.cache/opendata_dynamics/file2Base64, or $OPENDATA_CACHE_DIR/file2Base64. Optional.')
+    parser.add_argument('--cache_mb', type=int, default=DEFAULT_CACHE_MB, help='With --cache: size limit of the conversion cache in megabytes, 256 by default. The least recently used outputs are removed past it. Optional.')
+    args = parser.parse_args()
+
+    if args.wrap and (args.wrap < 4 or args.wrap % 4):
+        parser.error("--wrap must be a multiple of 4, such as 76.")
+    if args.files:
+        # Directories and glob patterns such as "assets/**/*.png"
+        args.files = expand_input_paths(args.files, None)
+    batch = args.bundle or args.manifest or args.jobs > 1
+    if batch and (args.default_file or args.decode or args.file or args.key):
+        parser.error("--bundle, --manifest and --jobs take --files and an optional --path; they can't be used with --file, --key or --decode.")
+    if args.decode:
+        convert = decode_base64_file
+    else:
+        convert = lambda file_path, output_path: encode_file_to_base64_file(file_path, output_path, args.wrap)
+
+    if args.default_file and (args.default_output or args.decode):
+        output_path = args.default_output or '-'
+        report(convert(args.default_file, output_path), output_path)
+    elif args.default_file:
+        base64_string = convert_file_to_base64(args.default_file)
+        print("Here is your Base64 string, press Enter to continue:")
+        input(base64_string)
+    elif not args.files:
+        print("Please give a file to convert, or a list of files with --files.")
+    elif batch:
+        print(encode_files_in_batch(args.files, args.path, args.bundle, args.manifest, args.jobs, args.wrap, args.max_in_flight_mb,
+                                    args.cache, args.cache_dir, args.cache_mb))
+    elif args.key and not args.file:
+        print("The --key argument requires --file.")
+    elif args.key and args.decode:
+        print("Base64 strings can't be decoded from a JSON file; --decode reads Base64 text files.")
+    elif args.file and args.path:
+        print("Please choose either --file or --path, not both.")
+    elif args.file and args.key:
+        print(encode_file_to_json(args.files[0], args.file, args.key, args.wrap))
+    elif args.file:
+        report(convert(args.files[0], args.file), args.file)
+    elif args.path:
+        for file_path in args.files:
+            output_path = os.path.join(args.path, get_output_name(file_path, args.decode))
+            message = convert(file_path, output_path)
+            print(f"{file_path}: {message}")
+    elif args.decode:
+        for file_path in args.files:
+            report(convert(file_path, '-'), '-')
+    else:
+        for file_path in args.files:
+            print(f"{file_path}: ", end='')
+            report(convert(file_path, '-'), '-')
+            # Wrapped Base64 already ends with a newline
+            if not args.wrap:
+                print()
+
+if __name__ == "__main__":
+    main()
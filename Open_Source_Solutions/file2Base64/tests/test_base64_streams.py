@@ -0,0 +1,73 @@
+import base64
+import io
+import json
+import os
+
+import pytest
+
+# Sizes around the small CHUNK_SIZE the tests use, most of them not multiples of 57 bytes
+SIZES = [0, 1, 2, 56, 58, 227, 228, 229, 1000]
+
+@pytest.fixture
+def small_chunks(file2Base64, monkeypatch):
+    # Four MIME lines per chunk, so every size crosses chunk boundaries
+    monkeypatch.setattr(file2Base64, 'CHUNK_SIZE', 57 * 4)
+
+def encode(file2Base64, data, wrap=0):
+    output = io.BytesIO()
+    file2Base64.encode_file_to_stream(io.BytesIO(data), output, wrap)
+    return output.getvalue()
+
+@pytest.mark.parametrize('size', SIZES)
+def test_chunks_encode_like_b64encode(file2Base64, small_chunks, size):
+    data = os.urandom(size)
+    assert encode(file2Base64, data) == base64.b64encode(data)
+    # Wrapped at 76 like MIME, as encodebytes does
+    assert encode(file2Base64, data, file2Base64.MIME_LINE_LENGTH) == base64.encodebytes(data)
+
+@pytest.mark.parametrize('size', SIZES)
+@pytest.mark.parametrize('wrap', [0, 8, 76])
+def test_round_trip(file2Base64, small_chunks, size, wrap):
+    data = os.urandom(size)
+    encoded = encode(file2Base64, data, wrap)
+    if wrap and data:
+        lines = encoded.split(b'\n')
+        assert lines[-1] == b'' and all(len(line) == wrap for line in lines[:-2]) and 0 < len(lines[-2]) <= wrap
+    output = io.BytesIO()
+    file2Base64.decode_stream_to_file(io.BytesIO(encoded), output)
+    assert output.getvalue() == data
+
+def test_decode_skips_line_breaks_anywhere(file2Base64, small_chunks):
+    data = os.urandom(500)
+    encoded = base64.b64encode(data)
+    # CRLF line ends, and breaks that fall in the middle of groups of 4
+    text = b'\r\n'.join(encoded[start:start + 10] for start in range(0, len(encoded), 10)) + b'\r\n'
+    output = io.BytesIO()
+    file2Base64.decode_stream_to_file(io.BytesIO(text), output)
+    assert output.getvalue() == data
+
+def test_decode_rejects_a_cut_group(file2Base64):
+    with pytest.raises(ValueError):
+        file2Base64.decode_stream_to_file(io.BytesIO(b'QUJD\nQU'), io.BytesIO())
+
+def test_encode_file_to_json(file2Base64, small_chunks, tmp_path):
+    data = os.urandom(1000)
+    file_path = tmp_path / 'image.bin'
+    file_path.write_bytes(data)
+    json_path = str(tmp_path / 'data.json')
+    with open(json_path, 'w') as f:
+        json.dump({'other': 1, 'image': 'old'}, f, indent=4)
+
+    message = file2Base64.encode_file_to_json(str(file_path), json_path, 'image')
+    assert message == "Base64 string saved to JSON file successfully."
+    with open(json_path) as f:
+        assert json.load(f) == {'other': 1, 'image': base64.b64encode(data).decode('ascii')}
+
+    file2Base64.encode_file_to_json(str(file_path), json_path, 'wrapped', 76)
+    with open(json_path) as f:
+        assert json.load(f)['wrapped'] == base64.encodebytes(data).decode('ascii')
+
+    # A file that can't be read leaves the JSON file alone
+    assert file2Base64.encode_file_to_json(str(tmp_path / 'missing.bin'), json_path, 'missing').startswith("An error occurred")
+    with open(json_path) as f:
+        assert 'missing' not in json.load(f)
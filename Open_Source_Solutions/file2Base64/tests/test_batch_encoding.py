@@ -0,0 +1,95 @@
+import base64
+import hashlib
+import json
+import os
+
+import pytest
+
+@pytest.fixture
+def inputs(tmp_path):
+    # Two small files and one over TASK_BYTES, which is streamed instead of sent back whole
+    paths = []
+    for name, data in [('a.txt', b'hello'), (os.path.join('sub', 'b.bin'), os.urandom(300)), ('large.bin', os.urandom(5000))]:
+        path = tmp_path / 'in' / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+        paths.append(str(path))
+    return paths
+
+@pytest.fixture
+def encoded_paths(file2Base64, monkeypatch):
+    # Files actually read and encoded, as opposed to copied from the cache
+    monkeypatch.setattr(file2Base64, 'TASK_BYTES', 1024)
+    encoded = []
+    encode_batch_task = file2Base64.encode_batch_task
+    def recording_encode_batch_task(task, wrap=0):
+        encoded.extend(file_path for file_path, output_path, size, inline in task)
+        return encode_batch_task(task, wrap)
+    monkeypatch.setattr(file2Base64, 'encode_batch_task', recording_encode_batch_task)
+    return encoded
+
+def read_manifest(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def test_manifest_lists_every_file(file2Base64, inputs, encoded_paths, tmp_path):
+    out_dir = str(tmp_path / 'out')
+    manifest_path = str(tmp_path / 'manifest.jsonl')
+    missing = str(tmp_path / 'in' / 'missing.bin')
+    message = file2Base64.encode_files_in_batch(inputs + [missing], out_dir, manifest_path=manifest_path)
+    assert message.startswith('1 of 4 input files')
+
+    # In input order, without the file that failed
+    expected_outputs = [os.path.join(out_dir, 'a.txt.txt'), os.path.join(out_dir, 'sub', 'b.bin.txt'), os.path.join(out_dir, 'large.bin.txt')]
+    manifest = read_manifest(manifest_path)
+    assert [entry['path'] for entry in manifest] == inputs
+    for entry, output_path in zip(manifest, expected_outputs):
+        data = read_bytes(entry['path'])
+        assert entry == {'path': entry['path'], 'size': len(data), 'sha256': hashlib.sha256(data).hexdigest(), 'output': output_path}
+        assert read_bytes(output_path) == base64.b64encode(data)
+
+def test_manifest_of_a_bundle(file2Base64, inputs, encoded_paths, tmp_path):
+    bundle_path = str(tmp_path / 'bundle.json')
+    manifest_path = str(tmp_path / 'manifest.jsonl')
+    assert file2Base64.encode_files_in_batch(inputs, bundle_path=bundle_path, manifest_path=manifest_path, wrap=76) == '3 files encoded successfully.'
+
+    with open(bundle_path) as f:
+        bundle = json.load(f)
+    assert bundle == {path: base64.encodebytes(read_bytes(path)).decode('ascii') for path in inputs}
+    assert [entry['output'] for entry in read_manifest(manifest_path)] == [bundle_path] * 3
+
+def test_unchanged_files_come_from_the_cache(file2Base64, inputs, encoded_paths, tmp_path):
+    cache_dir = str(tmp_path / 'cache')
+    def run(name, wrap=0):
+        del encoded_paths[:]
+        out_dir = str(tmp_path / name)
+        manifest_path = str(tmp_path / (name + '.jsonl'))
+        message = file2Base64.encode_files_in_batch(inputs, out_dir, manifest_path=manifest_path, wrap=wrap, use_cache=True, cache_dir=cache_dir)
+        assert message == '3 files encoded successfully.'
+        outputs = {path: read_bytes(os.path.join(out_dir, os.path.relpath(path, str(tmp_path / 'in')) + '.txt')) for path in inputs}
+        return list(encoded_paths), read_manifest(manifest_path), outputs
+
+    # Misses the first time, hits the second, with the same outputs and manifest
+    encoded, first_manifest, first_outputs = run('first')
+    assert encoded == inputs
+    encoded, manifest, outputs = run('second')
+    assert encoded == []
+    assert outputs == first_outputs
+    assert [dict(entry, output=None) for entry in manifest] == [dict(entry, output=None) for entry in first_manifest]
+
+    # A changed file misses, the others still hit
+    with open(inputs[0], 'ab') as f:
+        f.write(b' world')
+    encoded, manifest, outputs = run('changed')
+    assert encoded == [inputs[0]]
+    assert outputs[inputs[0]] == base64.b64encode(b'hello world')
+    assert manifest[0]['sha256'] == hashlib.sha256(b'hello world').hexdigest()
+
+    # Text cached with another line length is not used
+    encoded, manifest, outputs = run('wrapped', 76)
+    assert encoded == inputs
+    assert outputs[inputs[2]] == base64.encodebytes(read_bytes(inputs[2]))
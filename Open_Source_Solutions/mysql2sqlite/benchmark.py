@@ -0,0 +1,262 @@
+import argparse
+import concurrent.futures
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+
+import main as transfer
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+FIXTURES = ['narrow', 'wide', 'blobs', 'mixed']
+WIDE_COLUMNS = 12
+BLOB_POOL_SIZE = 64
+INSERT_CHUNK_ROWS = 5000
+DEFAULT_BLOB_BYTES = 4096
+DEFAULT_THRESHOLD = 10.0
+
+def insert_in_chunks(conn, query, rows):
+    # Insert a generator of rows without holding more than one chunk in memory.
+    # pymysql turns each executemany into multi-row INSERT statements.
+    cursor = conn.cursor()
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == INSERT_CHUNK_ROWS:
+            cursor.executemany(query, batch)
+            batch = []
+    if batch:
+        cursor.executemany(query, batch)
+    cursor.close()
+
+def create_narrow_tables(conn, rows, options):
+    conn.cursor().execute("""CREATE TABLE narrow (
+    id INT PRIMARY KEY,
+    value INT,
+    label VARCHAR(32),
+    INDEX idx_narrow_value (value)
+)""")
+    insert_in_chunks(conn, "INSERT INTO narrow VALUES (%s, %s, %s)", ((i, i * 7 % 1000003, f"label {i}") for i in range(1, rows + 1)))
+
+def create_wide_tables(conn, rows, options):
+    # Integer, double and text columns side by side
+    columns = ([f"int_{n} INT" for n in range(WIDE_COLUMNS)] + [f"real_{n} DOUBLE" for n in range(WIDE_COLUMNS)]
+               + [f"text_{n} VARCHAR(32)" for n in range(WIDE_COLUMNS)])
+    conn.cursor().execute("CREATE TABLE wide (\n    id INT PRIMARY KEY,\n    " + ",\n    ".join(columns) + "\n)")
+    placeholders = ', '.join(['%s'] * (len(columns) + 1))
+    insert_in_chunks(conn, f"INSERT INTO wide VALUES ({placeholders})",
+                     ((i,) + (i,) * WIDE_COLUMNS + (i / 3,) * WIDE_COLUMNS + (f"text {i}",) * WIDE_COLUMNS for i in range(1, rows + 1)))
+
+def create_blob_tables(conn, rows, options):
+    # Rows cycle through a small pool of random payloads, so generating
+    # millions of rows doesn't cost millions of os.urandom calls
+    conn.cursor().execute("""CREATE TABLE blobs (
+    id INT PRIMARY KEY,
+    name VARCHAR(32),
+    payload MEDIUMBLOB
+)""")
+    payloads = [os.urandom(options['blob_bytes']) for _ in range(BLOB_POOL_SIZE)]
+    insert_in_chunks(conn, "INSERT INTO blobs VALUES (%s, %s, %s)", ((i, f"blob {i}", payloads[i % BLOB_POOL_SIZE]) for i in range(1, rows + 1)))
+
+def create_mixed_tables(conn, rows, options):
+    # The MySQL types that need an adapter in SQLite (DECIMAL, DATETIME, DATE,
+    # TIME, SET) next to text, NULLs and binary data
+    conn.cursor().execute("""CREATE TABLE mixed (
+    id BIGINT PRIMARY KEY,
+    price DECIMAL(12, 2),
+    created DATETIME,
+    day DATE,
+    duration TIME,
+    flags SET('a', 'b', 'c'),
+    active TINYINT(1),
+    payload VARBINARY(32),
+    note TEXT
+)""")
+    start = datetime.datetime(2024, 1, 1)
+    insert_in_chunks(conn, "INSERT INTO mixed VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                     ((i, f"{i / 7:.2f}", start + datetime.timedelta(seconds=i), (start + datetime.timedelta(days=i % 3650)).date(),
+                       datetime.timedelta(seconds=i % 86400), 'a,c' if i % 2 else 'b', i % 2, os.urandom(32),
+                       None if i % 10 == 0 else f"line {i}\twith tab\nand newline") for i in range(1, rows + 1)))
+
+FIXTURE_BUILDERS = {
+    'narrow': create_narrow_tables,
+    'wide': create_wide_tables,
+    'blobs': create_blob_tables,
+    'mixed': create_mixed_tables,
+}
+
+def create_fixture(settings, fixture, rows, options):
+    # Fill the scratch database with one synthetic fixture
+    print(f"Creating fixture {fixture} with {rows} rows...")
+    start_time = time.perf_counter()
+    mysql_conn = transfer.connect_mysql(settings['server'], settings['username'], settings['password'])
+    try:
+        cursor = mysql_conn.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS {settings['database']}")
+        cursor.execute(f"CREATE DATABASE {settings['database']}")
+        cursor.execute(f"USE {settings['database']}")
+        cursor.close()
+        FIXTURE_BUILDERS[fixture](mysql_conn, rows, options)
+        mysql_conn.commit()
+    finally:
+        mysql_conn.close()
+    print(f"Created fixture {fixture} in {time.perf_counter() - start_time:.2f}s.")
+
+def get_peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak /= 1024  # ru_maxrss is bytes on macOS and KiB on Linux
+    return round(peak / 1024, 1)
+
+def get_table_counts(mysql_conn):
+    cursor = mysql_conn.cursor()
+    cursor.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = DATABASE()")
+    counts = {}
+    for (table,) in cursor.fetchall():
+        cursor.execute(f"SELECT COUNT(*) FROM {transfer.quote_mysql_identifier(table)}")
+        counts[table] = cursor.fetchone()[0]
+    cursor.close()
+    return counts
+
+def run_transfer(sqlite_path, settings):
+    # Copy the scratch database into a new SQLite file. Runs in its own
+    # process, so the peak RSS belongs to this transfer only.
+    mysql_conn = transfer.connect_mysql(settings['server'], settings['username'], settings['password'], settings['database'])
+    sqlite_conn = transfer.connect_sqlite(sqlite_path)
+    try:
+        table_counts = get_table_counts(mysql_conn)
+        transfer.register_sqlite_adapters()
+        transfer.set_sqlite_load_pragmas(sqlite_conn, settings['journal_mode'], settings['cache_mb'])
+
+        start_time = time.perf_counter()
+        transfer.transfer_data(mysql_conn, sqlite_conn, settings['chunk_rows'], settings['commit_rows'], on_exists='replace')
+        elapsed = time.perf_counter() - start_time
+
+        for table, rows in table_counts.items():
+            loaded_rows = sqlite_conn.execute(f"SELECT COUNT(*) FROM {transfer.quote_identifier(table)}").fetchone()[0]
+            if loaded_rows != rows:
+                raise RuntimeError(f"Table {table} has {loaded_rows} rows in SQLite, expected {rows}")
+    finally:
+        sqlite_conn.close()
+        mysql_conn.close()
+
+    rows = sum(table_counts.values())
+    megabytes = os.path.getsize(sqlite_path) / (1024 * 1024)
+    return {
+        'rows': rows,
+        'megabytes': round(megabytes, 2),
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(rows / elapsed) if elapsed > 0 else 0,
+        'mb_per_sec': round(megabytes / elapsed, 2) if elapsed > 0 else 0,
+        'peak_rss_mb': get_peak_rss_mb(),
+    }
+
+def get_run_name(fixture, rows, journal_mode):
+    return f"{fixture}-{rows}-{journal_mode}"
+
+def run_suite(args):
+    options = {'blob_bytes': args.blob_bytes}
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for fixture in args.fixtures:
+            for rows in args.rows:
+                settings = {
+                    'server': args.server, 'username': args.username, 'password': args.password, 'database': args.database,
+                    'chunk_rows': args.chunk_rows, 'commit_rows': args.commit_rows, 'cache_mb': args.cache_mb,
+                }
+                create_fixture(settings, fixture, rows, options)
+                for journal_mode in args.journal_modes:
+                    name = get_run_name(fixture, rows, journal_mode)
+                    sqlite_path = os.path.join(temp_dir, f"{name}.db")
+                    print(f"Running {name}...")
+                    # A fresh process per run keeps peak RSS from carrying over
+                    with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+                        result = executor.submit(run_transfer, sqlite_path, {**settings, 'journal_mode': journal_mode}).result()
+                    os.remove(sqlite_path)
+                    results.append({'name': name, 'fixture': fixture, 'journal_mode': journal_mode, **result})
+    return results
+
+def print_results(results):
+    print(f"{'Run':<32}{'Rows':>12}{'Seconds':>10}{'Rows/sec':>12}{'MB/sec':>9}{'Peak MB':>9}")
+    for result in results:
+        print(f"{result['name']:<32}{result['rows']:>12}{result['seconds']:>10}{result['rows_per_sec']:>12}{result['mb_per_sec']:>9}"
+              f"{str(result['peak_rss_mb']):>9}")
+
+def load_baseline(baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    return {result['name']: result for result in baseline['results']}
+
+def get_change(new, old):
+    # Relative change in percent, or None when there's nothing to compare
+    if new is None or not old:
+        return None
+    return (new - old) / old * 100
+
+def format_change(change):
+    return f"{change:+.1f}%" if change is not None else 'n/a'
+
+def compare_with_baseline(results, baseline, threshold):
+    # A run regresses when its throughput drops, or its peak memory grows,
+    # by more than threshold percent. Returns the names of those runs.
+    regressions = []
+    print(f"\nComparison with baseline (regression threshold {threshold}%):")
+    for result in results:
+        old = baseline.get(result['name'])
+        if old is None:
+            print(f"{result['name']}: not in the baseline")
+            continue
+        throughput_change = get_change(result['rows_per_sec'], old['rows_per_sec'])
+        memory_change = get_change(result['peak_rss_mb'], old.get('peak_rss_mb'))
+        regressed = (throughput_change is not None and throughput_change < -threshold) or (memory_change is not None and memory_change > threshold)
+        if regressed:
+            regressions.append(result['name'])
+        print(f"{'REGRESSION ' if regressed else ''}{result['name']}: rows/sec {old['rows_per_sec']} -> {result['rows_per_sec']} "
+              f"({format_change(throughput_change)}), peak RSS {format_change(memory_change)}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the MySQL to SQLite Converter on synthetic MySQL databases.')
+    parser.add_argument('--server', required=True, help='Address of a MySQL or MariaDB server used for the benchmark.')
+    parser.add_argument('--username', required=True, help='Username for the MySQL server.')
+    parser.add_argument('--password', default='', help='Password for the MySQL server.')
+    parser.add_argument('--database', default='mysql2sqlite_bench', help='Scratch database. It is dropped and filled again for every fixture.')
+    parser.add_argument('--fixtures', nargs='+', choices=FIXTURES, default=FIXTURES, help='Synthetic databases to transfer.')
+    parser.add_argument('--rows', nargs='+', type=int, default=[10000], help='Number of rows in each fixture. Every size is a separate run.')
+    parser.add_argument('--blob-bytes', type=int, default=DEFAULT_BLOB_BYTES, help='Size of each payload in the blobs fixture.')
+    parser.add_argument('--journal-modes', nargs='+', choices=transfer.JOURNAL_MODES, default=['off'], help='SQLite journal modes to compare.')
+    parser.add_argument('--chunk-rows', type=int, default=transfer.DEFAULT_CHUNK_ROWS, help='Number of rows fetched from MySQL at a time.')
+    parser.add_argument('--commit-rows', type=int, default=transfer.DEFAULT_COMMIT_ROWS, help='Number of rows written to SQLite between two commits.')
+    parser.add_argument('--cache-mb', type=int, default=transfer.DEFAULT_CACHE_MB, help='SQLite page cache size in MB during the load.')
+    parser.add_argument('--output', help='Optional path of a JSON file the results are written to. It can be used as a later --baseline.')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against.')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='Percent drop in rows/sec, or growth in peak RSS, that counts as a regression.')
+
+    args = parser.parse_args()
+    if args.baseline and not os.path.exists(args.baseline):
+        parser.error(f"baseline file {args.baseline} does not exist")
+
+    results = run_suite(args)
+    print_results(results)
+
+    if args.output:
+        settings = {key: value for key, value in vars(args).items() if key not in ('password', 'output', 'baseline')}
+        with open(args.output, 'w') as f:
+            json.dump({'created': datetime.datetime.now().isoformat(timespec='seconds'), 'settings': settings, 'results': results}, f, indent=4)
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, load_baseline(args.baseline), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} runs regressed: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,47 +1,112 @@
 import argparse
+import datetime
+import decimal
 import sqlite3
 import pymysql
+import pymysql.cursors
 import logging
 import re
+import sys
+import time
 
-logging.basicConfig(filename='db_transfer.log', level=logging.INFO, 
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
+
+logging.basicConfig(filename='db_transfer.log', level=logging.INFO,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 console = logging.StreamHandler()
 console.setLevel(logging.INFO)
 logging.getLogger('').addHandler(console)
 
-def sqlite_to_mysql_type(sqlite_type):
+# Number of rows fetched from the MySQL stream at a time
+DEFAULT_CHUNK_ROWS = 10000
+# Rows written to SQLite between two commits
+DEFAULT_COMMIT_ROWS = 500000
+# SQLite page cache used during the load
+DEFAULT_CACHE_MB = 256
+# journal_mode used during the load: OFF is fastest, WAL survives crashes
+JOURNAL_MODES = ['off', 'wal']
+# What to do with a table that already exists in the SQLite file
+TABLE_POLICIES = ['ask', 'replace', 'append', 'skip']
+# Settings changed for the load and restored after it
+LOAD_PRAGMAS = ['journal_mode', 'synchronous', 'cache_size', 'temp_store']
+
+def mysql_to_sqlite_type(mysql_type):
+    # SQLite type affinity for the base type of a MySQL column type such as
+    # "int(11) unsigned" or "varchar(64)"
     type_mapping = {
-        'INTEGER': 'INT',
-        'REAL': 'FLOAT',
-        'TEXT': 'TEXT',
-        'BLOB': 'BLOB',
-        'NUMERIC': 'DECIMAL(10, 5)',
-        'BOOLEAN': 'TINYINT(1)',
-        'DATETIME': 'DATETIME',
+        'TINYINT': 'INTEGER',
+        'SMALLINT': 'INTEGER',
+        'MEDIUMINT': 'INTEGER',
+        'INT': 'INTEGER',
+        'INTEGER': 'INTEGER',
+        'BIGINT': 'INTEGER',
+        'YEAR': 'INTEGER',
+        'DECIMAL': 'NUMERIC',
+        'NUMERIC': 'NUMERIC',
+        'FLOAT': 'REAL',
+        'DOUBLE': 'REAL',
+        'REAL': 'REAL',
         'DATE': 'DATE',
+        'DATETIME': 'DATETIME',
+        'TIMESTAMP': 'DATETIME',
         'TIME': 'TIME',
-        'VARCHAR': 'VARCHAR(255)',
-        'CHAR': 'CHAR(255)',
-        'INT8': 'BIGINT',
-        'BIGINT': 'BIGINT',
-        'SMALLINT': 'SMALLINT',
-        'FLOAT': 'FLOAT',
-        'DOUBLE': 'DOUBLE',
-        # Add more mappings as needed
+        'CHAR': 'TEXT',
+        'VARCHAR': 'TEXT',
+        'TINYTEXT': 'TEXT',
+        'TEXT': 'TEXT',
+        'MEDIUMTEXT': 'TEXT',
+        'LONGTEXT': 'TEXT',
+        'ENUM': 'TEXT',
+        'SET': 'TEXT',
+        'JSON': 'TEXT',
+        'BIT': 'BLOB',
+        'BINARY': 'BLOB',
+        'VARBINARY': 'BLOB',
+        'TINYBLOB': 'BLOB',
+        'BLOB': 'BLOB',
+        'MEDIUMBLOB': 'BLOB',
+        'LONGBLOB': 'BLOB',
     }
-    return type_mapping.get(sqlite_type.upper(), 'TEXT')  # Default to TEXT
+    if mysql_type.lower().startswith('tinyint(1)'):
+        return 'BOOLEAN'
+    base_type = re.match(r"\w+", mysql_type).group(0).upper()
+    return type_mapping.get(base_type, 'TEXT')  # Default to TEXT
+
+def format_mysql_time(value):
+    # pymysql returns TIME columns as timedelta; store them as MySQL shows them
+    seconds = abs(value.days * 86400 + value.seconds)
+    text = f"{'-' if value.days < 0 else ''}{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+    if value.microseconds:
+        text += f".{value.microseconds:06d}"
+    return text
+
+def register_sqlite_adapters():
+    # Values pymysql returns that sqlite3 can't store as they are
+    sqlite3.register_adapter(decimal.Decimal, str)
+    sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(' '))
+    sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+    sqlite3.register_adapter(datetime.timedelta, format_mysql_time)
+    sqlite3.register_adapter(set, lambda value: ','.join(sorted(value)))
+
+def quote_identifier(name):
+    return '"' + name.replace('"', '""') + '"'
+
+def quote_mysql_identifier(name):
+    return '`' + name.replace('`', '``') + '`'
 
 def get_user_inputs(args):
-    # Collect SQLite database details
-    sqlite_db_path = args.sqlite if args.sqlite else input("Enter the path to the SQLite database file: ")
-    
     # Collect MySQL database details
     mysql_server = args.server if args.server else input("Enter the MySQL server address: ")
     mysql_username = args.username if args.username else input("Enter the MySQL username: ")
     mysql_password = args.password if args.password else input("Enter the MySQL password: ")
     mysql_db_name = args.database if args.database else input("Enter the name of the MySQL database: ")
-    
+
+    # Collect SQLite database details
+    sqlite_db_path = args.sqlite if args.sqlite else input("Enter the path of the SQLite database file to write: ")
+
     return sqlite_db_path, mysql_server, mysql_username, mysql_password, mysql_db_name
 
 def connect_sqlite(db_path):
@@ -62,214 +127,260 @@ def connect_mysql(server, username, password, db_name=None):
         logging.error(f"Failed to connect to MySQL: {e}")
         raise ConnectionError(f"Failed to connect to MySQL: {e}")  # Raise an exception
 
-def create_mysql_db_if_not_exists(conn, db_name):
-    cursor = conn.cursor()
-    cursor.execute("SHOW DATABASES")
-    databases = [db[0] for db in cursor.fetchall()]
-    
-    if db_name not in databases:
-        cursor.execute(f"CREATE DATABASE {db_name}")
-        logging.info(f"Database {db_name} created.")
-    cursor.close()
-
-def check_mysql_db(mysql_conn, db_name):
-    cursor = None
+def read_mysql_catalog(mysql_conn):
+    # Read the columns, keys, indexes and foreign keys of every table in the
+    # current database with one information_schema query each
+    cursor = mysql_conn.cursor()
     try:
-        cursor = mysql_conn.cursor()
-        cursor.execute("SHOW DATABASES")
-        databases = [db[0] for db in cursor.fetchall()]
-        
-        if db_name in databases:
-            action = input(f"Database {db_name} already exists. Would you like to 'Replace' or 'Append'? ").lower()
-            if action == 'replace':
-                cursor.execute(f"DROP DATABASE {db_name}")
-                cursor.execute(f"CREATE DATABASE {db_name}")
-                logging.info(f"Database {db_name} dropped and recreated.")
-                return True  # Signal that the database was dropped and recreated
-            elif action == 'append':
-                logging.info(f"Appending to existing database {db_name}.")
-                return False  # Signal that the database was not dropped
-            else:
-                logging.error("Invalid option. Exiting.")
-                exit(1)
-        else:
-            cursor.execute(f"CREATE DATABASE {db_name}")
-            logging.info(f"Database {db_name} not found. Created new database.")
-            return False  # Signal that the database was not dropped
-    except Exception as e:
-        logging.error(f"An error occurred while checking/creating the MySQL database: {e}")
+        cursor.execute("""SELECT table_name FROM information_schema.tables
+                          WHERE table_schema = DATABASE() AND table_type = 'BASE TABLE' ORDER BY table_name""")
+        catalog = {row[0]: {'columns': [], 'primary_key': [], 'indexes': [], 'foreign_keys': []} for row in cursor.fetchall()}
+
+        cursor.execute("""SELECT table_name, column_name, column_type, is_nullable FROM information_schema.columns
+                          WHERE table_schema = DATABASE() ORDER BY table_name, ordinal_position""")
+        for table, column, column_type, nullable in cursor.fetchall():
+            if table in catalog:
+                catalog[table]['columns'].append((column, column_type, nullable == 'YES'))
+
+        # Indexes as [index name, unique, columns]. Functional indexes have
+        # no column name and can't be recreated.
+        cursor.execute("""SELECT table_name, index_name, non_unique, column_name FROM information_schema.statistics
+                          WHERE table_schema = DATABASE() ORDER BY table_name, index_name, seq_in_index""")
+        indexes = {}
+        for table, index_name, non_unique, column in cursor.fetchall():
+            if table not in catalog:
+                continue
+            if index_name == 'PRIMARY':
+                catalog[table]['primary_key'].append(column)
+                continue
+            if (table, index_name) not in indexes:
+                indexes[(table, index_name)] = [index_name, not int(non_unique), []]
+                catalog[table]['indexes'].append(indexes[(table, index_name)])
+            indexes[(table, index_name)][2].append(column)
+        for table, info in catalog.items():
+            for index in [index for index in info['indexes'] if None in index[2]]:
+                logging.warning(f"Index {index[0]} of table {table} is on an expression and is not copied.")
+                info['indexes'].remove(index)
+
+        # Foreign keys as [referenced table, columns, referenced columns]
+        cursor.execute("""SELECT table_name, constraint_name, column_name, referenced_table_name, referenced_column_name
+                          FROM information_schema.key_column_usage
+                          WHERE table_schema = DATABASE() AND referenced_table_name IS NOT NULL
+                          ORDER BY table_name, constraint_name, ordinal_position""")
+        foreign_keys = {}
+        for table, constraint, column, referenced_table, referenced_column in cursor.fetchall():
+            if table not in catalog:
+                continue
+            if (table, constraint) not in foreign_keys:
+                foreign_keys[(table, constraint)] = [referenced_table, [], []]
+                catalog[table]['foreign_keys'].append(foreign_keys[(table, constraint)])
+            foreign_keys[(table, constraint)][1].append(column)
+            foreign_keys[(table, constraint)][2].append(referenced_column)
+    finally:
+        cursor.close()
+    return catalog
+
+def build_sqlite_create_table_query(table, info):
+    # A single integer primary key becomes INTEGER PRIMARY KEY, the rowid
+    # alias, so SQLite doesn't have to maintain a separate key index
+    types = {column: mysql_to_sqlite_type(column_type) for column, column_type, _ in info['columns']}
+    rowid_key = info['primary_key'][0] if len(info['primary_key']) == 1 and types[info['primary_key'][0]] == 'INTEGER' else None
+
+    definitions = []
+    for column, _, nullable in info['columns']:
+        definition = f"{quote_identifier(column)} {types[column]}"
+        if column == rowid_key:
+            definition += " PRIMARY KEY"
+        elif not nullable:
+            definition += " NOT NULL"
+        definitions.append(definition)
+    if info['primary_key'] and rowid_key is None:
+        definitions.append(f"PRIMARY KEY ({', '.join(quote_identifier(column) for column in info['primary_key'])})")
+    for referenced_table, columns, referenced_columns in info['foreign_keys']:
+        definitions.append(f"FOREIGN KEY ({', '.join(quote_identifier(column) for column in columns)}) "
+                           f"REFERENCES {quote_identifier(referenced_table)} ({', '.join(quote_identifier(column) for column in referenced_columns)})")
+    return f"CREATE TABLE {quote_identifier(table)} ({', '.join(definitions)})"
+
+def create_sqlite_indexes(sqlite_conn, table, info, used_names):
+    # Index names are per table in MySQL but per database in SQLite, so a
+    # name that is already taken gets the table name as a prefix
+    start_time = time.perf_counter()
+    for index_name, unique, columns in info['indexes']:
+        name = index_name if index_name not in used_names else f"{table}_{index_name}"
+        used_names.add(name)
+        create_index_query = (f"CREATE {'UNIQUE ' if unique else ''}INDEX {quote_identifier(name)} ON {quote_identifier(table)} "
+                              f"({', '.join(quote_identifier(column) for column in columns)})")
+        logging.info(f"Executing query: {create_index_query}")
+        sqlite_conn.execute(create_index_query)
+    sqlite_conn.commit()
+    if info['indexes']:
+        logging.info(f"Created {len(info['indexes'])} indexes on table {table} in {time.perf_counter() - start_time:.2f}s.")
+
+def set_sqlite_load_pragmas(sqlite_conn, journal_mode='off', cache_mb=DEFAULT_CACHE_MB):
+    # Trade crash safety for speed while the file is built. With journal_mode
+    # OFF an interrupted load can leave a damaged file that has to be rebuilt.
+    # Returns the settings they replace, for restore_sqlite_pragmas.
+    previous = {pragma: sqlite_conn.execute(f"PRAGMA {pragma}").fetchone()[0] for pragma in LOAD_PRAGMAS}
+    sqlite_conn.execute(f"PRAGMA journal_mode = {journal_mode.upper()}")
+    sqlite_conn.execute("PRAGMA synchronous = OFF")
+    sqlite_conn.execute(f"PRAGMA cache_size = -{cache_mb * 1024}")
+    sqlite_conn.execute("PRAGMA temp_store = MEMORY")
+    logging.info(f"SQLite load settings: journal_mode={journal_mode.upper()}, synchronous=OFF, cache_size={cache_mb} MB.")
+    return previous
+
+def restore_sqlite_pragmas(sqlite_conn, previous):
+    # journal_mode WAL is stored in the file, so without this the file would
+    # stay in WAL mode for every program that opens it later
+    for pragma in LOAD_PRAGMAS:
+        sqlite_conn.execute(f"PRAGMA {pragma} = {previous[pragma]}")
+    logging.info(f"SQLite settings restored: journal_mode={previous['journal_mode'].upper()}, synchronous={previous['synchronous']}.")
+
+def get_peak_memory_mb():
+    # Peak RSS of this process, or None where it can't be measured
+    if resource is None:
         return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak /= 1024  # ru_maxrss is bytes on macOS and KiB on Linux
+    return peak / 1024
+
+def log_peak_memory(table_name):
+    peak_mb = get_peak_memory_mb()
+    if peak_mb is not None:
+        logging.info(f"Memory high-water mark after table {table_name}: {peak_mb:.1f} MB")
+
+def copy_mysql_table(mysql_conn, sqlite_conn, table, column_count, chunk_rows=DEFAULT_CHUNK_ROWS, commit_rows=DEFAULT_COMMIT_ROWS):
+    # Stream the table through an unbuffered server-side cursor, so only one
+    # chunk is held in memory, and write it with executemany in large transactions
+    insert_query = f"INSERT INTO {quote_identifier(table)} VALUES ({', '.join(['?'] * column_count)})"
+    logging.info(f"Transferring rows for table {table} in chunks of {chunk_rows}.")
+    start_time = time.perf_counter()
+    copied = 0
+    uncommitted = 0
+    cursor = mysql_conn.cursor(pymysql.cursors.SSCursor)
+    try:
+        cursor.execute(f"SELECT * FROM {quote_mysql_identifier(table)}")
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            if not rows:
+                break
+            try:
+                sqlite_conn.executemany(insert_query, rows)
+            except Exception as e:
+                logging.error(f"Failed to insert rows {copied} to {copied + len(rows) - 1} into table {table}. Error: {e}")
+                raise  # Re-raise the caught exception
+            copied += len(rows)
+            uncommitted += len(rows)
+            if uncommitted >= commit_rows:
+                sqlite_conn.commit()
+                uncommitted = 0
     finally:
-        if cursor:
-            cursor.close()  # Explicitly close the cursor
-
-
-def extract_constraints_from_sqlite_schema(sqlite_schema, table_name):
-    # Regex to match foreign key and check constraints in SQLite schema
-    foreign_key_re = re.compile(r"FOREIGN KEY\s*\(.*\)\s*REFERENCES.*", re.IGNORECASE)
-    check_re = re.compile(r"CHECK\s*\(.*\)", re.IGNORECASE)
-
-    foreign_keys = foreign_key_re.findall(sqlite_schema)
-    checks = check_re.findall(sqlite_schema)
-
-    return foreign_keys, checks
-
-def add_constraints_to_mysql_table(mysql_cursor, table_name, foreign_keys, checks):
-    for fk in foreign_keys:
-        alter_table_query = f"ALTER TABLE {table_name} ADD {fk}"
-        mysql_cursor.execute(alter_table_query)
-        logging.info(f"Added FOREIGN KEY constraint to table {table_name}")
-
-    for check in checks:
-        alter_table_query = f"ALTER TABLE {table_name} ADD {check}"
-        mysql_cursor.execute(alter_table_query)
-        logging.info(f"Added CHECK constraint to table {table_name}")
-
-def transfer_data(sqlite_conn, mysql_conn):
-    # Step 1: List all tables in SQLite database
-    sqlite_cursor = sqlite_conn.cursor()
-    sqlite_cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = sqlite_cursor.fetchall()
-    
-    # Initialize MySQL cursor
-    mysql_cursor = mysql_conn.cursor()
-    
+        cursor.close()
+    sqlite_conn.commit()
+
+    elapsed = time.perf_counter() - start_time
+    rate = copied / elapsed if elapsed > 0 else 0
+    logging.info(f"Transferred {copied} rows for table {table} in {elapsed:.2f}s ({rate:.0f} rows/sec).")
+    log_peak_memory(table)
+    return copied
+
+def transfer_data(mysql_conn, sqlite_conn, chunk_rows=DEFAULT_CHUNK_ROWS, commit_rows=DEFAULT_COMMIT_ROWS, on_exists='ask'):
+    # Step 1: Read the schema of all tables in the MySQL database
+    catalog = read_mysql_catalog(mysql_conn)
+    existing_tables = {row[0] for row in sqlite_conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+
     # Dictionary to store user decisions for each table
     user_decisions = {}
 
-    # First Loop: Check if tables exist in MySQL and gather user decisions
-    for table in tables:
-        table_name = table[0]
-        
-        # Check if table exists in MySQL
-        mysql_cursor.execute(f"SHOW TABLES LIKE '{table_name}'")
-        result = mysql_cursor.fetchone()
-        
-        # If table exists, ask for user action
-        if result:
-            while True:  # Loop for user input
-                action = input(f"Table {table_name} already exists. Would you like to 'Replace' or 'Append'? ").lower()
-                if action in ['replace', 'append']:
-                    logging.info(f"User chose to '{action}' table {table_name}.")
-                    user_decisions[table_name] = action
-                    break  # Exit the loop if valid input
-                else:
-                    logging.warning("Invalid option. Please enter 'Replace' or 'Append'.")
-    
-    # Second Loop: Execute the user decisions and transfer data
-    for table in tables:
-        table_name = table[0]
-        action = user_decisions.get(table_name, None)
-        
+    # First Loop: Decide what to do with tables that already exist in SQLite
+    for table in catalog:
+        if table not in existing_tables:
+            continue
+        action = on_exists
+        while action == 'ask':  # Loop for user input
+            action = input(f"Table {table} already exists. Would you like to 'Replace', 'Append' or 'Skip'? ").lower()
+            if action not in TABLE_POLICIES or action == 'ask':
+                logging.warning("Invalid option. Please enter 'Replace', 'Append' or 'Skip'.")
+                action = 'ask'
+        logging.info(f"Table {table} already exists. Using policy '{action}'.")
+        user_decisions[table] = action
+
+    # Second Loop: Create the tables and transfer the data. SQLite doesn't
+    # enforce foreign keys unless asked to, so tables can load in any order.
+    start_time = time.perf_counter()
+    total_rows = 0
+    tables_to_index = []
+    for table, info in catalog.items():
+        action = user_decisions.get(table, None)
+        if action == 'skip':
+            logging.info(f"Table {table} skipped.")
+            continue
+
         # Drop table if 'replace' action was chosen
         if action == 'replace':
-            mysql_cursor.execute(f"DROP TABLE {table_name}")
-            logging.info(f"Table {table_name} dropped.")
-        
-        # Create table if it's a new table or 'replace' action was chosen
+            sqlite_conn.execute(f"DROP TABLE {quote_identifier(table)}")
+            logging.info(f"Table {table} dropped.")
+
+        # Create table if it's a new table or 'replace' action was chosen.
+        # Secondary indexes are built after the load.
         if action != 'append':
-            sqlite_cursor.execute(f"PRAGMA table_info({table_name})")
-            columns = sqlite_cursor.fetchall()
-            create_table_query = f"CREATE TABLE {table_name} ("
-            for column in columns:
-                mysql_type = sqlite_to_mysql_type(column[2])
-                create_table_query += f"{column[1]} {mysql_type}, "
-            create_table_query = create_table_query[:-2] + ")"
-            mysql_cursor.execute(create_table_query)
-            logging.info(f"Table {table_name} created.")
-
-
-            # Fetch and create indexes
-            sqlite_cursor.execute(f"PRAGMA index_list({table_name})")
-            index_list = sqlite_cursor.fetchall()
-            for index in index_list:
-                index_name = index[1]
-                sqlite_cursor.execute(f"PRAGMA index_info({index_name})")
-                index_columns = [col[2] for col in sqlite_cursor.fetchall()]
-                index_columns_str = ",".join(index_columns)
-                unique = "UNIQUE" if index[2] else ""
-                create_index_query = f"CREATE {unique} INDEX {index_name} ON {table_name} ({index_columns_str})"
-                mysql_cursor.execute(create_index_query)
-                logging.info(f"Index {index_name} created.")
-
-            # Fetch SQLite table schema
-            sqlite_cursor.execute(f"SELECT sql FROM sqlite_master WHERE type='table' AND name='{table_name}'")
-            sqlite_schema = sqlite_cursor.fetchone()[0]
-
-            # Extract constraints from SQLite schema
-            foreign_keys, checks = extract_constraints_from_sqlite_schema(sqlite_schema, table_name)
-
-            # Add constraints to MySQL table
-            add_constraints_to_mysql_table(mysql_cursor, table_name, foreign_keys, checks)
-        
+            create_table_query = build_sqlite_create_table_query(table, info)
+            logging.info(f"Executing query: {create_table_query}")
+            sqlite_conn.execute(create_table_query)
+            logging.info(f"Table {table} created.")
+            tables_to_index.append(table)
+
         # Transfer Data
-        sqlite_cursor.execute(f"SELECT * FROM {table_name}")
-        rows = sqlite_cursor.fetchall()
-        logging.info(f"Transferring {len(rows)} rows for table {table_name}.")
-        for row in rows:
-            values = ', '.join(['%s' for _ in row])
-            insert_query = f"INSERT INTO {table_name} VALUES ({values})"
-            try:
-                mysql_cursor.execute(insert_query, row)
-            except Exception as e:
-                logging.error(f"Failed to execute query: {insert_query}. Error: {e}")
-                raise  # Re-raise the caught exception
-    
-    # Commit and close connections
-    mysql_conn.commit()
-    mysql_cursor.close()
-    sqlite_cursor.close()
+        total_rows += copy_mysql_table(mysql_conn, sqlite_conn, table, len(info['columns']), chunk_rows, commit_rows)
+
+    used_index_names = {row[0] for row in sqlite_conn.execute("SELECT name FROM sqlite_master WHERE type='index'")}
+    for table in tables_to_index:
+        create_sqlite_indexes(sqlite_conn, table, catalog[table], used_index_names)
+
+    elapsed = time.perf_counter() - start_time
+    logging.info(f"Transferred {total_rows} rows from {len(catalog)} tables in {elapsed:.2f}s ({total_rows / elapsed if elapsed > 0 else 0:.0f} rows/sec).")
 
 
 def main():
-    parser = argparse.ArgumentParser(description='SQLite to MySQL Converter')
-    parser.add_argument('--sqlite', help='Path to the SQLite database file you want to convert.')
-    parser.add_argument('--server', help='Address of the MySQL server to which you want to transfer the data.')
+    parser = argparse.ArgumentParser(description='MySQL to SQLite Converter')
+    parser.add_argument('--server', help='Address of the MySQL server you want to copy the data from.')
     parser.add_argument('--username', help='Username for the MySQL database.')
     parser.add_argument('--password', help='Password for the MySQL database.')
-    parser.add_argument('--database', help='Name of the MySQL database where you want to transfer the data.')
-    
+    parser.add_argument('--database', help='Name of the MySQL database you want to convert.')
+    parser.add_argument('--sqlite', help='Path of the SQLite database file to write. It is created if it does not exist.')
+    parser.add_argument('--on-exists', choices=TABLE_POLICIES, default='ask', help='What to do with tables that already exist in the SQLite file. Defaults to asking for each table.')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help='Number of rows fetched from MySQL at a time. Bounds memory use.')
+    parser.add_argument('--commit-rows', type=int, default=DEFAULT_COMMIT_ROWS, help='Number of rows written to SQLite between two commits.')
+    parser.add_argument('--journal-mode', choices=JOURNAL_MODES, default='off', help='SQLite journal_mode during the load. "off" is fastest, "wal" keeps the file safe if the load is interrupted.')
+    parser.add_argument('--cache-mb', type=int, default=DEFAULT_CACHE_MB, help='SQLite page cache size in MB during the load.')
+
     args = parser.parse_args()
-    
+
     sqlite_db_path, mysql_server, mysql_username, mysql_password, mysql_db_name = get_user_inputs(args)
-    
-    print("Welcome to the SQLite to MySQL Converter!")
-    
+
+    print("Welcome to the MySQL to SQLite Converter!")
+
     sqlite_conn = None
     mysql_conn = None
+    previous_pragmas = None
     try:
         # Establish database connections
+        mysql_conn = connect_mysql(mysql_server, mysql_username, mysql_password, mysql_db_name)
         sqlite_conn = connect_sqlite(sqlite_db_path)
-        mysql_conn = connect_mysql(mysql_server, mysql_username, mysql_password)
-        create_mysql_db_if_not_exists(mysql_conn, mysql_db_name)
+        register_sqlite_adapters()
+        previous_pragmas = set_sqlite_load_pragmas(sqlite_conn, args.journal_mode, args.cache_mb)
+
+        transfer_data(mysql_conn, sqlite_conn, args.chunk_rows, args.commit_rows, args.on_exists)
 
-        mysql_conn.close()
-        mysql_conn = connect_mysql(mysql_server, mysql_username, mysql_password, mysql_db_name)
-        
-        # Check if MySQL database exists and reconnect if necessary
-        was_dropped = check_mysql_db(mysql_conn, mysql_db_name)
-        if was_dropped:
-            mysql_conn.close()
-            mysql_conn = connect_mysql(mysql_server, mysql_username, mysql_password, mysql_db_name)
-        
-        if mysql_conn and sqlite_conn:
-            # Start a transaction
-            mysql_conn.begin()
-            transfer_data(sqlite_conn, mysql_conn)
-            # Commit transaction
-            mysql_conn.commit()
-        elif not sqlite_conn:
-            logging.error(f"Unable to open the SQLite database {sqlite_db_path}")
-        else:
-            logging.error(f"Unable to open the MySQL database - Server: {mysql_server}, Username: {mysql_username}, Database: {mysql_db_name}")
-            
     except Exception as e:
         logging.exception(f"An error occurred: {e}")
-        if mysql_conn:
-            mysql_conn.rollback()
-        
+        if sqlite_conn:
+            sqlite_conn.rollback()
+
     finally:
         if sqlite_conn:
+            if previous_pragmas:
+                restore_sqlite_pragmas(sqlite_conn, previous_pragmas)
             sqlite_conn.close()
         if mysql_conn:
             mysql_conn.close()
@@ -0,0 +1,47 @@
+import importlib.util
+import os
+
+import pytest
+
+TOOL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(scope='session')
+def mysql2sqlite():
+    # main.py of this tool, loaded under its own name so it can't clash with
+    # the main.py of another tool in the same test run
+    spec = importlib.util.spec_from_file_location('mysql2sqlite_main', os.path.join(TOOL_DIR, 'main.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+class RecordingCursor:
+    # Stands in for a pymysql cursor: keeps the statements it was given and
+    # answers fetches from the results queued in results
+    def __init__(self):
+        self.queries = []
+        self.results = []
+        self.closed = False
+
+    def execute(self, query, args=None):
+        self.queries.append(query)
+
+    def fetchall(self):
+        return self.results.pop(0)
+
+    def close(self):
+        self.closed = True
+
+class RecordingConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def cursor(self, cursor_class=None):
+        return self._cursor
+
+@pytest.fixture
+def mysql_cursor():
+    return RecordingCursor()
+
+@pytest.fixture
+def mysql_conn(mysql_cursor):
+    return RecordingConnection(mysql_cursor)
@@ -0,0 +1,82 @@
+import sqlite3
+
+import pytest
+
+@pytest.mark.parametrize('mysql_type, sqlite_type', [
+    ('int(11)', 'INTEGER'),
+    ('bigint(20) unsigned', 'INTEGER'),
+    ('tinyint(1)', 'BOOLEAN'),
+    ('tinyint(4)', 'INTEGER'),
+    ('decimal(10,2)', 'NUMERIC'),
+    ('double', 'REAL'),
+    ('varchar(64)', 'TEXT'),
+    ("enum('a','b')", 'TEXT'),
+    ('timestamp', 'DATETIME'),
+    ('time(3)', 'TIME'),
+    ('varbinary(16)', 'BLOB'),
+    ('bit(1)', 'BLOB'),
+    ('geometry', 'TEXT'),
+])
+def test_mysql_types_map_to_sqlite_affinities(mysql2sqlite, mysql_type, sqlite_type):
+    assert mysql2sqlite.mysql_to_sqlite_type(mysql_type) == sqlite_type
+
+def queue_catalog(mysql_cursor):
+    # Answers to the four information_schema queries of read_mysql_catalog
+    mysql_cursor.results = [
+        [('orders',), ('order_items',)],
+        [('orders', 'id', 'int(11)', 'NO'), ('orders', 'note', 'text', 'YES'),
+         ('order_items', 'order_id', 'int(11)', 'NO'), ('order_items', 'line', 'smallint(6)', 'NO'), ('order_items', 'sku', 'varchar(32)', 'YES')],
+        [('orders', 'PRIMARY', 0, 'id'), ('orders', 'by_note', 1, None),
+         ('order_items', 'PRIMARY', 0, 'order_id'), ('order_items', 'PRIMARY', 0, 'line'),
+         ('order_items', 'by_sku', 0, 'sku'), ('order_items', 'by_sku', 0, 'line')],
+        [('order_items', 'fk_order', 'order_id', 'orders', 'id')],
+    ]
+
+def test_read_mysql_catalog(mysql2sqlite, mysql_conn, mysql_cursor):
+    queue_catalog(mysql_cursor)
+    catalog = mysql2sqlite.read_mysql_catalog(mysql_conn)
+
+    assert catalog['orders'] == {'columns': [('id', 'int(11)', False), ('note', 'text', True)], 'primary_key': ['id'], 'indexes': [], 'foreign_keys': []}
+    assert catalog['order_items']['primary_key'] == ['order_id', 'line']
+    assert catalog['order_items']['indexes'] == [['by_sku', True, ['sku', 'line']]]
+    assert catalog['order_items']['foreign_keys'] == [['orders', ['order_id'], ['id']]]
+    assert mysql_cursor.closed
+
+def test_create_table_queries(mysql2sqlite, mysql_conn, mysql_cursor):
+    queue_catalog(mysql_cursor)
+    catalog = mysql2sqlite.read_mysql_catalog(mysql_conn)
+
+    # A single integer key becomes the rowid alias, a composite one a table constraint
+    assert mysql2sqlite.build_sqlite_create_table_query('orders', catalog['orders']) == 'CREATE TABLE "orders" ("id" INTEGER PRIMARY KEY, "note" TEXT)'
+    assert mysql2sqlite.build_sqlite_create_table_query('order_items', catalog['order_items']) == (
+        'CREATE TABLE "order_items" ("order_id" INTEGER NOT NULL, "line" INTEGER NOT NULL, "sku" TEXT, PRIMARY KEY ("order_id", "line"), '
+        'FOREIGN KEY ("order_id") REFERENCES "orders" ("id"))')
+
+    sqlite_conn = sqlite3.connect(':memory:')
+    for table, info in catalog.items():
+        sqlite_conn.execute(mysql2sqlite.build_sqlite_create_table_query(table, info))
+    # Index names are per database in SQLite, so a taken name gets the table as a prefix
+    used_names = {'by_sku'}
+    mysql2sqlite.create_sqlite_indexes(sqlite_conn, 'order_items', catalog['order_items'], used_names)
+    assert sqlite_conn.execute("SELECT name, sql FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL").fetchall() == [
+        ('order_items_by_sku', 'CREATE UNIQUE INDEX "order_items_by_sku" ON "order_items" ("sku", "line")')]
+    sqlite_conn.close()
+
+def test_rowid_alias_only_for_integer_keys(mysql2sqlite):
+    info = {'columns': [('code', 'char(3)', False)], 'primary_key': ['code'], 'indexes': [], 'foreign_keys': []}
+    assert mysql2sqlite.build_sqlite_create_table_query('currencies', info) == 'CREATE TABLE "currencies" ("code" TEXT NOT NULL, PRIMARY KEY ("code"))'
+
+def test_load_pragmas_are_restored(mysql2sqlite, tmp_path):
+    db_path = str(tmp_path / 'out.db')
+    sqlite_conn = sqlite3.connect(db_path)
+    previous = mysql2sqlite.set_sqlite_load_pragmas(sqlite_conn, 'wal', 16)
+    assert sqlite_conn.execute("PRAGMA journal_mode").fetchone() == ('wal',)
+    assert sqlite_conn.execute("PRAGMA synchronous").fetchone() == (0,)
+    mysql2sqlite.restore_sqlite_pragmas(sqlite_conn, previous)
+    assert {pragma: sqlite_conn.execute(f"PRAGMA {pragma}").fetchone()[0] for pragma in mysql2sqlite.LOAD_PRAGMAS} == previous
+    sqlite_conn.close()
+
+    # WAL mode is stored in the file, so it shows in the next connection
+    sqlite_conn = sqlite3.connect(db_path)
+    assert sqlite_conn.execute("PRAGMA journal_mode").fetchone() == ('delete',)
+    sqlite_conn.close()
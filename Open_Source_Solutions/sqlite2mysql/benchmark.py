@@ -0,0 +1,298 @@
+import argparse
+import concurrent.futures
+import datetime
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+import main as transfer
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+FIXTURES = ['narrow', 'wide', 'blob', 'fk-chain', 'mixed']
+FIXTURE_VERSION = 2
+PHASES = ['ddl', 'load', 'index', 'constraints']
+WIDE_COLUMNS = 12
+BLOB_POOL_SIZE = 64
+INSERT_CHUNK_ROWS = 10000
+DEFAULT_BLOB_BYTES = 4096
+DEFAULT_CHAIN_DEPTH = 4
+DEFAULT_THRESHOLD = 10.0
+
+def insert_in_chunks(conn, query, rows):
+    # Insert a generator of rows without holding more than one chunk in memory
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == INSERT_CHUNK_ROWS:
+            conn.executemany(query, batch)
+            batch = []
+    if batch:
+        conn.executemany(query, batch)
+
+def create_narrow_tables(conn, rows, options):
+    conn.execute("""CREATE TABLE narrow (
+    id INTEGER PRIMARY KEY,
+    value INTEGER,
+    label TEXT
+)""")
+    conn.execute("CREATE INDEX idx_narrow_value ON narrow (value)")
+    insert_in_chunks(conn, "INSERT INTO narrow VALUES (?, ?, ?)", ((i, i * 7 % 1000003, f"label {i}") for i in range(1, rows + 1)))
+
+def create_wide_tables(conn, rows, options):
+    # Integer, real and text columns side by side
+    columns = ([f"int_{n} INTEGER" for n in range(WIDE_COLUMNS)] + [f"real_{n} REAL" for n in range(WIDE_COLUMNS)]
+               + [f"text_{n} TEXT" for n in range(WIDE_COLUMNS)])
+    conn.execute("CREATE TABLE wide (\n    id INTEGER PRIMARY KEY,\n    " + ",\n    ".join(columns) + "\n)")
+    conn.execute("CREATE INDEX idx_wide_int_0 ON wide (int_0)")
+    placeholders = ', '.join('?' * (len(columns) + 1))
+    insert_in_chunks(conn, f"INSERT INTO wide VALUES ({placeholders})",
+                     ((i,) + (i,) * WIDE_COLUMNS + (i / 3,) * WIDE_COLUMNS + (f"text {i}",) * WIDE_COLUMNS for i in range(1, rows + 1)))
+
+def create_blob_tables(conn, rows, options):
+    # Rows cycle through a small pool of random payloads, so generating
+    # millions of rows doesn't cost millions of os.urandom calls. (BLOB is a
+    # reserved word in MySQL, and sqlite2mysql doesn't quote table names.)
+    conn.execute("""CREATE TABLE blobs (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    payload BLOB
+)""")
+    payloads = [os.urandom(options['blob_bytes']) for _ in range(BLOB_POOL_SIZE)]
+    insert_in_chunks(conn, "INSERT INTO blobs VALUES (?, ?, ?)", ((i, f"blob {i}", payloads[i % BLOB_POOL_SIZE]) for i in range(1, rows + 1)))
+
+def create_fk_chain_tables(conn, rows, options):
+    # chain_0 <- chain_1 <- ... each referencing the table before it. The
+    # rows are split evenly across the tables.
+    depth = options['chain_depth']
+    table_rows = max(rows // depth, 1)
+    for level in range(depth):
+        foreign_key = f",\n    FOREIGN KEY (parent_id) REFERENCES chain_{level - 1}(id)" if level else ''
+        conn.execute(f"""CREATE TABLE chain_{level} (
+    id INTEGER PRIMARY KEY,
+    parent_id INTEGER,
+    value TEXT{foreign_key}
+)""")
+        conn.execute(f"CREATE INDEX idx_chain_{level}_parent ON chain_{level} (parent_id)")
+        insert_in_chunks(conn, f"INSERT INTO chain_{level} VALUES (?, ?, ?)",
+                         ((i, (i % table_rows) + 1 if level else None, f"value {i}") for i in range(1, table_rows + 1)))
+
+def create_mixed_tables(conn, rows, options):
+    # Every column type sqlite_to_mysql_type maps, including text that
+    # needs escaping, NULLs and binary data
+    conn.execute("CREATE TABLE mixed (id INTEGER, name TEXT, score REAL, flag BOOLEAN, payload BLOB, note TEXT)")
+    insert_in_chunks(conn, "INSERT INTO mixed VALUES (?, ?, ?, ?, ?, ?)",
+                     ((i, f"name {i}", i / 7, i % 2, os.urandom(32), None if i % 10 == 0 else f"line {i}\twith tab\nand newline \\ backslash")
+                      for i in range(rows)))
+
+FIXTURE_BUILDERS = {
+    'narrow': create_narrow_tables,
+    'wide': create_wide_tables,
+    'blob': create_blob_tables,
+    'fk-chain': create_fk_chain_tables,
+    'mixed': create_mixed_tables,
+}
+
+def create_fixture(fixture_dir, fixture, rows, options):
+    # Build a synthetic SQLite database, or reuse one an earlier run left in
+    # fixture_dir. The file is only renamed into place once it is complete.
+    db_path = os.path.join(fixture_dir, f"{fixture}-{rows}-v{FIXTURE_VERSION}-{options['blob_bytes']}-{options['chain_depth']}.db")
+    if os.path.exists(db_path):
+        print(f"Reusing fixture {db_path}")
+        return db_path
+
+    print(f"Creating fixture {fixture} with {rows} rows...")
+    start_time = time.perf_counter()
+    temp_path = db_path + '.tmp'
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    conn = sqlite3.connect(temp_path)
+    try:
+        conn.execute("PRAGMA journal_mode = OFF")
+        conn.execute("PRAGMA synchronous = OFF")
+        FIXTURE_BUILDERS[fixture](conn, rows, options)
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(temp_path, db_path)
+    print(f"Created fixture {db_path} in {time.perf_counter() - start_time:.2f}s.")
+    return db_path
+
+def get_peak_rss_mb():
+    # Peak RSS of this process and of the transfer workers it waited for
+    if resource is None:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    if sys.platform == 'darwin':
+        peak /= 1024  # ru_maxrss is bytes on macOS and KiB on Linux
+    return round(peak / 1024, 1)
+
+def get_table_counts(sqlite_conn):
+    tables = [row[0] for row in sqlite_conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'")]
+    return {table: sqlite_conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables}
+
+def run_transfer(db_path, settings):
+    # Transfer one fixture into a freshly created scratch database. Runs in
+    # its own process, so the peak RSS belongs to this transfer only.
+    server, username, password, database = settings['server'], settings['username'], settings['password'], settings['database']
+    mysql_conn = transfer.connect_mysql(server, username, password)
+    cursor = mysql_conn.cursor()
+    cursor.execute(f"DROP DATABASE IF EXISTS {database}")
+    cursor.execute(f"CREATE DATABASE {database}")
+    cursor.close()
+    mysql_conn.close()
+
+    local_infile = settings['loader'] == 'load-data'
+    sqlite_conn = transfer.connect_sqlite(db_path)
+    mysql_conn = transfer.connect_mysql(server, username, password, database, local_infile)
+    try:
+        table_counts = get_table_counts(sqlite_conn)
+        connection_settings = (db_path, server, username, password, database)
+
+        start_time = time.perf_counter()
+        phase_seconds = transfer.transfer_data(sqlite_conn, mysql_conn, batch_rows=settings['batch_rows'], batch_bytes=settings['batch_bytes'],
+                                               chunk_rows=settings['chunk_rows'], workers=settings['workers'], connection_settings=connection_settings, loader=settings['loader'],
+                                               defer_indexes=settings['defer_indexes'], on_exists='replace')
+        elapsed = time.perf_counter() - start_time
+
+        # The transfer closes its cursor, so count the rows with a new one
+        mysql_cursor = mysql_conn.cursor()
+        for table, rows in table_counts.items():
+            mysql_cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            loaded_rows = mysql_cursor.fetchone()[0]
+            if loaded_rows != rows:
+                raise RuntimeError(f"Table {table} has {loaded_rows} rows in MySQL, expected {rows}")
+        mysql_cursor.close()
+    finally:
+        sqlite_conn.close()
+        mysql_conn.close()
+
+    rows = sum(table_counts.values())
+    megabytes = os.path.getsize(db_path) / (1024 * 1024)
+    return {
+        'rows': rows,
+        'megabytes': round(megabytes, 2),
+        'seconds': round(elapsed, 3),
+        'rows_per_sec': round(rows / elapsed) if elapsed > 0 else 0,
+        'mb_per_sec': round(megabytes / elapsed, 2) if elapsed > 0 else 0,
+        'peak_rss_mb': get_peak_rss_mb(),
+        'phases': {phase: round(phase_seconds[phase], 3) for phase in PHASES},
+    }
+
+def get_run_name(fixture, rows, loader, workers, defer_indexes):
+    return f"{fixture}-{rows}-{loader}-w{workers}{'-deferred' if defer_indexes else ''}"
+
+def run_suite(args):
+    options = {'blob_bytes': args.blob_bytes, 'chain_depth': args.chain_depth}
+    results = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        fixture_dir = args.fixture_dir or temp_dir
+        os.makedirs(fixture_dir, exist_ok=True)
+        for fixture in args.fixtures:
+            for rows in args.rows:
+                db_path = create_fixture(fixture_dir, fixture, rows, options)
+                for loader in args.loaders:
+                    for workers in args.workers:
+                        settings = {
+                            'server': args.server, 'username': args.username, 'password': args.password, 'database': args.database,
+                            'loader': loader, 'workers': workers, 'defer_indexes': args.defer_indexes,
+                            'chunk_rows': args.chunk_rows, 'batch_rows': args.batch_rows, 'batch_bytes': args.batch_bytes,
+                        }
+                        name = get_run_name(fixture, rows, loader, workers, args.defer_indexes)
+                        print(f"Running {name}...")
+                        # A fresh process per run keeps peak RSS from carrying over
+                        with concurrent.futures.ProcessPoolExecutor(max_workers=1) as executor:
+                            result = executor.submit(run_transfer, db_path, settings).result()
+                        results.append({'name': name, 'fixture': fixture, 'loader': loader, 'workers': workers,
+                                        'defer_indexes': args.defer_indexes, **result})
+    return results
+
+def print_results(results):
+    print(f"{'Run':<40}{'Rows':>12}{'Seconds':>10}{'Rows/sec':>12}{'MB/sec':>9}{'Peak MB':>9}  Phases (s)")
+    for result in results:
+        phases = ' '.join(f"{phase}={result['phases'][phase]}" for phase in PHASES)
+        print(f"{result['name']:<40}{result['rows']:>12}{result['seconds']:>10}{result['rows_per_sec']:>12}{result['mb_per_sec']:>9}"
+              f"{str(result['peak_rss_mb']):>9}  {phases}")
+
+def load_baseline(baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    return {result['name']: result for result in baseline['results']}
+
+def get_change(new, old):
+    # Relative change in percent, or None when there's nothing to compare
+    if new is None or not old:
+        return None
+    return (new - old) / old * 100
+
+def format_change(change):
+    return f"{change:+.1f}%" if change is not None else 'n/a'
+
+def compare_with_baseline(results, baseline, threshold):
+    # A run regresses when its throughput drops, or its peak memory grows,
+    # by more than threshold percent. Returns the names of those runs.
+    regressions = []
+    print(f"\nComparison with baseline (regression threshold {threshold}%):")
+    for result in results:
+        old = baseline.get(result['name'])
+        if old is None:
+            print(f"{result['name']}: not in the baseline")
+            continue
+        throughput_change = get_change(result['rows_per_sec'], old['rows_per_sec'])
+        memory_change = get_change(result['peak_rss_mb'], old.get('peak_rss_mb'))
+        phase_changes = ', '.join(f"{phase} {old['phases'][phase]}s -> {result['phases'][phase]}s"
+                                  for phase in PHASES if phase in old.get('phases', {}) and old['phases'][phase] != result['phases'][phase])
+        regressed = (throughput_change is not None and throughput_change < -threshold) or (memory_change is not None and memory_change > threshold)
+        if regressed:
+            regressions.append(result['name'])
+        print(f"{'REGRESSION ' if regressed else ''}{result['name']}: rows/sec {old['rows_per_sec']} -> {result['rows_per_sec']} "
+              f"({format_change(throughput_change)}), peak RSS {format_change(memory_change)}{'; ' + phase_changes if phase_changes else ''}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the SQLite to MySQL Converter on synthetic SQLite databases.')
+    parser.add_argument('--server', required=True, help='Address of a MySQL or MariaDB server used for the benchmark.')
+    parser.add_argument('--username', required=True, help='Username for the MySQL server.')
+    parser.add_argument('--password', default='', help='Password for the MySQL server.')
+    parser.add_argument('--database', default='sqlite2mysql_bench', help='Scratch database. It is dropped and recreated for every run.')
+    parser.add_argument('--fixtures', nargs='+', choices=FIXTURES, default=FIXTURES, help='Synthetic databases to transfer.')
+    parser.add_argument('--rows', nargs='+', type=int, default=[10000], help='Number of rows in each fixture. Every size is a separate run.')
+    parser.add_argument('--fixture-dir', help='Directory where fixtures are kept and reused by later runs. Defaults to a temporary directory.')
+    parser.add_argument('--blob-bytes', type=int, default=DEFAULT_BLOB_BYTES, help='Size of each payload in the blob fixture.')
+    parser.add_argument('--chain-depth', type=int, default=DEFAULT_CHAIN_DEPTH, help='Number of tables in the fk-chain fixture.')
+    parser.add_argument('--loaders', nargs='+', choices=transfer.LOADERS, default=['insert'], help='Loaders to compare.')
+    parser.add_argument('--workers', nargs='+', type=int, default=[1], help='Worker counts to compare.')
+    parser.add_argument('--defer-indexes', action='store_true', help='Build indexes and constraints after the load.')
+    parser.add_argument('--chunk-rows', type=int, default=transfer.DEFAULT_CHUNK_ROWS, help='Number of rows read from SQLite at a time.')
+    parser.add_argument('--batch-rows', type=int, default=transfer.DEFAULT_BATCH_ROWS, help='Maximum number of rows sent in one INSERT batch.')
+    parser.add_argument('--batch-bytes', type=int, default=transfer.DEFAULT_BATCH_BYTES, help='Maximum size in bytes of one multi-row INSERT statement.')
+    parser.add_argument('--output', help='Optional path of a JSON file the results are written to. It can be used as a later --baseline.')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against.')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help='Percent drop in rows/sec, or growth in peak RSS, that counts as a regression.')
+
+    args = parser.parse_args()
+    if args.baseline and not os.path.exists(args.baseline):
+        parser.error(f"baseline file {args.baseline} does not exist")
+
+    results = run_suite(args)
+    print_results(results)
+
+    if args.output:
+        settings = {key: value for key, value in vars(args).items() if key not in ('password', 'output', 'baseline')}
+        with open(args.output, 'w') as f:
+            json.dump({'created': datetime.datetime.now().isoformat(timespec='seconds'), 'settings': settings, 'results': results}, f, indent=4)
+
+    if args.baseline:
+        regressions = compare_with_baseline(results, load_baseline(args.baseline), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} runs regressed: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
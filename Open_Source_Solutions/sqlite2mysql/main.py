@@ -1,8 +1,26 @@
 import argparse
+import cProfile
+import datetime
+import fnmatch
+import io
+import json
+import pstats
 import sqlite3
 import pymysql
 import logging
 import re
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+try:
+    import resource  # Not available on Windows
+except ImportError:
+    resource = None
 
 logging.basicConfig(filename='db_transfer.log', level=logging.INFO, 
                     format='%(asctime)s - %(levelname)s - %(message)s')
@@ -10,6 +28,91 @@ console = logging.StreamHandler()
 console.setLevel(logging.INFO)
 logging.getLogger('').addHandler(console)
 
+# Number of rows read from SQLite at a time
+DEFAULT_CHUNK_ROWS = 10000
+# Default sizing for multi-row INSERT statements
+DEFAULT_BATCH_ROWS = 1000
+DEFAULT_BATCH_BYTES = 1024 * 1024
+# Room left in max_allowed_packet for the packet header and statement prefix
+PACKET_HEADROOM = 1024
+# Row loaders: parameterized INSERT batches or LOAD DATA LOCAL INFILE
+LOADERS = ['insert', 'load-data']
+# Size a LOAD DATA spool file may reach before it is sent to the server
+DEFAULT_SPOOL_BYTES = 64 * 1024 * 1024
+# Phases timed by the metrics spans
+METRIC_PHASES = ['schema', 'ddl', 'fetch', 'insert', 'commit', 'index']
+# Number of call sites and allocation sites listed by --profile
+PROFILE_TOP = 30
+# Checkpoint journal: rows committed between two journal updates
+DEFAULT_COMMIT_ROWS = 100000
+JOURNAL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS journal_tables (
+    table_name TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    created INTEGER NOT NULL DEFAULT 0,
+    deferred INTEGER NOT NULL DEFAULT 0,
+    upsert INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT
+);
+CREATE TABLE IF NOT EXISTS journal_units (
+    table_name TEXT NOT NULL,
+    range_id TEXT NOT NULL,
+    key_column TEXT,
+    range_low INTEGER,
+    range_high INTEGER,
+    state TEXT NOT NULL,
+    last_key INTEGER,
+    rows_copied INTEGER NOT NULL DEFAULT 0,
+    total_rows INTEGER NOT NULL DEFAULT 0,
+    updated_at TEXT,
+    PRIMARY KEY (table_name, range_id)
+);
+CREATE TABLE IF NOT EXISTS journal_runs (
+    id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    rows_at_start INTEGER NOT NULL,
+    defer_indexes INTEGER
+);
+"""
+# Splitting of large tables into key ranges loaded concurrently
+DEFAULT_RANGE_MIN_ROWS = 1000000
+DEFAULT_RANGE_RETRIES = 2
+RANGE_SPLIT_METHODS = ['minmax', 'quantile']
+# What to do with a database or table that already exists in MySQL.
+# 'ask' prompts for every one of them.
+DATABASE_POLICIES = ['ask', 'replace', 'append']
+TABLE_POLICIES = ['ask', 'replace', 'append', 'skip', 'upsert', 'truncate']
+# Layout of the cached schema catalog. Caches of another version are reread.
+CATALOG_VERSION = 1
+
+# (metrics file, run id) while --metrics is on, and the spans not written yet
+metrics_settings = None
+metric_spans = {}
+# Incremental sync: high-water mark of every synced table, kept in MySQL so it
+# is committed in the same transaction as the rows it covers
+SYNC_STATE_TABLE = 'sqlite2mysql_sync_state'
+SYNC_STATE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {SYNC_STATE_TABLE} (
+    table_name VARCHAR(255) PRIMARY KEY,
+    key_column VARCHAR(255) NOT NULL,
+    high_water TEXT,
+    rows_synced BIGINT NOT NULL DEFAULT 0,
+    synced_at DATETIME
+)
+"""
+# Checkpoint journal: last key of every table or range, kept in MySQL as well
+# so it is committed in the same transaction as the rows it covers
+LOAD_PROGRESS_TABLE = 'sqlite2mysql_load_progress'
+LOAD_PROGRESS_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {LOAD_PROGRESS_TABLE} (
+    table_name VARCHAR(255) NOT NULL,
+    range_id VARCHAR(64) NOT NULL,
+    last_key TEXT,
+    rows_copied BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (table_name, range_id)
+)
+"""
+
 def sqlite_to_mysql_type(sqlite_type):
     type_mapping = {
         'INTEGER': 'INT',
@@ -53,9 +156,9 @@ def connect_sqlite(db_path):
         logging.error(f"Failed to connect to SQLite: {e}")
         raise ConnectionError("Failed to connect to SQLite")  # Raise custom exception
 
-def connect_mysql(server, username, password, db_name=None):
+def connect_mysql(server, username, password, db_name=None, local_infile=False):
     try:
-        conn = pymysql.connect(host=server, user=username, password=password, database=db_name)
+        conn = pymysql.connect(host=server, user=username, password=password, database=db_name, local_infile=local_infile)
         logging.info(f"Successfully connected to MySQL{' server' if db_name is None else f' database {db_name}'}")
         return conn
     except Exception as e:
@@ -72,7 +175,7 @@ def create_mysql_db_if_not_exists(conn, db_name):
         logging.info(f"Database {db_name} created.")
     cursor.close()
 
-def check_mysql_db(mysql_conn, db_name):
+def check_mysql_db(mysql_conn, db_name, policy='ask'):
     cursor = None
     try:
         cursor = mysql_conn.cursor()
@@ -80,7 +183,9 @@ def check_mysql_db(mysql_conn, db_name):
         databases = [db[0] for db in cursor.fetchall()]
         
         if db_name in databases:
-            action = input(f"Database {db_name} already exists. Would you like to 'Replace' or 'Append'? ").lower()
+            action = policy
+            if action == 'ask':
+                action = input(f"Database {db_name} already exists. Would you like to 'Replace' or 'Append'? ").lower()
             if action == 'replace':
                 cursor.execute(f"DROP DATABASE {db_name}")
                 cursor.execute(f"CREATE DATABASE {db_name}")
@@ -103,169 +208,1389 @@ def check_mysql_db(mysql_conn, db_name):
         if cursor:
             cursor.close()  # Explicitly close the cursor
 
+def get_mysql_tables(mysql_cursor):
+    # Names of all tables in the current database, in one round trip
+    mysql_cursor.execute("SELECT table_name FROM information_schema.tables WHERE table_schema = DATABASE()")
+    return {row[0] for row in mysql_cursor.fetchall()}
+
+def parse_table_policies(values):
+    # "pattern=policy" pairs such as "audit_*=append", checked in the given order
+    table_policies = []
+    for value in values or []:
+        pattern, _, policy = value.rpartition('=')
+        if not pattern or policy not in TABLE_POLICIES:
+            raise ValueError(f"Invalid table policy '{value}'. Use PATTERN=POLICY with one of: {', '.join(TABLE_POLICIES)}")
+        table_policies.append((pattern, policy))
+    return table_policies
+
+def load_policy_file(path):
+    # JSON file such as {"database": "append", "default": "skip", "tables": {"audit_*": "append"}}.
+    # Returns (database policy, default table policy, table policies).
+    with open(path) as f:
+        config = json.load(f)
+    if config.get('database', 'ask') not in DATABASE_POLICIES:
+        raise ValueError(f"Invalid database policy '{config['database']}' in {path}. Use one of: {', '.join(DATABASE_POLICIES)}")
+    if config.get('default', 'ask') not in TABLE_POLICIES:
+        raise ValueError(f"Invalid default policy '{config['default']}' in {path}. Use one of: {', '.join(TABLE_POLICIES)}")
+    table_policies = parse_table_policies(f"{pattern}={policy}" for pattern, policy in config.get('tables', {}).items())
+    return config.get('database'), config.get('default'), table_policies
+
+def get_table_policy(table, default_policy='ask', table_policies=None):
+    # The first pattern matching the table wins, otherwise the default applies
+    for pattern, policy in table_policies or []:
+        if fnmatch.fnmatchcase(table, pattern):
+            return policy
+    return default_policy
+
+def ask_table_policy(table):
+    while True:  # Loop for user input
+        action = input(f"Table {table} already exists. Would you like to 'Replace', 'Append', 'Skip', 'Upsert' or 'Truncate'? ").lower()
+        if action in TABLE_POLICIES and action != 'ask':
+            return action
+        logging.warning("Invalid option. Please enter 'Replace', 'Append', 'Skip', 'Upsert' or 'Truncate'.")
 
 def extract_constraints_from_sqlite_schema(sqlite_schema, table_name):
     # Regex to match foreign key and check constraints in SQLite schema
     foreign_key_re = re.compile(r"FOREIGN KEY\s*\(.*\)\s*REFERENCES.*", re.IGNORECASE)
     check_re = re.compile(r"CHECK\s*\(.*\)", re.IGNORECASE)
 
-    foreign_keys = foreign_key_re.findall(sqlite_schema)
+    # A schema written on one line yields all its foreign keys in one match.
+    # One per line keeps the comma that separates it from the next definition.
+    foreign_keys = [fk.rstrip().rstrip(',') for match in foreign_key_re.findall(sqlite_schema)
+                    for fk in re.split(r",\s*(?=FOREIGN KEY)", match, flags=re.IGNORECASE)]
     checks = check_re.findall(sqlite_schema)
 
     return foreign_keys, checks
 
+def build_constraint_clause(constraint):
+    # Remove only the last character if it is a closing parenthesis
+    cleaned_constraint = constraint[:-1] if constraint.endswith(")") else constraint
+    clause = f"ADD {cleaned_constraint}"
+    if not clause.endswith(")"):
+        clause += ")"  # Add closing parenthesis if missing
+    return clause
+
 def add_constraints_to_mysql_table(mysql_cursor, table_name, foreign_keys, checks):
     for fk in foreign_keys:
-        # Remove only the last character if it is a closing parenthesis
-        cleaned_fk = fk[:-1] if fk.endswith(")") else fk
-        alter_table_query = f"ALTER TABLE {table_name} ADD {cleaned_fk}"
-        if not alter_table_query.endswith(")"):
-            alter_table_query += ")"  # Add closing parenthesis if missing
+        alter_table_query = f"ALTER TABLE {table_name} {build_constraint_clause(fk)}"
         logging.info(f"Executing query: {alter_table_query}")
         mysql_cursor.execute(alter_table_query)
         logging.info(f"Added FOREIGN KEY constraint to table {table_name}")
 
     for check in checks:
-        # Remove only the last character if it is a closing parenthesis
-        cleaned_check = check[:-1] if check.endswith(")") else check
-        alter_table_query = f"ALTER TABLE {table_name} ADD {cleaned_check}"
-        if not alter_table_query.endswith(")"):
-            alter_table_query += ")"  # Add closing parenthesis if missing
+        alter_table_query = f"ALTER TABLE {table_name} {build_constraint_clause(check)}"
         logging.info(f"Executing query: {alter_table_query}")
         mysql_cursor.execute(alter_table_query)
         logging.info(f"Added CHECK constraint to table {table_name}")
 
-def sort_tables_based_on_foreign_keys(tables, sqlite_cursor):
-    sorted_tables = []
-    remaining_tables = {table[0]: set() for table in tables}
+def iter_sqlite_rows(sqlite_conn, table_name, chunk_rows=DEFAULT_CHUNK_ROWS, key=None, key_range=None):
+    # Stream the table in chunks so only one chunk is held in memory at a time.
+    # With a key range only rows with low <= key < high are read.
+    cursor = sqlite_conn.cursor()
+    try:
+        start_time = time.perf_counter()
+        if key_range is None:
+            cursor.execute(f"SELECT * FROM {table_name}")
+        else:
+            cursor.execute(f"SELECT * FROM {table_name} WHERE {key} >= ? AND {key} < ?", key_range)
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            record_span('fetch', table_name, time.perf_counter() - start_time, len(rows), get_rows_bytes(rows))
+            if not rows:
+                break
+            yield rows
+            start_time = time.perf_counter()
+    finally:
+        cursor.close()
+
+def iter_sqlite_rows_after(sqlite_conn, table_name, key, last_key=None, key_range=None, chunk_rows=DEFAULT_CHUNK_ROWS, inclusive=False,
+                           with_nulls=False):
+    # Stream rows in key order, each prefixed with its key, starting after
+    # last_key (or at it, when inclusive). with_nulls also reads the rows
+    # whose key is NULL, which come first.
+    conditions = []
+    params = []
+    if last_key is not None:
+        conditions.append(f"({key} {'>=' if inclusive else '>'} ?{f' OR {key} IS NULL' if with_nulls else ''})")
+        params.append(last_key)
+    if key_range is not None:
+        conditions.append(f"{key} >= ? AND {key} < ?")
+        params.extend(key_range)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    cursor = sqlite_conn.cursor()
+    try:
+        start_time = time.perf_counter()
+        cursor.execute(f"SELECT {key}, * FROM {table_name}{where} ORDER BY {key}", params)
+        while True:
+            rows = cursor.fetchmany(chunk_rows)
+            record_span('fetch', table_name, time.perf_counter() - start_time, len(rows), get_rows_bytes(rows))
+            if not rows:
+                break
+            yield rows
+            start_time = time.perf_counter()
+    finally:
+        cursor.close()
+
+def get_peak_memory_mb():
+    # Peak RSS of this process, or None where it can't be measured
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak /= 1024  # ru_maxrss is bytes on macOS and KiB on Linux
+    return peak / 1024
+
+def log_peak_memory(table_name):
+    peak_mb = get_peak_memory_mb()
+    if peak_mb is not None:
+        logging.info(f"Memory high-water mark after table {table_name}: {peak_mb:.1f} MB")
+
+def enable_metrics(settings):
+    # Start collecting spans for (metrics file, run id). Workers get the same
+    # settings, so their spans end up in the same file under the same run id.
+    global metrics_settings
+    metrics_settings = settings
+    metric_spans.clear()
+
+def get_rows_bytes(rows):
+    # Rough payload size of a chunk of rows, only computed while metrics are on
+    if metrics_settings is None:
+        return 0
+    size = 0
+    for row in rows:
+        for value in row:
+            if isinstance(value, (str, bytes)):
+                size += len(value)
+            elif value is not None:
+                size += 8
+    return size
+
+def record_span(phase, table, seconds, rows=0, size=0):
+    # Add to the totals of a table and phase; written out by flush_metrics
+    if metrics_settings is None:
+        return
+    span = metric_spans.setdefault((table, phase), {'seconds': 0.0, 'rows': 0, 'bytes': 0, 'calls': 0})
+    span['seconds'] += seconds
+    span['rows'] += rows
+    span['bytes'] += size
+    span['calls'] += 1
+
+def commit_mysql(mysql_conn, table=None):
+    start_time = time.perf_counter()
+    mysql_conn.commit()
+    record_span('commit', table, time.perf_counter() - start_time)
+
+def flush_metrics():
+    # Append the collected spans to the metrics file as JSON lines. Lines are
+    # written with one call each, so several processes can share the file.
+    if metrics_settings is None or not metric_spans:
+        return
+    metrics_path, run_id = metrics_settings
+    timestamp = datetime.datetime.now().isoformat(timespec='seconds')
+    with open(metrics_path, 'a') as f:
+        for (table, phase), span in metric_spans.items():
+            f.write(json.dumps({'run': run_id, 'time': timestamp, 'pid': os.getpid(), 'table': table, 'phase': phase,
+                                'seconds': round(span['seconds'], 6), 'rows': span['rows'], 'bytes': span['bytes'], 'calls': span['calls']}) + '\n')
+    metric_spans.clear()
+
+def escape_prometheus_label(value):
+    # Label values in the text format escape backslash, double quote and newline
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def write_prometheus_metrics(metrics_path, run_id, prometheus_path):
+    # Sum the spans of one run per table and phase into a textfile for the
+    # node_exporter textfile collector. Written to a temporary file and renamed,
+    # so the collector never reads half a file.
+    totals = {}
+    with open(metrics_path) as f:
+        for line in f:
+            span = json.loads(line)
+            if span['run'] != run_id:
+                continue
+            total = totals.setdefault((span['table'] or '', span['phase']), {'seconds': 0.0, 'rows': 0, 'bytes': 0})
+            for field in total:
+                total[field] += span[field]
+
+    lines = []
+    for field, description in (('seconds', 'Seconds spent in each phase of the last transfer.'),
+                               ('rows', 'Rows handled in each phase of the last transfer.'),
+                               ('bytes', 'Approximate bytes handled in each phase of the last transfer.')):
+        name = f"sqlite2mysql_phase_{field}"
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} gauge")
+        for (table, phase), total in sorted(totals.items()):
+            lines.append(f'{name}{{table="{escape_prometheus_label(table)}",phase="{phase}"}} {total[field]}')
+    lines.append("# HELP sqlite2mysql_last_run_timestamp_seconds Time the last transfer finished.")
+    lines.append("# TYPE sqlite2mysql_last_run_timestamp_seconds gauge")
+    lines.append(f"sqlite2mysql_last_run_timestamp_seconds {time.time():.0f}")
+
+    temp_path = f"{prometheus_path}.tmp"
+    with open(temp_path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(temp_path, prometheus_path)
+    logging.info(f"Wrote Prometheus metrics for {len(totals)} spans to {prometheus_path}.")
+
+def start_profiling():
+    # Profile calls with cProfile and allocations with tracemalloc
+    tracemalloc.start()
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+def write_profile_report(profiler, profile_path):
+    # Write the hottest call sites and the biggest allocation sites
+    profiler.disable()
+    snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    stream = io.StringIO()
+    stats = pstats.Stats(profiler, stream=stream)
+    stats.sort_stats('cumulative').print_stats(PROFILE_TOP)
+    stats.sort_stats('tottime').print_stats(PROFILE_TOP)
+    with open(profile_path, 'w') as f:
+        f.write(stream.getvalue())
+        f.write(f"\nTraced memory: {current / 1024 / 1024:.1f} MB current, {peak / 1024 / 1024:.1f} MB peak\n")
+        f.write(f"Top {PROFILE_TOP} allocation sites:\n")
+        for stat in snapshot.statistics('lineno')[:PROFILE_TOP]:
+            f.write(f"{stat}\n")
+    profiler.dump_stats(f"{profile_path}.prof")
+    logging.info(f"Wrote profile report to {profile_path} and raw cProfile stats to {profile_path}.prof.")
+
+def get_batch_byte_limit(mysql_cursor, batch_bytes):
+    # Keep every multi-row INSERT below the server's max_allowed_packet
+    mysql_cursor.execute("SELECT @@max_allowed_packet")
+    max_allowed_packet = int(mysql_cursor.fetchone()[0])
+    limit = min(batch_bytes, max_allowed_packet - PACKET_HEADROOM)
+    logging.info(f"Using batches of up to {limit} bytes (max_allowed_packet is {max_allowed_packet}).")
+    return limit
+
+def build_update_clause(update_columns):
+    # Rows whose key already exists get these columns from the new row
+    return " ON DUPLICATE KEY UPDATE " + ', '.join(f"{column} = VALUES({column})" for column in update_columns)
+
+def insert_rows(mysql_cursor, table_name, rows, batch_rows=DEFAULT_BATCH_ROWS, batch_bytes=DEFAULT_BATCH_BYTES, update_columns=None):
+    if not rows:
+        return 0
+
+    # pymysql's executemany rewrites "INSERT ... VALUES (%s, ...)" into one
+    # multi-row statement and starts a new one before max_stmt_length is exceeded.
+    # With update_columns, rows whose key already exists are updated instead.
+    values = ', '.join(['%s' for _ in rows[0]])
+    insert_query = f"INSERT INTO {table_name} VALUES ({values})"
+    if update_columns:
+        insert_query += build_update_clause(update_columns)
+    mysql_cursor.max_stmt_length = batch_bytes
+
+    inserted = 0
+    start_time = time.perf_counter()
+    for start in range(0, len(rows), batch_rows):
+        batch = rows[start:start + batch_rows]
+        try:
+            mysql_cursor.executemany(insert_query, batch)
+        except Exception as e:
+            logging.error(f"Failed to execute batch insert: {insert_query} (rows {start} to {start + len(batch) - 1}). Error: {e}")
+            raise  # Re-raise the caught exception
+        inserted += len(batch)
+    record_span('insert', table_name, time.perf_counter() - start_time, inserted, get_rows_bytes(rows))
+    return inserted
+
+def escape_load_data_value(value, hex_encode=False):
+    # Encode one value for LOAD DATA's default format: tab separated fields,
+    # backslash escapes and \N for NULL. BLOB columns are sent as hex and
+    # decoded with UNHEX() so arbitrary bytes survive any character set, and
+    # so does text or a number that SQLite's dynamic typing put in a BLOB column.
+    if value is None:
+        return b'\\N'
+    if isinstance(value, bytes):
+        data = value
+    elif isinstance(value, (int, float)) and not hex_encode:
+        return repr(value).encode('ascii')
+    else:
+        data = str(value).encode('utf-8')
+    if hex_encode:
+        return data.hex().encode('ascii')
+    return (data.replace(b'\\', b'\\\\')
+                .replace(b'\t', b'\\t')
+                .replace(b'\n', b'\\n')
+                .replace(b'\r', b'\\r')
+                .replace(b'\0', b'\\0'))
+
+def build_load_data_query(table_info, table, target=None):
+    # Route BLOB columns of the table's catalog entry through user variables so
+    # they can be UNHEX()ed. The rows are loaded into target, which defaults to
+    # the table itself.
+    columns = table_info['columns']
+    hex_columns = [sqlite_to_mysql_type(column[2]) == 'BLOB' for column in columns]
+    targets = []
+    assignments = []
+    for column, is_hex in zip(columns, hex_columns):
+        if is_hex:
+            targets.append(f"@{column[1]}")
+            assignments.append(f"{column[1]} = UNHEX(@{column[1]})")
+        else:
+            targets.append(column[1])
+
+    load_query = (f"LOAD DATA LOCAL INFILE %s INTO TABLE {target or table} CHARACTER SET utf8mb4 "
+                  f"FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+                  f"({', '.join(targets)})")
+    if assignments:
+        load_query += f" SET {', '.join(assignments)}"
+    return load_query, hex_columns
+
+def load_rows_with_load_data(table_info, mysql_cursor, table, row_chunks, spool_bytes=DEFAULT_SPOOL_BYTES, update_columns=None):
+    # Write rows to a TSV spool file and send it with LOAD DATA LOCAL INFILE
+    # every time it grows past spool_bytes. With update_columns each spool file
+    # is loaded into a temporary staging table and merged with the same
+    # ON DUPLICATE KEY UPDATE as the INSERT loader. (LOAD DATA ... REPLACE would
+    # delete colliding rows, firing ON DELETE cascades and losing the columns
+    # that aren't loaded.)
+    staging_table = f"sqlite2mysql_staging_{table}" if update_columns else None
+    load_query, hex_columns = build_load_data_query(table_info, table, staging_table)
+    if staging_table:
+        # Temporary tables don't end the transaction and LIKE copies no foreign keys
+        mysql_cursor.execute(f"CREATE TEMPORARY TABLE IF NOT EXISTS {staging_table} LIKE {table}")
+        merge_query = f"INSERT INTO {table} SELECT * FROM {staging_table}" + build_update_clause(update_columns)
+    spool = tempfile.NamedTemporaryFile(prefix=f"{table}_", suffix='.tsv', delete=False)
+    loaded = 0
+    spooled = 0
+    try:
+        def flush():
+            spool.flush()
+            start_time = time.perf_counter()
+            try:
+                mysql_cursor.execute(load_query, (spool.name,))
+            except Exception as e:
+                logging.error(f"LOAD DATA failed for table {table}. The server must allow local_infile. Error: {e}")
+                raise
+            warnings = getattr(mysql_cursor, 'warning_count', 0)
+            if warnings:
+                logging.warning(f"LOAD DATA into table {table} produced {warnings} warnings.")
+            if staging_table:
+                mysql_cursor.execute(merge_query)
+                mysql_cursor.execute(f"DELETE FROM {staging_table}")
+            record_span('insert', table, time.perf_counter() - start_time, spooled, spool.tell())
+            spool.seek(0)
+            spool.truncate()
+
+        for rows in row_chunks:
+            for row in rows:
+                spool.write(b'\t'.join([escape_load_data_value(value, is_hex) for value, is_hex in zip(row, hex_columns)]) + b'\n')
+            spooled += len(rows)
+            if spool.tell() >= spool_bytes:
+                flush()
+                loaded += spooled
+                spooled = 0
+        if spooled:
+            flush()
+            loaded += spooled
+        if staging_table:
+            mysql_cursor.execute(f"DROP TEMPORARY TABLE {staging_table}")
+    finally:
+        spool.close()
+        os.remove(spool.name)
+    return loaded
+
+def read_sqlite_catalog(sqlite_conn):
+    # Read the schema of every table in one query per kind of object, joining
+    # the pragma table-valued functions against sqlite_master. Columns and
+    # foreign keys keep the row layout of PRAGMA table_info / foreign_key_list.
+    catalog = {}
+    for name, sql in sqlite_conn.execute("SELECT name, sql FROM sqlite_master WHERE type='table'"):
+        without_rowid = bool(sql) and re.search(r"WITHOUT\s+ROWID", sql[sql.rfind(')'):], re.IGNORECASE) is not None
+        catalog[name] = {'sql': sql, 'without_rowid': without_rowid, 'columns': [], 'indexes': [], 'foreign_keys': []}
+
+    for row in sqlite_conn.execute("""SELECT m.name, p.cid, p.name, p.type, p."notnull", p.dflt_value, p.pk
+                                      FROM sqlite_master AS m JOIN pragma_table_info(m.name) AS p
+                                      WHERE m.type = 'table' ORDER BY m.name, p.cid"""):
+        catalog[row[0]]['columns'].append(list(row[1:]))
+
+    # Indexes as [index name, unique, columns]
+    indexes = {}
+    for table, index_name, unique, column in sqlite_conn.execute("""SELECT m.name, l.name, l."unique", i.name
+                                                                    FROM sqlite_master AS m JOIN pragma_index_list(m.name) AS l JOIN pragma_index_info(l.name) AS i
+                                                                    WHERE m.type = 'table' ORDER BY m.name, l.seq, i.seqno"""):
+        if (table, index_name) not in indexes:
+            indexes[(table, index_name)] = [index_name, bool(unique), []]
+            catalog[table]['indexes'].append(indexes[(table, index_name)])
+        indexes[(table, index_name)][2].append(column)
+
+    for row in sqlite_conn.execute("""SELECT m.name, f.id, f.seq, f."table", f."from", f."to"
+                                      FROM sqlite_master AS m JOIN pragma_foreign_key_list(m.name) AS f
+                                      WHERE m.type = 'table' ORDER BY m.name, f.id, f.seq"""):
+        catalog[row[0]]['foreign_keys'].append(list(row[1:]))
+    return catalog
+
+def load_sqlite_catalog(sqlite_conn, db_path=None, cache_path=None):
+    # Use the catalog cached in cache_path when it was read from the same file
+    # (modification time and schema_version), otherwise read and cache it again
+    schema_version = sqlite_conn.execute("PRAGMA schema_version").fetchone()[0]
+    cache_key = {'version': CATALOG_VERSION, 'mtime': os.path.getmtime(db_path) if db_path else None, 'schema_version': schema_version}
+    if cache_path and os.path.exists(cache_path):
+        try:
+            with open(cache_path) as f:
+                cached = json.load(f)
+            if cached.get('key') == cache_key:
+                logging.info(f"Using the schema catalog cached in {cache_path}.")
+                return cached['catalog']
+        except (OSError, ValueError) as e:
+            logging.warning(f"Ignoring unreadable schema catalog cache {cache_path}: {e}")
+
+    start_time = time.perf_counter()
+    catalog = read_sqlite_catalog(sqlite_conn)
+    logging.info(f"Read the schema of {len(catalog)} tables in {time.perf_counter() - start_time:.2f}s.")
+    if cache_path:
+        # Write a temporary file and rename it, so readers never see half a cache
+        temp_path = f"{cache_path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump({'key': cache_key, 'catalog': catalog}, f)
+        os.replace(temp_path, cache_path)
+    return catalog
+
+def get_table_dependencies(catalog):
+    # Map each table to the set of tables its foreign keys reference
+    return {table: {fk[2] for fk in info['foreign_keys']} for table, info in catalog.items()}
+
+def find_foreign_key_cycles(dependencies):
+    # Tarjan's algorithm, iterative so deep foreign key chains can't exhaust
+    # the recursion limit. Returns the strongly connected components.
+    index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    components = []
+    for root in dependencies:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(dependencies[root]))]
+        while work:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = lowlink[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(dependencies[child])))
+                    break
+                if child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    return components
+
+def plan_load_order(catalog):
+    # Order tables by foreign keys with Kahn's algorithm in O(tables + foreign keys).
+    # Returns (levels, dependencies, cyclic_references):
+    # - levels: lists of tables that only reference tables of earlier levels,
+    #   so the tables of one level can be loaded concurrently
+    # - dependencies: the tables each table has to wait for
+    # - cyclic_references: for tables on a foreign key cycle (or referencing
+    #   themselves), the referenced tables whose foreign keys can only be
+    #   added after the load. Leaving them out breaks every cycle.
+    dependencies = {table: {dep for dep in deps if dep in catalog} for table, deps in get_table_dependencies(catalog).items()}
+
+    component_of = {}
+    for number, component in enumerate(find_foreign_key_cycles(dependencies)):
+        for table in component:
+            component_of[table] = number
+        if len(component) > 1:
+            logging.warning(f"Foreign key cycle between tables {', '.join(sorted(component))}. Their foreign keys will be added after the load.")
+    cyclic_references = {}
+    for table, deps in dependencies.items():
+        cyclic = {dep for dep in deps if component_of[dep] == component_of[table]}
+        if cyclic:
+            cyclic_references[table] = cyclic
+            dependencies[table] = deps - cyclic
+
+    remaining = {table: len(deps) for table, deps in dependencies.items()}
+    dependents = {table: [] for table in dependencies}
+    for table, deps in dependencies.items():
+        for dep in deps:
+            dependents[dep].append(table)
+
+    levels = []
+    level = [table for table in dependencies if remaining[table] == 0]
+    while level:
+        levels.append(level)
+        next_level = []
+        for table in level:
+            for dependent in dependents[table]:
+                remaining[dependent] -= 1
+                if remaining[dependent] == 0:
+                    next_level.append(dependent)
+        level = next_level
+    return levels, dependencies, cyclic_references
+
+def sort_tables_based_on_foreign_keys(catalog):
+    levels, _, _ = plan_load_order(catalog)
+    return [table for level in levels for table in level]
+
+def get_sqlite_indexes(catalog, table):
+    # List (index name, unique, columns) for every index of a SQLite table
+    return [tuple(index) for index in catalog[table]['indexes']]
+
+def get_sqlite_constraints(catalog, table):
+    # Extract constraints from SQLite schema
+    return extract_constraints_from_sqlite_schema(catalog[table]['sql'], table)
+
+def get_sqlite_column_names(table_info):
+    return [column[1] for column in table_info['columns']]
+
+def get_primary_key_columns(catalog, table):
+    # Primary key columns of a SQLite table in key order, or None when MySQL
+    # can't index them as a primary key (TEXT and BLOB need a prefix length)
+    pk_columns = sorted((column for column in catalog[table]['columns'] if column[5]), key=lambda column: column[5])
+    if not pk_columns or any(sqlite_to_mysql_type(column[2]) in ('TEXT', 'BLOB') for column in pk_columns):
+        return None
+    return [column[1] for column in pk_columns]
+
+def is_primary_key_enforced(catalog, table):
+    # True when MySQL is sure to accept the SQLite primary key of a table's
+    # rows: the key can't hold NULLs (an INTEGER PRIMARY KEY, a WITHOUT ROWID
+    # table or NOT NULL columns) and only holds integers. SQLite lets other
+    # keys hold NULLs, and string, float or date keys that differ in SQLite
+    # can compare equal in MySQL.
+    pk_columns = [column for column in catalog[table]['columns'] if column[5]]
+    if not pk_columns or get_primary_key_columns(catalog, table) is None:
+        return False
+    if any(sqlite_to_mysql_type(column[2]) not in ('INT', 'BIGINT', 'SMALLINT', 'TINYINT(1)') for column in pk_columns):
+        return False
+    rowid_alias = len(pk_columns) == 1 and pk_columns[0][2].upper() == 'INTEGER'
+    return rowid_alias or catalog[table]['without_rowid'] or all(column[3] for column in pk_columns)
+
+def build_create_table_query(catalog, table, primary_key=False):
+    columns = catalog[table]['columns']
+    if not columns:
+        return None
+
+    create_table_query = f"CREATE TABLE {table} ("
+    for column in columns:
+        mysql_type = sqlite_to_mysql_type(column[2])
+        create_table_query += f"{column[1]} {mysql_type}, "
+    pk_columns = get_primary_key_columns(catalog, table) if primary_key else None
+    if pk_columns:
+        create_table_query += f"PRIMARY KEY ({', '.join(pk_columns)}), "
+    return create_table_query[:-2] + ")"
+
+def build_index_clauses(catalog, table):
+    # ALTER TABLE clauses that add every index and constraint of a table
+    clauses = []
+    for index_name, unique, index_columns in get_sqlite_indexes(catalog, table):
+        unique = "UNIQUE " if unique else ""
+        clauses.append(f"ADD {unique}INDEX {index_name} ({','.join(index_columns)})")
+
+    foreign_keys, checks = get_sqlite_constraints(catalog, table)
+    clauses.extend(build_constraint_clause(constraint) for constraint in foreign_keys + checks)
+    return clauses
+
+def get_referenced_table(foreign_key):
+    match = re.search(r"REFERENCES\s+[\"'`\[]?(\w+)", foreign_key, re.IGNORECASE)
+    return match.group(1) if match else None
+
+def create_mysql_table(catalog, mysql_cursor, table, defer_indexes=False, primary_key=False, skip_references=None):
+    create_table_query = build_create_table_query(catalog, table, primary_key)
+
+    # Add a check for empty table
+    if create_table_query is None:
+        logging.error(f"Table {table} has no columns. Skipping.")
+        return False
+    
+    # Log the query for debugging
+    logging.info(f"Executing query: {create_table_query}")
+
+    mysql_cursor.execute(create_table_query)
+    logging.info(f"Table {table} created.")
+
+    # Indexes and constraints are added by add_indexes_and_constraints after the load
+    if defer_indexes:
+        return True
+
+    # Fetch and create indexes
+    for index_name, unique, index_columns in get_sqlite_indexes(catalog, table):
+        index_columns_str = ",".join(index_columns)
+        unique = "UNIQUE" if unique else ""
+        create_index_query = f"CREATE {unique} INDEX {index_name} ON {table} ({index_columns_str})"
+        mysql_cursor.execute(create_index_query)
+        logging.info(f"Index {index_name} created.")
+
+    # Add constraints to MySQL table. Foreign keys to skip_references are
+    # added by add_deferred_foreign_keys once the referenced tables exist.
+    foreign_keys, checks = get_sqlite_constraints(catalog, table)
+    foreign_keys = [fk for fk in foreign_keys if get_referenced_table(fk) not in (skip_references or ())]
+    add_constraints_to_mysql_table(mysql_cursor, table, foreign_keys, checks)
+    return True
+
+def add_indexes_and_constraints(catalog, mysql_cursor, table):
+    # Build every index and constraint of a loaded table in one ALTER TABLE,
+    # so MySQL sorts the data once instead of maintaining indexes row by row
+    clauses = build_index_clauses(catalog, table)
+    if not clauses:
+        return
+
+    alter_table_query = f"ALTER TABLE {table} {', '.join(clauses)}"
+    logging.info(f"Executing query: {alter_table_query}")
+    start_time = time.perf_counter()
+    mysql_cursor.execute(alter_table_query)
+    elapsed = time.perf_counter() - start_time
+    record_span('index', table, elapsed)
+    logging.info(f"Added {len(clauses)} indexes and constraints to table {table} in {elapsed:.2f}s.")
+
+def add_deferred_foreign_keys(catalog, mysql_cursor, table, referenced_tables):
+    # Add the foreign keys create_mysql_table left out to break a cycle
+    foreign_keys, _ = get_sqlite_constraints(catalog, table)
+    clauses = [build_constraint_clause(fk) for fk in foreign_keys if get_referenced_table(fk) in referenced_tables]
+    if not clauses:
+        return
+
+    alter_table_query = f"ALTER TABLE {table} {', '.join(clauses)}"
+    logging.info(f"Executing query: {alter_table_query}")
+    start_time = time.perf_counter()
+    mysql_cursor.execute(alter_table_query)
+    record_span('index', table, time.perf_counter() - start_time)
+    logging.info(f"Added {len(clauses)} deferred foreign keys to table {table}.")
+
+def set_load_checks(mysql_cursor, enabled):
+    # Turn the per-row foreign key and unique checks of this session on or off
+    value = 1 if enabled else 0
+    mysql_cursor.execute(f"SET SESSION foreign_key_checks = {value}, unique_checks = {value}")
+    logging.info(f"foreign_key_checks and unique_checks {'enabled' if enabled else 'disabled'} for this session.")
+
+def open_journal(journal_path, reset=False):
+    # The journal is a SQLite sidecar file shared by the main process and workers
+    journal_conn = sqlite3.connect(journal_path, timeout=60)
+    journal_conn.executescript(JOURNAL_SCHEMA)
+    if 'defer_indexes' not in [column[1] for column in journal_conn.execute("PRAGMA table_info(journal_runs)")]:
+        journal_conn.execute("ALTER TABLE journal_runs ADD COLUMN defer_indexes INTEGER")  # Journal of an older version
+    if reset:
+        journal_conn.executescript("DELETE FROM journal_tables; DELETE FROM journal_units; DELETE FROM journal_runs;")
+    journal_conn.commit()
+    return journal_conn
+
+def get_range_id(key_range):
+    return '' if key_range is None else f"{key_range[0]}:{key_range[1]}"
+
+def get_journal_table(journal_conn, table):
+    # (state, created, deferred, upsert) of a table, or None if no run has touched it
+    return journal_conn.execute("SELECT state, created, deferred, upsert FROM journal_tables WHERE table_name = ?", (table,)).fetchone()
+
+def set_journal_table_state(journal_conn, table, state, created=False, deferred=False, upsert=False):
+    journal_conn.execute("""INSERT INTO journal_tables (table_name, state, created, deferred, upsert, updated_at) VALUES (?, ?, ?, ?, ?, datetime('now'))
+                            ON CONFLICT(table_name) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at""",
+                         (table, state, int(created), int(deferred), int(upsert)))
+    journal_conn.commit()
+
+def register_journal_unit(journal_conn, sqlite_cursor, table, key, key_range=None):
+    # Record a table or range to copy, with its number of rows for progress
+    # reporting. Keyed units estimate it from the span of their keys, which
+    # needs no scan and is exact while the keys have no gaps; it is replaced
+    # by the rows actually copied once the unit is loaded.
+    # Units recorded by an earlier run are kept as they are.
+    range_id = get_range_id(key_range)
+    if journal_conn.execute("SELECT 1 FROM journal_units WHERE table_name = ? AND range_id = ?", (table, range_id)).fetchone():
+        return
+    if key_range is not None:
+        total_rows = key_range[1] - key_range[0]
+    elif key is not None:
+        sqlite_cursor.execute(f"SELECT MIN({key}), MAX({key}) FROM {table}")
+        low, high = sqlite_cursor.fetchone()
+        total_rows = 0 if low is None else high - low + 1
+    else:
+        # Tables without an integer key or rowid can only be counted
+        sqlite_cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        total_rows = sqlite_cursor.fetchone()[0]
+    low, high = key_range if key_range is not None else (None, None)
+    journal_conn.execute("""INSERT INTO journal_units (table_name, range_id, key_column, range_low, range_high, state, total_rows, updated_at)
+                            VALUES (?, ?, ?, ?, ?, 'pending', ?, datetime('now'))""", (table, range_id, key, low, high, total_rows))
+    journal_conn.commit()
+
+def get_journal_ranges(journal_conn, table):
+    # Ranges an earlier run split the table into, as (key, ranges), or None
+    rows = journal_conn.execute("""SELECT key_column, range_low, range_high FROM journal_units
+                                   WHERE table_name = ? AND range_id != '' ORDER BY range_low""", (table,)).fetchall()
+    if not rows:
+        return None
+    return rows[0][0], [(low, high) for _, low, high in rows]
+
+def update_journal_unit(journal_conn, table, key_range, state, last_key, rows_copied):
+    # A loaded unit's estimated total becomes the number of rows it really had
+    journal_conn.execute("""UPDATE journal_units SET state = ?, last_key = ?, rows_copied = ?, updated_at = datetime('now'),
+                            total_rows = CASE WHEN ? = 'loaded' THEN ? ELSE total_rows END
+                            WHERE table_name = ? AND range_id = ?""", (state, last_key, rows_copied, state, rows_copied, table, get_range_id(key_range)))
+    journal_conn.commit()
+
+def start_journal_run(journal_conn, defer_indexes=False):
+    # Remember where this run started so progress reports can estimate its rate,
+    # and whether indexes were deferred so a resumed run builds them the same way
+    rows_at_start = journal_conn.execute("SELECT COALESCE(SUM(rows_copied), 0) FROM journal_units").fetchone()[0]
+    journal_conn.execute("INSERT INTO journal_runs (started_at, rows_at_start, defer_indexes) VALUES (?, ?, ?)", (time.time(), rows_at_start, int(defer_indexes)))
+    journal_conn.commit()
+
+def get_journal_defer_indexes(journal_conn):
+    # --defer-indexes of the run that started the journal, or None
+    run = journal_conn.execute("SELECT defer_indexes FROM journal_runs WHERE defer_indexes IS NOT NULL ORDER BY id LIMIT 1").fetchone()
+    return bool(run[0]) if run else None
+
+def log_journal_progress(journal_conn, description, rows_copied, total_rows):
+    copied, total = journal_conn.execute("SELECT COALESCE(SUM(rows_copied), 0), COALESCE(SUM(total_rows), 0) FROM journal_units").fetchone()
+    run = journal_conn.execute("SELECT started_at, rows_at_start FROM journal_runs ORDER BY id DESC LIMIT 1").fetchone()
+    message = f"Progress: {description} {rows_copied}/{total_rows} rows, overall {copied}/{total} rows"
+    if total:
+        message += f" ({copied / total:.1%})"
+    if run:
+        elapsed = time.time() - run[0]
+        rate = (copied - run[1]) / elapsed if elapsed > 0 else 0
+        if rate > 0:
+            eta = datetime.timedelta(seconds=int(max(total - copied, 0) / rate))
+            message += f", {rate:.0f} rows/sec, ETA {eta}"
+    logging.info(message)
+
+def describe_range(table, key=None, key_range=None):
+    if key_range is None:
+        return f"table {table}"
+    return f"table {table} range {key} [{key_range[0]}, {key_range[1]})"
+
+def load_row_chunks(table_info, mysql_cursor, table, row_chunks, loader='insert', batch_rows=DEFAULT_BATCH_ROWS, batch_bytes=DEFAULT_BATCH_BYTES, spool_bytes=DEFAULT_SPOOL_BYTES,
+                    update_columns=None):
+    if loader == 'load-data':
+        return load_rows_with_load_data(table_info, mysql_cursor, table, row_chunks, spool_bytes, update_columns)
+    inserted = 0
+    for rows in row_chunks:
+        inserted += insert_rows(mysql_cursor, table, rows, batch_rows, batch_bytes, update_columns)
+    return inserted
+
+def get_load_progress(mysql_cursor, table, key_range=None):
+    # (last key, rows copied) committed in MySQL for a table or range, or None
+    mysql_cursor.execute(f"SELECT last_key, rows_copied FROM {LOAD_PROGRESS_TABLE} WHERE table_name = %s AND range_id = %s", (table, get_range_id(key_range)))
+    progress = mysql_cursor.fetchone()
+    if progress is None:
+        return None
+    return json.loads(progress[0]), progress[1]
+
+def set_load_progress(mysql_cursor, table, key_range, last_key, rows_copied):
+    # Written before the commit of the rows it covers, so both are committed or neither
+    mysql_cursor.execute(f"""INSERT INTO {LOAD_PROGRESS_TABLE} (table_name, range_id, last_key, rows_copied) VALUES (%s, %s, %s, %s)
+                             ON DUPLICATE KEY UPDATE last_key = VALUES(last_key), rows_copied = VALUES(rows_copied)""",
+                         (table, get_range_id(key_range), json.dumps(last_key), rows_copied))
+
+def clear_load_progress(mysql_cursor, tables):
+    # A new run starts over, so the progress of an earlier one must not be used
+    if tables:
+        mysql_cursor.execute(f"DELETE FROM {LOAD_PROGRESS_TABLE} WHERE table_name IN ({', '.join(['%s'] * len(tables))})", list(tables))
+
+def copy_table_rows_with_journal(sqlite_conn, mysql_cursor, journal_conn, table, table_info, key_range=None, *, commit_rows=DEFAULT_COMMIT_ROWS, batch_rows=DEFAULT_BATCH_ROWS,
+                                 batch_bytes=DEFAULT_BATCH_BYTES, chunk_rows=DEFAULT_CHUNK_ROWS, loader='insert', spool_bytes=DEFAULT_SPOOL_BYTES, update_columns=None):
+    # Copy in key order and commit every commit_rows rows, recording the last
+    # committed key in the journal so a later run can continue right after it.
+    # The key is also written to MySQL in the transaction of the rows, as the
+    # journal can only be updated after MySQL commits: a crash in between
+    # would otherwise copy the last rows again on the next run.
+    mysql_conn = mysql_cursor.connection
+    key, state, last_key, rows_copied, total_rows = journal_conn.execute(
+        "SELECT key_column, state, last_key, rows_copied, total_rows FROM journal_units WHERE table_name = ? AND range_id = ?",
+        (table, get_range_id(key_range))).fetchone()
+    description = describe_range(table, key, key_range)
+    if state == 'loaded':
+        logging.info(f"Skipping {description}, it was loaded by an earlier run.")
+        return 0
+    progress = get_load_progress(mysql_cursor, table, key_range)
+
+    if key is None:
+        if progress is not None:
+            logging.info(f"Skipping {description}, it was committed by an earlier run.")
+            update_journal_unit(journal_conn, table, key_range, 'loaded', None, progress[1])
+            return 0
+        # Without an integer key or rowid the table can only be committed as a whole
+        inserted = load_row_chunks(table_info, mysql_cursor, table, iter_sqlite_rows(sqlite_conn, table, chunk_rows), loader, batch_rows, batch_bytes, spool_bytes,
+                                   update_columns)
+        set_load_progress(mysql_cursor, table, key_range, None, inserted)
+        commit_mysql(mysql_conn, table)
+        update_journal_unit(journal_conn, table, key_range, 'loaded', None, inserted)
+        log_journal_progress(journal_conn, description, inserted, total_rows)
+        return inserted
+
+    if progress is not None:
+        # Never behind the journal, which is only updated after MySQL commits
+        last_key, rows_copied = progress
+    if last_key is not None:
+        logging.info(f"Resuming {description} after {key} {last_key} ({rows_copied} rows already copied).")
+
+    inserted = 0
+    uncommitted = 0
+    for rows in iter_sqlite_rows_after(sqlite_conn, table, key, last_key, key_range, chunk_rows):
+        load_row_chunks(table_info, mysql_cursor, table, [[row[1:] for row in rows]], loader, batch_rows, batch_bytes, spool_bytes, update_columns)
+        uncommitted += len(rows)
+        last_key = rows[-1][0]
+        if uncommitted >= commit_rows:
+            inserted += uncommitted
+            uncommitted = 0
+            set_load_progress(mysql_cursor, table, key_range, last_key, rows_copied + inserted)
+            commit_mysql(mysql_conn, table)
+            update_journal_unit(journal_conn, table, key_range, 'loading', last_key, rows_copied + inserted)
+            log_journal_progress(journal_conn, description, rows_copied + inserted, total_rows)
+
+    inserted += uncommitted
+    set_load_progress(mysql_cursor, table, key_range, last_key, rows_copied + inserted)
+    commit_mysql(mysql_conn, table)
+    update_journal_unit(journal_conn, table, key_range, 'loaded', last_key, rows_copied + inserted)
+    log_journal_progress(journal_conn, description, rows_copied + inserted, total_rows)
+    return inserted
+
+def copy_table_rows(sqlite_conn, mysql_cursor, table, table_info, *, batch_rows=DEFAULT_BATCH_ROWS, batch_bytes=DEFAULT_BATCH_BYTES, chunk_rows=DEFAULT_CHUNK_ROWS, key=None, key_range=None,
+                    loader='insert', spool_bytes=DEFAULT_SPOOL_BYTES, journal_conn=None, commit_rows=DEFAULT_COMMIT_ROWS, upsert=False):
+    description = describe_range(table, key, key_range)
+    logging.info(f"Transferring rows for {description} in chunks of {chunk_rows} using {loader}{' (upsert)' if upsert else ''}.")
+    # Upserted rows update every column of the row they collide with
+    update_columns = get_sqlite_column_names(table_info) if upsert else None
+    start_time = time.perf_counter()
+    if journal_conn is not None:
+        inserted = copy_table_rows_with_journal(sqlite_conn, mysql_cursor, journal_conn, table, table_info, key_range, commit_rows=commit_rows, batch_rows=batch_rows,
+                                                batch_bytes=batch_bytes, chunk_rows=chunk_rows, loader=loader, spool_bytes=spool_bytes, update_columns=update_columns)
+    else:
+        row_chunks = iter_sqlite_rows(sqlite_conn, table, chunk_rows, key, key_range)
+        inserted = load_row_chunks(table_info, mysql_cursor, table, row_chunks, loader, batch_rows, batch_bytes, spool_bytes, update_columns)
+    elapsed = time.perf_counter() - start_time
+    rate = inserted / elapsed if elapsed > 0 else 0
+    logging.info(f"Transferred {inserted} rows for {description} in {elapsed:.2f}s ({rate:.0f} rows/sec).")
+    log_peak_memory(table)
+    return inserted
+
+def get_partition_key(catalog, table):
+    # An INTEGER PRIMARY KEY column, or the rowid, can be split into ranges
+    pk_columns = [column for column in catalog[table]['columns'] if column[5]]
+    if len(pk_columns) == 1 and pk_columns[0][2].upper() == 'INTEGER':
+        return pk_columns[0][1]
+    if catalog[table]['without_rowid']:
+        return None  # WITHOUT ROWID table without an integer primary key
+    return 'rowid'
+
+def split_key_range(sqlite_cursor, table, key, low, high, partitions, split='minmax'):
+    # Return half-open (low, high) ranges that together cover low..high
+    if split == 'quantile':
+        # Boundaries at evenly spaced row offsets, for tables with sparse keys
+        sqlite_cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        row_count = sqlite_cursor.fetchone()[0]
+        bounds = [low]
+        for i in range(1, partitions):
+            sqlite_cursor.execute(f"SELECT {key} FROM {table} ORDER BY {key} LIMIT 1 OFFSET ?", (row_count * i // partitions,))
+            bounds.append(sqlite_cursor.fetchone()[0])
+    else:
+        step = (high - low + 1) / partitions
+        bounds = [low + int(step * i) for i in range(partitions)]
+    bounds.append(high + 1)
+    bounds = sorted(set(bounds))  # Duplicate boundaries would give empty ranges
+    return list(zip(bounds[:-1], bounds[1:]))
+
+def plan_table_ranges(catalog, sqlite_cursor, tables, partitions, min_rows=DEFAULT_RANGE_MIN_ROWS, split='minmax'):
+    # Map each table big enough to be split to its partition key and ranges
+    table_ranges = {}
+    if partitions < 2:
+        return table_ranges
 
     for table in tables:
-        table_name = table[0]
-        sqlite_cursor.execute(f"PRAGMA foreign_key_list({table_name})")
-        foreign_keys = sqlite_cursor.fetchall()
-        for fk in foreign_keys:
-            referenced_table = fk[2]
-            remaining_tables[table_name].add(referenced_table)
-
-    while remaining_tables:
-        for table, dependencies in list(remaining_tables.items()):
-            if dependencies.issubset(sorted_tables):
-                sorted_tables.append(table)
-                del remaining_tables[table]
-
-    return sorted_tables
-
-def transfer_data(sqlite_conn, mysql_conn):
-    # Step 1: List all tables in SQLite database
+        key = get_partition_key(catalog, table)
+        if key is None:
+            logging.info(f"Table {table} has no integer key or rowid. It will be copied in one piece.")
+            continue
+        sqlite_cursor.execute(f"SELECT MIN({key}), MAX({key}) FROM {table}")
+        low, high = sqlite_cursor.fetchone()
+        if low is None or high - low + 1 < min_rows:
+            continue
+        ranges = split_key_range(sqlite_cursor, table, key, low, high, partitions, split)
+        table_ranges[table] = (key, ranges)
+        logging.info(f"Table {table} split into {len(ranges)} ranges on {key}.")
+
+    return table_ranges
+
+def copy_table_in_worker(table, table_info, connection_settings, *, batch_rows=DEFAULT_BATCH_ROWS, batch_bytes=DEFAULT_BATCH_BYTES, chunk_rows=DEFAULT_CHUNK_ROWS, key=None,
+                         key_range=None, loader='insert', spool_bytes=DEFAULT_SPOOL_BYTES, disable_checks=False, journal_path=None, commit_rows=DEFAULT_COMMIT_ROWS, upsert=False, worker_metrics_settings=None):
+    # Runs in a worker process with its own SQLite and MySQL connections.
+    # The table or range is committed as one transaction, so a failed attempt
+    # leaves nothing behind and can simply be retried. With a journal it is
+    # committed every commit_rows rows and a retry continues from the journal.
+    sqlite_db_path, mysql_server, mysql_username, mysql_password, mysql_db_name = connection_settings
+    sqlite_conn = None
+    mysql_conn = None
+    journal_conn = None
+    enable_metrics(worker_metrics_settings)
+    try:
+        if journal_path:
+            journal_conn = open_journal(journal_path)
+        sqlite_conn = connect_sqlite(sqlite_db_path)
+        mysql_conn = connect_mysql(mysql_server, mysql_username, mysql_password, mysql_db_name, loader == 'load-data')
+        mysql_cursor = mysql_conn.cursor()
+        if disable_checks:
+            set_load_checks(mysql_cursor, False)
+        inserted = copy_table_rows(sqlite_conn, mysql_cursor, table, table_info, batch_rows=batch_rows, batch_bytes=batch_bytes, chunk_rows=chunk_rows, key=key,
+                                   key_range=key_range, loader=loader, spool_bytes=spool_bytes, journal_conn=journal_conn, commit_rows=commit_rows, upsert=upsert)
+        commit_mysql(mysql_conn, table)
+        mysql_cursor.close()
+        return inserted
+    except Exception as e:
+        logging.error(f"Worker failed to transfer {describe_range(table, key, key_range)}: {e}")
+        if mysql_conn:
+            mysql_conn.rollback()
+        raise
+    finally:
+        if sqlite_conn:
+            sqlite_conn.close()
+        if mysql_conn:
+            mysql_conn.close()
+        if journal_conn:
+            journal_conn.close()
+        flush_metrics()
+
+def copy_tables_in_parallel(tables, dependencies, catalog, connection_settings, workers, *, batch_rows=DEFAULT_BATCH_ROWS, batch_bytes=DEFAULT_BATCH_BYTES, chunk_rows=DEFAULT_CHUNK_ROWS, table_ranges=None, range_retries=DEFAULT_RANGE_RETRIES,
+                            loader='insert', spool_bytes=DEFAULT_SPOOL_BYTES, disable_checks=False, journal_path=None, commit_rows=DEFAULT_COMMIT_ROWS,
+                            on_table_loaded=None, upsert_tables=None):
+    # A table is only started once every table it references has been loaded.
+    # Self references and tables outside this run can't block a table.
+    pending = {table: {dep for dep in dependencies.get(table, set()) if dep in tables and dep != table} for table in tables}
+    table_ranges = table_ranges or {}
+    upsert_tables = upsert_tables or set()
+    loaded = set()
+    running = {}
+    # Checkpoint of every range (or whole table): 'running', 'done' or 'failed'
+    checkpoints = {}
+    attempts = {}
+
+    def submit(executor, table, key_range):
+        key = table_ranges[table][0] if key_range is not None else None
+        future = executor.submit(copy_table_in_worker, table, catalog[table], connection_settings, batch_rows=batch_rows, batch_bytes=batch_bytes, chunk_rows=chunk_rows,
+                                 key=key, key_range=key_range, loader=loader, spool_bytes=spool_bytes, disable_checks=disable_checks, journal_path=journal_path,
+                                 commit_rows=commit_rows, upsert=table in upsert_tables, worker_metrics_settings=metrics_settings)
+        running[future] = (table, key_range)
+        checkpoints[(table, key_range)] = 'running'
+        attempts[(table, key_range)] = attempts.get((table, key_range), 0) + 1
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while pending or running:
+            ready = [table for table, deps in pending.items() if deps.issubset(loaded)]
+            for table in ready:
+                del pending[table]
+                for key_range in table_ranges.get(table, (None, [None]))[1]:
+                    submit(executor, table, key_range)
+                logging.info(f"Scheduled table {table} ({len(running)} tasks running, {len(pending)} tables waiting).")
+
+            if not running:
+                raise RuntimeError(f"Foreign key dependencies can't be satisfied for tables: {', '.join(sorted(pending))}")
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                table, key_range = running.pop(future)
+                key = table_ranges[table][0] if key_range is not None else None
+                description = describe_range(table, key, key_range)
+                try:
+                    future.result()
+                except Exception as e:
+                    checkpoints[(table, key_range)] = 'failed'
+                    if attempts[(table, key_range)] > range_retries:
+                        failed = [describe_range(t, table_ranges[t][0] if r is not None else None, r) for (t, r), state in checkpoints.items() if state == 'failed']
+                        logging.error(f"Giving up on {description} after {attempts[(table, key_range)]} attempts. Failed: {', '.join(failed)}")
+                        raise
+                    logging.warning(f"Retrying {description} after error: {e}")
+                    submit(executor, table, key_range)
+                    continue
+
+                checkpoints[(table, key_range)] = 'done'
+                table_tasks = [state for (t, _), state in checkpoints.items() if t == table]
+                if key_range is not None:
+                    logging.info(f"Checkpoint: {description} done ({table_tasks.count('done')}/{len(table_tasks)} ranges).")
+                if table_tasks.count('done') == len(table_tasks):
+                    loaded.add(table)
+                    if on_table_loaded:
+                        on_table_loaded(table)
+
+def register_table_units(journal_conn, catalog, sqlite_cursor, table, workers, range_partitions, range_min_rows, range_split):
+    # Record the units a table is copied in: its ranges when it is split
+    # across workers, otherwise the whole table keyed on its integer key
+    if get_journal_ranges(journal_conn, table):
+        return
+    table_ranges = plan_table_ranges(catalog, sqlite_cursor, [table], range_partitions, range_min_rows, range_split) if workers > 1 else {}
+    if table in table_ranges:
+        key, ranges = table_ranges[table]
+        for key_range in ranges:
+            register_journal_unit(journal_conn, sqlite_cursor, table, key, key_range)
+    else:
+        register_journal_unit(journal_conn, sqlite_cursor, table, get_partition_key(catalog, table))
+
+def mark_table_loaded(journal_conn, table):
+    # Tables waiting for deferred indexes are only done after the index phase
+    deferred = get_journal_table(journal_conn, table)[2]
+    set_journal_table_state(journal_conn, table, 'loaded' if deferred else 'done')
+
+def transfer_data(sqlite_conn, mysql_conn, *, batch_rows=DEFAULT_BATCH_ROWS, batch_bytes=DEFAULT_BATCH_BYTES, chunk_rows=DEFAULT_CHUNK_ROWS, workers=1, connection_settings=None,
+                  range_partitions=1, range_min_rows=DEFAULT_RANGE_MIN_ROWS, range_split='minmax', range_retries=DEFAULT_RANGE_RETRIES,
+                  loader='insert', spool_bytes=DEFAULT_SPOOL_BYTES, defer_indexes=False, disable_checks=False,
+                  journal_path=None, commit_rows=DEFAULT_COMMIT_ROWS, resume=False, on_exists='ask', table_policies=None, catalog=None):
+    if workers > 1 and connection_settings is None:
+        raise ValueError("connection_settings are required when using more than one worker")
+
+    # Step 1: Read the schema of all tables in the SQLite database
     sqlite_cursor = sqlite_conn.cursor()
-    sqlite_cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-    tables = sqlite_cursor.fetchall()
+    if catalog is None:
+        start_time = time.perf_counter()
+        catalog = read_sqlite_catalog(sqlite_conn)
+        record_span('schema', None, time.perf_counter() - start_time)
 
     # Sort tables based on foreign key dependencies
-    sorted_tables = sort_tables_based_on_foreign_keys(tables, sqlite_cursor)
+    levels, dependencies, cyclic_references = plan_load_order(catalog)
+    sorted_tables = [table for level in levels for table in level]
+    logging.info(f"Load order has {len(levels)} levels of tables that can be loaded together.")
 
-    
-    
     # Initialize MySQL cursor
     mysql_cursor = mysql_conn.cursor()
+    batch_bytes = get_batch_byte_limit(mysql_cursor, batch_bytes)
+
+    # Open the checkpoint journal. A new run starts from an empty journal.
+    journal_conn = None
+    if journal_path:
+        journal_conn = open_journal(journal_path, reset=not resume)
+        logging.info(f"{'Resuming from' if resume else 'Recording progress in'} journal {journal_path}.")
+        journal_defer_indexes = get_journal_defer_indexes(journal_conn)
+        if journal_defer_indexes is not None and journal_defer_indexes != defer_indexes:
+            logging.warning(f"The interrupted run was started {'with' if journal_defer_indexes else 'without'} --defer-indexes. Resuming it the same way.")
+            defer_indexes = journal_defer_indexes
+        # Register every table up front so progress reports know the total
+        for table in sorted_tables:
+            register_table_units(journal_conn, catalog, sqlite_cursor, table, workers, range_partitions, range_min_rows, range_split)
+        start_journal_run(journal_conn, defer_indexes)
+        mysql_cursor.execute(LOAD_PROGRESS_SCHEMA)
+        if not resume:
+            clear_load_progress(mysql_cursor, sorted_tables)
+        commit_mysql(mysql_conn)
     
     # Dictionary to store user decisions for each table
     user_decisions = {}
+    existing_tables = get_mysql_tables(mysql_cursor)
 
-    # First Loop: Check if tables exist in MySQL and gather user decisions
+    # First Loop: Decide what to do with tables that already exist in MySQL
     for table in sorted_tables:
-
-        print(f"Sorted Tables: {sorted_tables}")
-        print(f"Current Table: {table}")
-        
-        # Check if table exists in MySQL
-        mysql_cursor.execute(f"SHOW TABLES LIKE '{table}'")
-        result = mysql_cursor.fetchone()
+        # Tables an earlier run already started are picked up where they stopped
+        if journal_conn and get_journal_table(journal_conn, table):
+            continue
         
-        # If table exists, ask for user action
-        if result:
-            while True:  # Loop for user input
-                action = input(f"Table {table} already exists. Would you like to 'Replace' or 'Append'? ").lower()
-                if action in ['replace', 'append']:
-                    logging.info(f"User chose to '{action}' table {table}.")
-                    user_decisions[table] = action
-                    break  # Exit the loop if valid input
-                else:
-                    logging.warning("Invalid option. Please enter 'Replace' or 'Append'.")
+        # If table exists, apply its policy or ask for user action
+        if table in existing_tables:
+            action = get_table_policy(table, on_exists, table_policies)
+            if action == 'ask':
+                action = ask_table_policy(table)
+            logging.info(f"Table {table} already exists. Using policy '{action}'.")
+            # Checked before any table is changed, so a missing key stops the run with MySQL untouched
+            if action == 'upsert' and not has_upsert_key(catalog, mysql_cursor, table):
+                raise ValueError(f"Table {table} has no primary or unique key in MySQL on its SQLite columns, so its rows can't be upserted. "
+                                 f"Add the key to the MySQL table, or use another policy for it.")
+            user_decisions[table] = action
     
     # Second Loop: Execute the user decisions and transfer data
+    load_start_time = time.perf_counter()
+    if disable_checks:
+        set_load_checks(mysql_cursor, False)
+    tables_to_copy = []
+    tables_to_index = []
+    upsert_tables = set()
+    # Seconds spent creating tables, copying rows and building deferred indexes and foreign keys
+    phase_seconds = {'ddl': 0.0, 'load': 0.0, 'index': 0.0, 'constraints': 0.0}
     for table in sorted_tables:
         action = user_decisions.get(table, None)
-        
-        # Drop table if 'replace' action was chosen
-        if action == 'replace':
-            mysql_cursor.execute(f"DROP TABLE {table}")
-            logging.info(f"Table {table} dropped.")
-        
-        # Create table if it's a new table or 'replace' action was chosen
-        if action != 'append':
-            sqlite_cursor.execute(f"PRAGMA table_info({table})")
-            columns = sqlite_cursor.fetchall()
-
-            # Add a check for empty table
-            if not columns:
-                logging.error(f"Table {table} has no columns. Skipping.")
+
+        journal_table = get_journal_table(journal_conn, table) if journal_conn else None
+        if journal_table:
+            # Tables from an earlier run already exist in MySQL
+            state, _, deferred, upsert = journal_table
+            if state == 'done':
+                logging.info(f"Table {table} was completed by an earlier run. Skipping.")
                 continue
+            if deferred:
+                tables_to_index.append(table)
+            if upsert:
+                upsert_tables.add(table)
+            if state == 'loaded':
+                continue
+        else:
+            if action == 'skip':
+                logging.info(f"Table {table} skipped.")
+                if journal_conn:
+                    set_journal_table_state(journal_conn, table, 'done')
+                continue
+
+            ddl_start_time = time.perf_counter()
+            # Drop table if 'replace' action was chosen
+            if action == 'replace':
+                mysql_cursor.execute(f"DROP TABLE {table}")
+                logging.info(f"Table {table} dropped.")
+            elif action == 'truncate':
+                mysql_cursor.execute(f"TRUNCATE TABLE {table}")
+                logging.info(f"Table {table} truncated.")
+            elif action == 'upsert':
+                upsert_tables.add(table)
             
-            create_table_query = f"CREATE TABLE {table} ("
-            for column in columns:
-                mysql_type = sqlite_to_mysql_type(column[2])
-                create_table_query += f"{column[1]} {mysql_type}, "
-            create_table_query = create_table_query[:-2] + ")"
-            
-            # Log the query for debugging
-            logging.info(f"Executing query: {create_table_query}")
-
-            mysql_cursor.execute(create_table_query)
-            logging.info(f"Table {table} created.")
-
-
-            # Fetch and create indexes
-            sqlite_cursor.execute(f"PRAGMA index_list({table})")
-            index_list = sqlite_cursor.fetchall()
-            for index in index_list:
-                index_name = index[1]
-                sqlite_cursor.execute(f"PRAGMA index_info({index_name})")
-                index_columns = [col[2] for col in sqlite_cursor.fetchall()]
-                index_columns_str = ",".join(index_columns)
-                unique = "UNIQUE" if index[2] else ""
-                create_index_query = f"CREATE {unique} INDEX {index_name} ON {table} ({index_columns_str})"
-                mysql_cursor.execute(create_index_query)
-                logging.info(f"Index {index_name} created.")
-
-            # Fetch SQLite table schema
-            sqlite_cursor.execute(f"SELECT sql FROM sqlite_master WHERE type='table' AND name='{table}'")
-            sqlite_schema = sqlite_cursor.fetchone()[0]
-
-            # Extract constraints from SQLite schema
-            foreign_keys, checks = extract_constraints_from_sqlite_schema(sqlite_schema, table)
-
-            # Add constraints to MySQL table
-            add_constraints_to_mysql_table(mysql_cursor, table, foreign_keys, checks)
+            # Create table if it's a new table or 'replace' action was chosen
+            created = action in (None, 'replace')
+            if created:
+                # Foreign keys need an index on the columns they reference, which
+                # are usually the primary key. It is only created with the table
+                # when the rows can't break it; other keys are left out as before.
+                primary_key = is_primary_key_enforced(catalog, table)
+                if not create_mysql_table(catalog, mysql_cursor, table, defer_indexes, primary_key, cyclic_references.get(table)):
+                    continue
+                if defer_indexes or table in cyclic_references:
+                    tables_to_index.append(table)
+            phase_seconds['ddl'] += time.perf_counter() - ddl_start_time
+            record_span('ddl', table, time.perf_counter() - ddl_start_time)
+            if journal_conn:
+                # A truncated table starts out empty just like a new one
+                set_journal_table_state(journal_conn, table, 'created', created=created or action == 'truncate',
+                                        deferred=created and (defer_indexes or table in cyclic_references),
+                                        upsert=table in upsert_tables)
         
-        # Transfer Data
-        sqlite_cursor.execute(f"SELECT * FROM {table}")
-        rows = sqlite_cursor.fetchall()
-        logging.info(f"Transferring {len(rows)} rows for table {table}.")
-        for row in rows:
-            values = ', '.join(['%s' for _ in row])
-            insert_query = f"INSERT INTO {table} VALUES ({values})"
-            try:
-                mysql_cursor.execute(insert_query, row)
-            except Exception as e:
-                logging.error(f"Failed to execute query: {insert_query}. Error: {e}")
-                raise  # Re-raise the caught exception
+        # Transfer Data, or leave it to the workers once every table exists
+        copy_start_time = time.perf_counter()
+        if workers > 1:
+            tables_to_copy.append(table)
+        elif journal_conn:
+            # Copy each journal unit in turn; an earlier run may have split the table
+            key, ranges = get_journal_ranges(journal_conn, table) or (None, [None])
+            for key_range in ranges:
+                copy_table_rows(sqlite_conn, mysql_cursor, table, catalog[table], batch_rows=batch_rows, batch_bytes=batch_bytes, chunk_rows=chunk_rows, key=key,
+                                key_range=key_range, loader=loader, spool_bytes=spool_bytes, journal_conn=journal_conn, commit_rows=commit_rows,
+                                upsert=table in upsert_tables)
+            mark_table_loaded(journal_conn, table)
+        else:
+            copy_table_rows(sqlite_conn, mysql_cursor, table, catalog[table], batch_rows=batch_rows, batch_bytes=batch_bytes, chunk_rows=chunk_rows, loader=loader,
+                            spool_bytes=spool_bytes, upsert=table in upsert_tables)
+        phase_seconds['load'] += time.perf_counter() - copy_start_time
+
+    if tables_to_copy:
+        copy_start_time = time.perf_counter()
+        # The workers commit their own tables, so make the DDL visible to them first
+        commit_mysql(mysql_conn)
+        logging.info(f"Transferring {len(tables_to_copy)} tables with {workers} workers.")
+        # Foreign keys on a cycle are added after the load and aren't dependencies
+        if defer_indexes:
+            # Tables without foreign keys yet don't have to wait for anything
+            dependencies = {table: deps for table, deps in dependencies.items() if table not in tables_to_index}
+        if journal_conn:
+            # Use the ranges recorded in the journal, which survive a resume
+            table_ranges = {}
+            for table in tables_to_copy:
+                journal_ranges = get_journal_ranges(journal_conn, table)
+                if journal_ranges:
+                    table_ranges[table] = journal_ranges
+            on_table_loaded = lambda table: mark_table_loaded(journal_conn, table)
+        else:
+            table_ranges = plan_table_ranges(catalog, sqlite_cursor, tables_to_copy, range_partitions, range_min_rows, range_split)
+            on_table_loaded = None
+        copy_tables_in_parallel(tables_to_copy, dependencies, catalog, connection_settings, workers, batch_rows=batch_rows, batch_bytes=batch_bytes, chunk_rows=chunk_rows,
+                                table_ranges=table_ranges, range_retries=range_retries, loader=loader, spool_bytes=spool_bytes, disable_checks=disable_checks,
+                                journal_path=journal_path, commit_rows=commit_rows, on_table_loaded=on_table_loaded, upsert_tables=upsert_tables)
+        phase_seconds['load'] += time.perf_counter() - copy_start_time
+
+    if disable_checks:
+        set_load_checks(mysql_cursor, True)
+    logging.info(f"Load phase took {time.perf_counter() - load_start_time:.2f}s.")
+
+    # Build deferred indexes and constraints, referenced tables first
+    if tables_to_index:
+        index_start_time = time.perf_counter()
+        for table in tables_to_index:
+            table_start_time = time.perf_counter()
+            if defer_indexes or table not in cyclic_references:
+                add_indexes_and_constraints(catalog, mysql_cursor, table)
+                phase_seconds['index'] += time.perf_counter() - table_start_time
+            else:
+                add_deferred_foreign_keys(catalog, mysql_cursor, table, cyclic_references.get(table, ()))
+                phase_seconds['constraints'] += time.perf_counter() - table_start_time
+            if journal_conn:
+                set_journal_table_state(journal_conn, table, 'done')
+        logging.info(f"Index phase took {time.perf_counter() - index_start_time:.2f}s for {len(tables_to_index)} tables.")
     
     # Commit and close connections
-    mysql_conn.commit()
+    commit_mysql(mysql_conn)
     mysql_cursor.close()
     sqlite_cursor.close()
+    if journal_conn:
+        journal_conn.close()
+    flush_metrics()
+    return phase_seconds
+
+def log_transfer_plan(catalog, defer_indexes=False):
+    # Dry run: show the load order and the DDL a transfer would run, using
+    # only the SQLite catalog
+    levels, dependencies, cyclic_references = plan_load_order(catalog)
+    logging.info(f"Transfer plan for {len(catalog)} tables in {len(levels)} levels:")
+    position = 0
+    for level_number, level in enumerate(levels, 1):
+        for table in level:
+            position += 1
+            references = ', '.join(sorted(dependencies[table])) or 'none'
+            key = get_partition_key(catalog, table) or 'none'
+            logging.info(f"{position}. Table {table} (level {level_number}): {len(catalog[table]['columns'])} columns, key {key}, references {references}")
+            log_table_plan(catalog, table, defer_indexes, cyclic_references.get(table))
+
+def log_table_plan(catalog, table, defer_indexes=False, cyclic_references=None):
+    create_table_query = build_create_table_query(catalog, table, is_primary_key_enforced(catalog, table))
+    logging.info(f"   {create_table_query or 'No columns, the table would be skipped.'}")
+    clauses = build_index_clauses(catalog, table)
+    if create_table_query and clauses:
+        when = 'after the load' if defer_indexes else 'before the load'
+        logging.info(f"   {len(clauses)} indexes and constraints {when}: {', '.join(clauses)}")
+    if create_table_query and cyclic_references and not defer_indexes:
+        logging.info(f"   Foreign keys to {', '.join(sorted(cyclic_references))} are added after the load to break a cycle.")
+
+def parse_sync_columns(values):
+    # "column" applies to every table that has it, "table.column" to one table
+    sync_columns = {}
+    for value in values or []:
+        table, _, column = value.rpartition('.')
+        sync_columns[table] = column
+    return sync_columns
+
+def get_sync_key(catalog, table, sync_columns):
+    # Column that tells which rows are new or changed: a chosen timestamp
+    # column such as updated_at, otherwise the integer key or rowid
+    column_names = [column[1] for column in catalog[table]['columns']]
+    column = sync_columns.get(table, sync_columns.get(''))
+    if column in column_names:
+        return column
+    if table in sync_columns:
+        logging.warning(f"Table {table} has no column {column}. Syncing it on its integer key instead.")
+    return get_partition_key(catalog, table)
+
+def has_upsert_key(catalog, mysql_cursor, table):
+    # Upserts need a primary or unique key in MySQL on columns copied from
+    # SQLite; a key on other columns never matches the copied rows. A key is
+    # never added here: ALTER TABLE on a user's table can take hours, and
+    # fails part way on rows that can't be part of the key.
+    column_names = {column[1].lower() for column in catalog[table]['columns']}
+    mysql_cursor.execute(f"SHOW KEYS FROM {table} WHERE Non_unique = 0")
+    keys = {}
+    for row in mysql_cursor.fetchall():
+        # (Table, Non_unique, Key_name, Seq_in_index, Column_name, ...)
+        keys.setdefault(row[2], []).append(row[4])
+    return any(all(column is not None and column.lower() in column_names for column in columns) for columns in keys.values())
 
+def get_sync_state(mysql_cursor, table):
+    # (key column, high-water mark, rows synced) of the last sync, or None
+    mysql_cursor.execute(f"SELECT key_column, high_water, rows_synced FROM {SYNC_STATE_TABLE} WHERE table_name = %s", (table,))
+    state = mysql_cursor.fetchone()
+    if state is None:
+        return None
+    return state[0], json.loads(state[1]) if state[1] is not None else None, state[2]
+
+def set_sync_state(mysql_cursor, table, key, high_water, rows_synced):
+    # The mark is stored as JSON so integer keys and timestamps keep their type
+    mysql_cursor.execute(f"""INSERT INTO {SYNC_STATE_TABLE} (table_name, key_column, high_water, rows_synced, synced_at) VALUES (%s, %s, %s, %s, NOW())
+                             ON DUPLICATE KEY UPDATE key_column = VALUES(key_column), high_water = VALUES(high_water),
+                             rows_synced = VALUES(rows_synced), synced_at = VALUES(synced_at)""",
+                         (table, key, json.dumps(high_water), rows_synced))
+
+def sync_table(sqlite_conn, mysql_conn, mysql_cursor, catalog, table, sync_columns, table_exists, batch_rows=DEFAULT_BATCH_ROWS,
+               batch_bytes=DEFAULT_BATCH_BYTES, chunk_rows=DEFAULT_CHUNK_ROWS, skip_references=None):
+    # Copy the rows added or changed since the last sync and move the
+    # high-water mark forward in the same transaction
+    if not table_exists and not create_mysql_table(catalog, mysql_cursor, table, primary_key=True, skip_references=skip_references):
+        return 0
+
+    integer_key = get_partition_key(catalog, table)
+    upsert = has_upsert_key(catalog, mysql_cursor, table)
+    # A timestamp mark re-reads the rows at the mark (see below), which is only
+    # safe when they are upserted
+    key = get_sync_key(catalog, table, sync_columns)
+    if not upsert and key != integer_key:
+        logging.warning(f"Table {table} has no primary or unique key, so it can't be synced on {key}. Syncing it on its integer key instead.")
+        key = integer_key
+    if key is None:
+        logging.warning(f"Table {table} has no usable primary key or rowid. It can't be synced incrementally. Skipping.")
+        return 0
+
+    state = get_sync_state(mysql_cursor, table)
+    high_water, rows_synced = None, 0
+    if state and state[0] == key:
+        _, high_water, rows_synced = state
+    elif state:
+        logging.info(f"Sync column of table {table} changed from {state[0]} to {key}. Syncing all rows.")
+
+    update_columns = None
+    if upsert:
+        update_columns = [column[1] for column in catalog[table]['columns']]
+    else:
+        # Without a key in MySQL rows can only be appended, and rows already
+        # there can't be matched to SQLite rows on a first sync
+        if state is None and table_exists:
+            mysql_cursor.execute(f"SELECT 1 FROM {table} LIMIT 1")
+            if mysql_cursor.fetchone():
+                logging.error(f"Table {table} has rows in MySQL but no primary key and no sync state. Replace it with a full transfer first. Skipping.")
+                return 0
+        logging.warning(f"Table {table} has no primary or unique key, so changed rows can't be updated. Only rows added since the last sync are copied.")
+
+    # Integer keys only grow, so rows past the mark are new. A timestamp can
+    # repeat the mark for rows written after the last sync, so rows at the mark
+    # are read again; upserting them twice is harmless. (A strict comparison
+    # with the key as a tiebreak would miss rows with the same timestamp and a
+    # lower key.)
+    inclusive = key != integer_key
+    # Integer keys are never NULL, but a sync column can be. A NULL can't be
+    # compared with the mark, so those rows count as changed and are read and
+    # upserted again on every sync; the mark is taken from the other rows.
+    with_nulls = inclusive and not any(column[1] == key and column[3] for column in catalog[table]['columns'])
+    if high_water is not None:
+        logging.info(f"Syncing table {table} from {key} {'>=' if inclusive else '>'} {high_water}{f', and rows where it is NULL' if with_nulls else ''}.")
+    else:
+        logging.info(f"Syncing all rows of table {table} on {key}.")
+
+    start_time = time.perf_counter()
+    synced = 0
+    for rows in iter_sqlite_rows_after(sqlite_conn, table, key, high_water, chunk_rows=chunk_rows, inclusive=inclusive, with_nulls=with_nulls):
+        synced += insert_rows(mysql_cursor, table, [row[1:] for row in rows], batch_rows, batch_bytes, update_columns)
+        # Rows are in key order with NULLs first, so only a chunk of NULLs ends on one
+        if rows[-1][0] is not None:
+            high_water = rows[-1][0]
+    set_sync_state(mysql_cursor, table, key, high_water, rows_synced + synced)
+    commit_mysql(mysql_conn, table)
+    logging.info(f"Synced {synced} rows for table {table} in {time.perf_counter() - start_time:.2f}s (high-water mark {key} = {high_water}).")
+    return synced
+
+def sync_data(sqlite_conn, mysql_conn, sync_columns=None, batch_rows=DEFAULT_BATCH_ROWS, batch_bytes=DEFAULT_BATCH_BYTES, chunk_rows=DEFAULT_CHUNK_ROWS, catalog=None):
+    # Incremental counterpart of transfer_data: new tables are created, and
+    # existing ones only receive the rows past their high-water mark
+    if catalog is None:
+        catalog = read_sqlite_catalog(sqlite_conn)
+    levels, _, cyclic_references = plan_load_order(catalog)
+    sorted_tables = [table for level in levels for table in level]
+
+    mysql_cursor = mysql_conn.cursor()
+    batch_bytes = get_batch_byte_limit(mysql_cursor, batch_bytes)
+    mysql_cursor.execute(SYNC_STATE_SCHEMA)
+    existing_tables = get_mysql_tables(mysql_cursor)
+
+    start_time = time.perf_counter()
+    synced = 0
+    for table in sorted_tables:
+        synced += sync_table(sqlite_conn, mysql_conn, mysql_cursor, catalog, table, sync_columns or {}, table in existing_tables,
+                             batch_rows, batch_bytes, chunk_rows, cyclic_references.get(table))
+    # Tables created on a foreign key cycle get those foreign keys now
+    for table in sorted_tables:
+        if table in cyclic_references and table not in existing_tables:
+            add_deferred_foreign_keys(catalog, mysql_cursor, table, cyclic_references[table])
+    logging.info(f"Synced {synced} rows across {len(sorted_tables)} tables in {time.perf_counter() - start_time:.2f}s.")
+
+    mysql_cursor.close()
 
 def main():
     parser = argparse.ArgumentParser(description='SQLite to MySQL Converter')
@@ -274,15 +1599,78 @@ def main():
     parser.add_argument('--username', help='Username for the MySQL database.')
     parser.add_argument('--password', help='Password for the MySQL database.')
     parser.add_argument('--database', help='Name of the MySQL database where you want to transfer the data.')
+    parser.add_argument('--on-db-exists', choices=DATABASE_POLICIES, help="What to do when the MySQL database already exists. Defaults to asking.")
+    parser.add_argument('--on-exists', choices=TABLE_POLICIES, help="What to do with tables that already exist in MySQL. Defaults to asking for each table.")
+    parser.add_argument('--table-policy', nargs='+', metavar='PATTERN=POLICY', help='Policy for existing tables whose name matches a glob pattern, e.g. "audit_*=append". The first match wins over --on-exists.')
+    parser.add_argument('--policy-file', help='JSON file with "database", "default" and "tables" (pattern to policy) entries. Command line options take precedence.')
+    parser.add_argument('--dry-run', action='store_true', help='Only show the load order and the tables, indexes and constraints that would be created. MySQL is not contacted.')
+    parser.add_argument('--catalog-cache', help='JSON file caching the SQLite schema. It is reused while the SQLite file and its schema are unchanged.')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help='Number of rows read from SQLite at a time. Bounds memory use.')
+    parser.add_argument('--batch-rows', type=int, default=DEFAULT_BATCH_ROWS, help='Maximum number of rows sent in one INSERT batch.')
+    parser.add_argument('--batch-bytes', type=int, default=DEFAULT_BATCH_BYTES, help='Maximum size in bytes of one multi-row INSERT statement. Capped by the server max_allowed_packet.')
+    parser.add_argument('--loader', choices=LOADERS, default='insert', help="How rows are loaded into MySQL: batched INSERT statements, or LOAD DATA LOCAL INFILE (the server must allow local_infile).")
+    parser.add_argument('--spool-bytes', type=int, default=DEFAULT_SPOOL_BYTES, help='Size a LOAD DATA spool file may reach before it is sent to the server.')
+    parser.add_argument('--defer-indexes', action='store_true', help='Create bare tables, load the rows, then add indexes and constraints with one ALTER TABLE per table.')
+    parser.add_argument('--disable-checks', action='store_true', help='Turn off foreign_key_checks and unique_checks while rows are loaded.')
+    parser.add_argument('--commit-rows', type=int, default=0, help='Commit every N rows and record progress in a checkpoint journal so the run can be resumed. Defaults to 0, which keeps no journal: everything is one transaction, and an interrupted run can only be started over. --journal alone commits every 100000 rows.')
+    parser.add_argument('--journal', help='Path of the checkpoint journal. Defaults to the SQLite file path with ".journal" appended.')
+    parser.add_argument('--resume', action='store_true', help='Continue an interrupted run from its checkpoint journal. Only runs started with --commit-rows or --journal have one.')
+    parser.add_argument('--sync', action='store_true', help='Incremental sync: keep the MySQL database and copy only the rows added or changed since the last sync.')
+    parser.add_argument('--sync-column', nargs='+', help='Column marking changed rows for --sync, such as updated_at. Use "table.column" to set it for one table. Other tables are synced on their integer key or rowid.')
+    parser.add_argument('--workers', type=int, default=1, help='Number of tables to transfer at once, each with its own connections. Tables still wait for the tables their foreign keys reference.')
+    parser.add_argument('--range-partitions', type=int, default=1, help='Split large tables into this many key ranges that are loaded concurrently. Uses --workers connections (defaults them to the number of ranges).')
+    parser.add_argument('--range-min-rows', type=int, default=DEFAULT_RANGE_MIN_ROWS, help='Only split tables whose key span covers at least this many rows.')
+    parser.add_argument('--range-split', choices=RANGE_SPLIT_METHODS, default='minmax', help="How range boundaries are chosen: evenly between MIN and MAX of the key, or at row count quantiles for sparse keys.")
+    parser.add_argument('--range-retries', type=int, default=DEFAULT_RANGE_RETRIES, help='Number of times a failed table or range is retried on its own.')
+    parser.add_argument('--metrics', help='Append timing spans per table and phase (schema, ddl, fetch, insert, commit, index) to this JSON-lines file.')
+    parser.add_argument('--prometheus', help='Also write the spans of the run as a Prometheus textfile to this path. Needs --metrics.')
+    parser.add_argument('--profile', help='Profile the run with cProfile and tracemalloc and write the hottest call and allocation sites to this file.')
     
     args = parser.parse_args()
+    if args.range_partitions > 1 and args.workers == 1:
+        args.workers = args.range_partitions
+
+    # Policies from the command line come first, then the policy file
+    db_policy, on_exists, table_policies = None, None, []
+    try:
+        if args.policy_file:
+            db_policy, on_exists, table_policies = load_policy_file(args.policy_file)
+        table_policies = parse_table_policies(args.table_policy) + table_policies
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    db_policy = args.on_db_exists or db_policy or 'ask'
+    on_exists = args.on_exists or on_exists or 'ask'
+    if args.prometheus and not args.metrics:
+        parser.error("--prometheus needs --metrics")
+
+    if args.dry_run:
+        # Planning only needs the SQLite schema
+        sqlite_db_path = args.sqlite if args.sqlite else input("Enter the path to the SQLite database file: ")
+        sqlite_conn = connect_sqlite(sqlite_db_path)
+        try:
+            log_transfer_plan(load_sqlite_catalog(sqlite_conn, sqlite_db_path, args.catalog_cache), args.defer_indexes)
+        finally:
+            sqlite_conn.close()
+        return
     
     sqlite_db_path, mysql_server, mysql_username, mysql_password, mysql_db_name = get_user_inputs(args)
+
+    journal_path = None
+    if args.commit_rows or args.resume or args.journal:
+        journal_path = args.journal or f"{sqlite_db_path}.journal"
+        if args.resume and not os.path.exists(journal_path):
+            logging.warning(f"No journal found at {journal_path}. Starting a new run.")
+    commit_rows = args.commit_rows or DEFAULT_COMMIT_ROWS
     
     print("Welcome to the SQLite to MySQL Converter!")
     
     sqlite_conn = None
     mysql_conn = None
+    local_infile = args.loader == 'load-data'
+    run_id = uuid.uuid4().hex
+    if args.metrics:
+        enable_metrics((args.metrics, run_id))
+    profiler = start_profiling() if args.profile else None
     try:
         # Establish database connections
         sqlite_conn = connect_sqlite(sqlite_db_path)
@@ -290,20 +1678,32 @@ def main():
         create_mysql_db_if_not_exists(mysql_conn, mysql_db_name)
 
         mysql_conn.close()
-        mysql_conn = connect_mysql(mysql_server, mysql_username, mysql_password, mysql_db_name)
+        mysql_conn = connect_mysql(mysql_server, mysql_username, mysql_password, mysql_db_name, local_infile)
         
-        # Check if MySQL database exists and reconnect if necessary
-        was_dropped = check_mysql_db(mysql_conn, mysql_db_name)
+        # Check if MySQL database exists and reconnect if necessary.
+        # A resumed run or a sync keeps the database it was loading into.
+        was_dropped = False if args.resume or args.sync else check_mysql_db(mysql_conn, mysql_db_name, db_policy)
         if was_dropped:
             mysql_conn.close()
-            mysql_conn = connect_mysql(mysql_server, mysql_username, mysql_password, mysql_db_name)
+            mysql_conn = connect_mysql(mysql_server, mysql_username, mysql_password, mysql_db_name, local_infile)
         
         if mysql_conn and sqlite_conn:
             # Start a transaction
             mysql_conn.begin()
-            transfer_data(sqlite_conn, mysql_conn)
+            connection_settings = (sqlite_db_path, mysql_server, mysql_username, mysql_password, mysql_db_name)
+            start_time = time.perf_counter()
+            catalog = load_sqlite_catalog(sqlite_conn, sqlite_db_path, args.catalog_cache)
+            record_span('schema', None, time.perf_counter() - start_time)
+            if args.sync:
+                sync_data(sqlite_conn, mysql_conn, parse_sync_columns(args.sync_column), args.batch_rows, args.batch_bytes, args.chunk_rows, catalog)
+            else:
+                transfer_data(sqlite_conn, mysql_conn, batch_rows=args.batch_rows, batch_bytes=args.batch_bytes, chunk_rows=args.chunk_rows, workers=args.workers,
+                              connection_settings=connection_settings, range_partitions=args.range_partitions, range_min_rows=args.range_min_rows,
+                              range_split=args.range_split, range_retries=args.range_retries, loader=args.loader, spool_bytes=args.spool_bytes,
+                              defer_indexes=args.defer_indexes, disable_checks=args.disable_checks, journal_path=journal_path, commit_rows=commit_rows,
+                              resume=args.resume, on_exists=on_exists, table_policies=table_policies, catalog=catalog)
             # Commit transaction
-            mysql_conn.commit()
+            commit_mysql(mysql_conn)
         elif not sqlite_conn:
             logging.error(f"Unable to open the SQLite database {sqlite_db_path}")
         else:
@@ -319,6 +1719,12 @@ def main():
             sqlite_conn.close()
         if mysql_conn:
             mysql_conn.close()
+        if profiler:
+            write_profile_report(profiler, args.profile)
+        if args.metrics:
+            flush_metrics()
+            if args.prometheus and os.path.exists(args.metrics):
+                write_prometheus_metrics(args.metrics, run_id, args.prometheus)
 
 if __name__ == "__main__":
     main()
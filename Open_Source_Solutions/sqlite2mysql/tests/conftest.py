@@ -0,0 +1,49 @@
+import importlib.util
+import os
+import sqlite3
+
+import pytest
+
+TOOL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+@pytest.fixture(scope='session')
+def sqlite2mysql():
+    # main.py of this tool, loaded under its own name so it can't clash with
+    # the main.py of another tool in the same test run
+    spec = importlib.util.spec_from_file_location('sqlite2mysql_main', os.path.join(TOOL_DIR, 'main.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture
+def sqlite_conn():
+    conn = sqlite3.connect(':memory:')
+    yield conn
+    conn.close()
+
+class RecordingCursor:
+    # Stands in for a pymysql cursor: keeps the statements it was given, with
+    # their parameters, and answers fetches from the results queued in results
+    def __init__(self):
+        self.queries = []
+        self.params = []
+        self.results = []
+        self.warning_count = 0
+
+    def execute(self, query, args=None):
+        self.queries.append(query)
+        self.params.append(args)
+
+    def executemany(self, query, args):
+        self.queries.append(query)
+        self.params.append(list(args))
+
+    def fetchone(self):
+        return self.results.pop(0)
+
+    def fetchall(self):
+        return self.results.pop(0)
+
+@pytest.fixture
+def mysql_cursor():
+    return RecordingCursor()
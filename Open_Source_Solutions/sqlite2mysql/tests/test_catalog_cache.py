@@ -0,0 +1,62 @@
+import json
+import sqlite3
+
+import pytest
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / 'source.db')
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE authors (id INTEGER PRIMARY KEY, name TEXT NOT NULL);
+        CREATE TABLE books (isbn TEXT PRIMARY KEY, author_id INTEGER REFERENCES authors (id), title TEXT) WITHOUT ROWID;
+        CREATE INDEX books_title ON books (title, author_id);
+    """)
+    conn.close()
+    return path
+
+def test_read_sqlite_catalog(sqlite2mysql, db_path):
+    conn = sqlite3.connect(db_path)
+    catalog = sqlite2mysql.read_sqlite_catalog(conn)
+    conn.close()
+
+    assert sorted(catalog) == ['authors', 'books']
+    assert catalog['authors']['columns'] == [[0, 'id', 'INTEGER', 0, None, 1], [1, 'name', 'TEXT', 1, None, 0]]
+    assert not catalog['authors']['without_rowid'] and catalog['books']['without_rowid']
+    assert ['books_title', False, ['title', 'author_id']] in catalog['books']['indexes']
+    assert catalog['books']['foreign_keys'] == [[0, 0, 'authors', 'author_id', 'id']]
+
+def test_catalog_is_cached_until_the_schema_changes(sqlite2mysql, db_path, tmp_path, monkeypatch):
+    cache_path = str(tmp_path / 'catalog.json')
+    conn = sqlite3.connect(db_path)
+    catalog = sqlite2mysql.load_sqlite_catalog(conn, db_path, cache_path)
+    with open(cache_path) as f:
+        assert json.load(f)['catalog'] == catalog
+
+    # Read from the cache, without touching the schema
+    read_sqlite_catalog = sqlite2mysql.read_sqlite_catalog
+    reads = []
+    def counting_read_sqlite_catalog(sqlite_conn):
+        reads.append(1)
+        return read_sqlite_catalog(sqlite_conn)
+    monkeypatch.setattr(sqlite2mysql, 'read_sqlite_catalog', counting_read_sqlite_catalog)
+    assert sqlite2mysql.load_sqlite_catalog(conn, db_path, cache_path) == catalog
+    assert reads == []
+
+    conn.execute("ALTER TABLE authors ADD COLUMN born INTEGER")
+    changed = sqlite2mysql.load_sqlite_catalog(conn, db_path, cache_path)
+    assert reads == [1]
+    assert [column[1] for column in changed['authors']['columns']] == ['id', 'name', 'born']
+    assert sqlite2mysql.load_sqlite_catalog(conn, db_path, cache_path) == changed
+    assert reads == [1]
+    conn.close()
+
+def test_unreadable_cache_is_replaced(sqlite2mysql, db_path, tmp_path):
+    cache_path = tmp_path / 'catalog.json'
+    cache_path.write_text('{"key": ')
+    conn = sqlite3.connect(db_path)
+    catalog = sqlite2mysql.load_sqlite_catalog(conn, db_path, str(cache_path))
+    conn.close()
+    assert sorted(catalog) == ['authors', 'books']
+    assert json.loads(cache_path.read_text())['catalog'] == catalog
+    assert not (tmp_path / 'catalog.json.tmp').exists()
@@ -0,0 +1,17 @@
+def test_primary_key_created_only_when_enforced(sqlite2mysql, sqlite_conn):
+    sqlite_conn.executescript("""
+        CREATE TABLE alias (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE nullable (id BIGINT PRIMARY KEY, name TEXT);
+        CREATE TABLE not_null (a SMALLINT NOT NULL, b BIGINT NOT NULL, PRIMARY KEY (a, b));
+        CREATE TABLE no_rowid (id BIGINT PRIMARY KEY, name TEXT) WITHOUT ROWID;
+        CREATE TABLE named (code VARCHAR NOT NULL PRIMARY KEY);
+        CREATE TABLE text_key (code TEXT PRIMARY KEY);
+        CREATE TABLE no_key (name TEXT);
+    """)
+    catalog = sqlite2mysql.read_sqlite_catalog(sqlite_conn)
+    enforced = {table for table in catalog if sqlite2mysql.is_primary_key_enforced(catalog, table)}
+    assert enforced == {'alias', 'not_null', 'no_rowid'}
+
+    assert sqlite2mysql.build_create_table_query(catalog, 'alias', True) == "CREATE TABLE alias (id INT, name TEXT, PRIMARY KEY (id))"
+    assert sqlite2mysql.build_create_table_query(catalog, 'not_null', True) == "CREATE TABLE not_null (a SMALLINT, b BIGINT, PRIMARY KEY (a, b))"
+    assert sqlite2mysql.build_create_table_query(catalog, 'nullable') == "CREATE TABLE nullable (id BIGINT, name TEXT)"
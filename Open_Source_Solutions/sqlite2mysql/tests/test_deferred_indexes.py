@@ -0,0 +1,53 @@
+import pytest
+
+SCHEMA = """
+CREATE TABLE customers (id INTEGER PRIMARY KEY, email TEXT);
+CREATE UNIQUE INDEX customers_email ON customers (email);
+CREATE TABLE orders (
+    id INTEGER PRIMARY KEY,
+    customer_id INTEGER,
+    total REAL,
+    FOREIGN KEY (customer_id) REFERENCES customers (id),
+    CHECK (total >= 0)
+);
+CREATE INDEX orders_customer ON orders (customer_id, total);
+"""
+
+@pytest.fixture
+def catalog(sqlite2mysql, sqlite_conn):
+    sqlite_conn.executescript(SCHEMA)
+    return sqlite2mysql.read_sqlite_catalog(sqlite_conn)
+
+def test_deferred_table_is_created_bare(sqlite2mysql, catalog, mysql_cursor):
+    assert sqlite2mysql.create_mysql_table(catalog, mysql_cursor, 'orders', defer_indexes=True, primary_key=True)
+    assert mysql_cursor.queries == ["CREATE TABLE orders (id INT, customer_id INT, total FLOAT, PRIMARY KEY (id))"]
+
+def test_indexes_and_constraints_in_one_alter_table(sqlite2mysql, catalog, mysql_cursor):
+    sqlite2mysql.add_indexes_and_constraints(catalog, mysql_cursor, 'orders')
+    sqlite2mysql.add_indexes_and_constraints(catalog, mysql_cursor, 'customers')
+    assert mysql_cursor.queries == [
+        "ALTER TABLE orders ADD INDEX orders_customer (customer_id,total), ADD FOREIGN KEY (customer_id) REFERENCES customers (id), ADD CHECK (total >= 0)",
+        "ALTER TABLE customers ADD UNIQUE INDEX customers_email (email)",
+    ]
+
+def test_without_defer_indexes_come_with_the_table(sqlite2mysql, catalog, mysql_cursor):
+    sqlite2mysql.create_mysql_table(catalog, mysql_cursor, 'orders', primary_key=True)
+    assert mysql_cursor.queries[1:] == [
+        "CREATE  INDEX orders_customer ON orders (customer_id,total)",
+        "ALTER TABLE orders ADD FOREIGN KEY (customer_id) REFERENCES customers (id)",
+        "ALTER TABLE orders ADD CHECK (total >= 0)",
+    ]
+
+def test_foreign_keys_of_a_cycle_are_added_later(sqlite2mysql, catalog, mysql_cursor):
+    sqlite2mysql.create_mysql_table(catalog, mysql_cursor, 'orders', skip_references={'customers'})
+    assert not [query for query in mysql_cursor.queries if 'FOREIGN KEY' in query]
+
+    del mysql_cursor.queries[:]
+    sqlite2mysql.add_deferred_foreign_keys(catalog, mysql_cursor, 'orders', {'products'})
+    sqlite2mysql.add_deferred_foreign_keys(catalog, mysql_cursor, 'orders', {'customers'})
+    assert mysql_cursor.queries == ["ALTER TABLE orders ADD FOREIGN KEY (customer_id) REFERENCES customers (id)"]
+
+def test_load_checks(sqlite2mysql, mysql_cursor):
+    sqlite2mysql.set_load_checks(mysql_cursor, False)
+    sqlite2mysql.set_load_checks(mysql_cursor, True)
+    assert mysql_cursor.queries == ["SET SESSION foreign_key_checks = 0, unique_checks = 0", "SET SESSION foreign_key_checks = 1, unique_checks = 1"]
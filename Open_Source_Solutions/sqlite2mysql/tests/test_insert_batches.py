@@ -0,0 +1,50 @@
+import pymysql.converters
+import pymysql.cursors
+
+def test_insert_rows_in_batches(sqlite2mysql, mysql_cursor):
+    rows = [(i, f"name {i}") for i in range(7)]
+    assert sqlite2mysql.insert_rows(mysql_cursor, 'people', rows, batch_rows=3, batch_bytes=4096) == 7
+    assert mysql_cursor.queries == ["INSERT INTO people VALUES (%s, %s)"] * 3
+    assert mysql_cursor.params == [rows[0:3], rows[3:6], rows[6:7]]
+    # pymysql starts a new statement before one would pass this many bytes
+    assert mysql_cursor.max_stmt_length == 4096
+
+    assert sqlite2mysql.insert_rows(mysql_cursor, 'people', []) == 0
+    assert len(mysql_cursor.queries) == 3
+
+def test_insert_rows_with_upsert(sqlite2mysql, mysql_cursor):
+    sqlite2mysql.insert_rows(mysql_cursor, 'people', [(1, 'a')], update_columns=['id', 'name'])
+    assert mysql_cursor.queries == ["INSERT INTO people VALUES (%s, %s) ON DUPLICATE KEY UPDATE id = VALUES(id), name = VALUES(name)"]
+
+class StatementCursor(pymysql.cursors.Cursor):
+    # A real pymysql cursor, so executemany builds its multi-row statements,
+    # that keeps the statements instead of sending them to a server
+    class Connection:
+        encoding = 'utf8'
+
+        def escape(self, value, mapping=None):
+            return pymysql.converters.escape_item(value, self.encoding, mapping)
+
+        literal = escape
+
+    def __init__(self):
+        super().__init__(self.Connection())
+        self.statements = []
+
+    def execute(self, query, args=None):
+        self.statements.append(bytes(query))
+        return 1
+
+def test_statements_stay_below_max_stmt_length(sqlite2mysql):
+    cursor = StatementCursor()
+    rows = [(i, 'x' * 20) for i in range(50)]
+    assert sqlite2mysql.insert_rows(cursor, 'people', rows, batch_rows=1000, batch_bytes=200) == 50
+    assert len(cursor.statements) > 1
+    assert all(len(statement) <= 200 for statement in cursor.statements)
+    assert sum(statement.count(b"'xxxxxxxxxxxxxxxxxxxx'") for statement in cursor.statements) == 50
+
+def test_batch_byte_limit_leaves_room_in_the_packet(sqlite2mysql, mysql_cursor):
+    mysql_cursor.results = [(4 * 1024 * 1024,), (64 * 1024,)]
+    assert sqlite2mysql.get_batch_byte_limit(mysql_cursor, 1024 * 1024) == 1024 * 1024
+    assert sqlite2mysql.get_batch_byte_limit(mysql_cursor, 1024 * 1024) == 64 * 1024 - sqlite2mysql.PACKET_HEADROOM
+    assert mysql_cursor.queries == ["SELECT @@max_allowed_packet"] * 2
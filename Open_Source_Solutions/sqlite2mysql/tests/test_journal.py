@@ -0,0 +1,79 @@
+def test_register_journal_unit_estimates_rows_from_keys(sqlite2mysql, sqlite_conn, tmp_path):
+    journal_conn = sqlite2mysql.open_journal(str(tmp_path / 'transfer.journal'))
+    sqlite_conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, name TEXT)")
+    sqlite_conn.executemany("INSERT INTO events VALUES (?, ?)", [(key, 'x') for key in (10, 11, 12, 20)])
+    sqlite_conn.execute("CREATE TABLE tags (name TEXT PRIMARY KEY, color TEXT) WITHOUT ROWID")
+    sqlite_conn.executemany("INSERT INTO tags VALUES (?, ?)", [('a', 'red'), ('b', 'blue')])
+    cursor = sqlite_conn.cursor()
+
+    sqlite2mysql.register_journal_unit(journal_conn, cursor, 'events', 'id')
+    sqlite2mysql.register_journal_unit(journal_conn, cursor, 'events', 'id', (10, 15))
+    sqlite2mysql.register_journal_unit(journal_conn, cursor, 'tags', None)
+    totals = dict(((table, range_id), total) for table, range_id, total in journal_conn.execute("SELECT table_name, range_id, total_rows FROM journal_units"))
+    assert totals == {('events', ''): 11, ('events', '10:15'): 5, ('tags', ''): 2}
+
+    # Once loaded, the estimate is replaced by the rows actually copied
+    sqlite2mysql.update_journal_unit(journal_conn, 'events', None, 'loading', 12, 3)
+    assert journal_conn.execute("SELECT total_rows FROM journal_units WHERE range_id = '' AND table_name = 'events'").fetchone() == (11,)
+    sqlite2mysql.update_journal_unit(journal_conn, 'events', None, 'loaded', 20, 4)
+    assert journal_conn.execute("SELECT total_rows FROM journal_units WHERE range_id = '' AND table_name = 'events'").fetchone() == (4,)
+    journal_conn.close()
+
+def test_journal_keeps_defer_indexes_of_the_first_run(sqlite2mysql, tmp_path):
+    journal_path = str(tmp_path / 'transfer.journal')
+    journal_conn = sqlite2mysql.open_journal(journal_path, reset=True)
+    assert sqlite2mysql.get_journal_defer_indexes(journal_conn) is None
+    sqlite2mysql.start_journal_run(journal_conn, defer_indexes=True)
+    journal_conn.close()
+
+    journal_conn = sqlite2mysql.open_journal(journal_path)
+    sqlite2mysql.start_journal_run(journal_conn, defer_indexes=False)
+    assert sqlite2mysql.get_journal_defer_indexes(journal_conn) is True
+    journal_conn.close()
+    assert sqlite2mysql.get_journal_defer_indexes(sqlite2mysql.open_journal(journal_path, reset=True)) is None
+
+class RecordingConnection:
+    # Records its commits among the statements of the cursor, to check what they cover
+    def __init__(self, cursor):
+        self.cursor = cursor
+
+    def commit(self):
+        self.cursor.queries.append('COMMIT')
+        self.cursor.params.append(None)
+
+def test_resume_continues_after_the_key_committed_in_mysql(sqlite2mysql, sqlite_conn, mysql_cursor, tmp_path):
+    # The run stopped after MySQL committed rowid 3 but before the journal was
+    # updated, so only the progress table in MySQL knows those rows are there
+    journal_conn = sqlite2mysql.open_journal(str(tmp_path / 'transfer.journal'))
+    sqlite_conn.execute("CREATE TABLE events (name TEXT)")
+    sqlite_conn.executemany("INSERT INTO events VALUES (?)", [(name,) for name in 'abcde'])
+    sqlite2mysql.register_journal_unit(journal_conn, sqlite_conn.cursor(), 'events', 'rowid')
+    mysql_cursor.connection = RecordingConnection(mysql_cursor)
+    mysql_cursor.results.append(('3', 3))
+    table_info = sqlite_conn.execute("PRAGMA table_info(events)").fetchall()
+
+    inserted = sqlite2mysql.copy_table_rows_with_journal(sqlite_conn, mysql_cursor, journal_conn, 'events', table_info, commit_rows=1, chunk_rows=1)
+
+    assert inserted == 2
+    inserts = [params for query, params in zip(mysql_cursor.queries, mysql_cursor.params) if query.startswith('INSERT INTO events')]
+    assert inserts == [[('d',)], [('e',)]]
+    # Every commit is preceded by the progress of the rows it commits
+    commits = [i for i, query in enumerate(mysql_cursor.queries) if query == 'COMMIT']
+    progress = [mysql_cursor.params[i - 1] for i in commits]
+    assert [params[2:] for params in progress] == [('4', 4), ('5', 5), ('5', 5)]
+    assert all(sqlite2mysql.LOAD_PROGRESS_TABLE in mysql_cursor.queries[i - 1] for i in commits)
+    assert journal_conn.execute("SELECT state, last_key, rows_copied FROM journal_units").fetchone() == ('loaded', 5, 5)
+    journal_conn.close()
+
+def test_unkeyed_table_committed_by_an_earlier_run_is_skipped(sqlite2mysql, sqlite_conn, mysql_cursor, tmp_path):
+    journal_conn = sqlite2mysql.open_journal(str(tmp_path / 'transfer.journal'))
+    sqlite_conn.execute("CREATE TABLE tags (name TEXT PRIMARY KEY, color TEXT) WITHOUT ROWID")
+    sqlite_conn.executemany("INSERT INTO tags VALUES (?, ?)", [('a', 'red'), ('b', 'blue')])
+    sqlite2mysql.register_journal_unit(journal_conn, sqlite_conn.cursor(), 'tags', None)
+    mysql_cursor.connection = RecordingConnection(mysql_cursor)
+    mysql_cursor.results.append(('null', 2))
+
+    assert sqlite2mysql.copy_table_rows_with_journal(sqlite_conn, mysql_cursor, journal_conn, 'tags', []) == 0
+    assert not [query for query in mysql_cursor.queries if query.startswith('INSERT INTO tags') or query == 'COMMIT']
+    assert journal_conn.execute("SELECT state, rows_copied FROM journal_units").fetchone() == ('loaded', 2)
+    journal_conn.close()
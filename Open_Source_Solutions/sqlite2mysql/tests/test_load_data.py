@@ -0,0 +1,62 @@
+def test_escape_load_data_value_plain(sqlite2mysql):
+    escape = sqlite2mysql.escape_load_data_value
+    assert escape(None) == b'\\N'
+    assert escape(42) == b'42'
+    assert escape(1.5) == b'1.5'
+    assert escape('a\tb\nc\\d\re\0') == b'a\\tb\\nc\\\\d\\re\\0'
+    assert escape('Zürich') == 'Zürich'.encode('utf-8')
+    assert escape(b'raw\tbytes') == b'raw\\tbytes'
+
+def test_escape_load_data_value_hex(sqlite2mysql):
+    escape = sqlite2mysql.escape_load_data_value
+    assert escape(None, True) == b'\\N'
+    assert escape(b'\x00\xff\t', True) == b'00ff09'
+    # Text and numbers stored in a BLOB column are hex-encoded too, since the column is UNHEX()ed
+    assert escape('text\n', True) == b'text\n'.hex().encode('ascii')
+    assert escape('é', True) == b'c3a9'
+    assert escape(7, True) == b'37'
+
+def test_build_load_data_query(sqlite2mysql, sqlite_conn):
+    sqlite_conn.execute("CREATE TABLE files (id INTEGER PRIMARY KEY, name TEXT, data BLOB)")
+    load_query, hex_columns = sqlite2mysql.build_load_data_query(sqlite2mysql.read_sqlite_catalog(sqlite_conn)['files'], 'files')
+    assert hex_columns == [False, False, True]
+    assert load_query.startswith("LOAD DATA LOCAL INFILE %s INTO TABLE files ")
+    assert 'REPLACE' not in load_query
+    assert load_query.endswith("(id, name, @data) SET data = UNHEX(@data)")
+
+def test_build_load_data_query_into_staging_table(sqlite2mysql, sqlite_conn):
+    sqlite_conn.execute("CREATE TABLE notes (id INTEGER PRIMARY KEY, body TEXT)")
+    load_query, hex_columns = sqlite2mysql.build_load_data_query(sqlite2mysql.read_sqlite_catalog(sqlite_conn)['notes'], 'notes', 'notes_staging')
+    assert hex_columns == [False, False]
+    assert "INTO TABLE notes_staging " in load_query
+    assert load_query.endswith("(id, body)")
+
+def test_load_data_upsert_merges_through_staging_table(sqlite2mysql, sqlite_conn, mysql_cursor):
+    sqlite_conn.execute("CREATE TABLE files (id INTEGER PRIMARY KEY, data BLOB)")
+    rows = [[(1, b'\x00'), (2, 'text in a blob column')]]
+    loaded = sqlite2mysql.load_rows_with_load_data(sqlite2mysql.read_sqlite_catalog(sqlite_conn)['files'], mysql_cursor, 'files', rows, update_columns=['id', 'data'])
+    assert loaded == 2
+    staging = 'sqlite2mysql_staging_files'
+    assert mysql_cursor.queries == [
+        f"CREATE TEMPORARY TABLE IF NOT EXISTS {staging} LIKE files",
+        mysql_cursor.queries[1],
+        f"INSERT INTO files SELECT * FROM {staging} ON DUPLICATE KEY UPDATE id = VALUES(id), data = VALUES(data)",
+        f"DELETE FROM {staging}",
+        f"DROP TEMPORARY TABLE {staging}",
+    ]
+    assert mysql_cursor.queries[1].startswith(f"LOAD DATA LOCAL INFILE %s INTO TABLE {staging} ")
+
+def test_load_data_spool_file_contents(sqlite2mysql, sqlite_conn, mysql_cursor):
+    sqlite_conn.execute("CREATE TABLE files (id INTEGER PRIMARY KEY, name TEXT, data BLOB)")
+    spooled = []
+
+    def execute(query, args=None):
+        mysql_cursor.queries.append(query)
+        if args:
+            with open(args[0], 'rb') as spool:
+                spooled.append(spool.read())
+    mysql_cursor.execute = execute
+
+    rows = [[(1, 'a\tb', b'\x01'), (2, None, 'text')]]
+    assert sqlite2mysql.load_rows_with_load_data(sqlite2mysql.read_sqlite_catalog(sqlite_conn)['files'], mysql_cursor, 'files', rows) == 2
+    assert spooled == [b'1\ta\\tb\t01\n2\t\\N\t74657874\n']
@@ -0,0 +1,29 @@
+def make_catalog(references):
+    # Only the referenced table (third field) of a foreign key is used for ordering
+    return {table: {'foreign_keys': [('ref_id', 'id', parent) for parent in parents]} for table, parents in references.items()}
+
+def test_find_foreign_key_cycles(sqlite2mysql):
+    dependencies = {'a': {'b'}, 'b': {'c'}, 'c': {'a'}, 'd': {'a'}, 'e': {'e'}, 'f': set()}
+    components = sorted(sorted(component) for component in sqlite2mysql.find_foreign_key_cycles(dependencies))
+    assert components == [['a', 'b', 'c'], ['d'], ['e'], ['f']]
+
+def test_find_foreign_key_cycles_handles_deep_chains(sqlite2mysql):
+    # Deeper than the recursion limit
+    dependencies = {f't{i}': {f't{i + 1}'} for i in range(5000)}
+    dependencies['t5000'] = set()
+    assert len(sqlite2mysql.find_foreign_key_cycles(dependencies)) == 5001
+
+def test_plan_load_order_levels(sqlite2mysql):
+    catalog = make_catalog({'orders': ['customers', 'products'], 'customers': [], 'products': [], 'lines': ['orders', 'products', 'missing']})
+    levels, dependencies, cyclic_references = sqlite2mysql.plan_load_order(catalog)
+    assert [sorted(level) for level in levels] == [['customers', 'products'], ['orders'], ['lines']]
+    # References to tables outside the catalog are ignored
+    assert dependencies['lines'] == {'orders', 'products'}
+    assert cyclic_references == {}
+
+def test_plan_load_order_breaks_cycles(sqlite2mysql):
+    catalog = make_catalog({'a': ['b'], 'b': ['a'], 'c': ['a'], 'tree': ['tree']})
+    levels, dependencies, cyclic_references = sqlite2mysql.plan_load_order(catalog)
+    assert cyclic_references == {'a': {'b'}, 'b': {'a'}, 'tree': {'tree'}}
+    assert [sorted(level) for level in levels] == [['a', 'b', 'tree'], ['c']]
+    assert sqlite2mysql.sort_tables_based_on_foreign_keys(catalog)[-1] == 'c'
@@ -0,0 +1,19 @@
+import json
+
+def test_escape_prometheus_label(sqlite2mysql):
+    assert sqlite2mysql.escape_prometheus_label('orders') == 'orders'
+    assert sqlite2mysql.escape_prometheus_label('a\\b"c\nd') == 'a\\\\b\\"c\\nd'
+
+def test_write_prometheus_metrics_escapes_table_names(sqlite2mysql, tmp_path):
+    metrics_path = tmp_path / 'metrics.jsonl'
+    spans = [{'run': 'r1', 'table': 'odd"name', 'phase': 'insert', 'seconds': 1.5, 'rows': 10, 'bytes': 100},
+             {'run': 'r1', 'table': 'odd"name', 'phase': 'insert', 'seconds': 0.5, 'rows': 5, 'bytes': 50},
+             {'run': 'r2', 'table': 'other', 'phase': 'insert', 'seconds': 9.0, 'rows': 1, 'bytes': 1}]
+    metrics_path.write_text(''.join(json.dumps(span) + '\n' for span in spans))
+    prometheus_path = tmp_path / 'sqlite2mysql.prom'
+    sqlite2mysql.write_prometheus_metrics(str(metrics_path), 'r1', str(prometheus_path))
+
+    lines = prometheus_path.read_text().splitlines()
+    assert 'sqlite2mysql_phase_seconds{table="odd\\"name",phase="insert"} 2.0' in lines
+    assert 'sqlite2mysql_phase_rows{table="odd\\"name",phase="insert"} 15' in lines
+    assert not any('other' in line for line in lines)
@@ -0,0 +1,74 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+class FakeWorkers:
+    # Stands in for copy_table_in_worker, run in threads instead of processes.
+    # Records the tables loaded so far when each task starts, and fails the
+    # first attempts of the tasks listed in failures.
+    def __init__(self, failures=None):
+        self.started = []
+        self.loaded = []
+        self.failures = dict(failures or {})
+        self.lock = threading.Lock()
+
+    def copy(self, table, table_info, connection_settings, key=None, key_range=None, **options):
+        with self.lock:
+            self.started.append((table, key_range, list(self.loaded)))
+            if self.failures.get((table, key_range)):
+                self.failures[(table, key_range)] -= 1
+                raise RuntimeError(f"lost connection while copying {table}")
+        return 1
+
+    def on_table_loaded(self, table):
+        with self.lock:
+            self.loaded.append(table)
+
+@pytest.fixture
+def workers(sqlite2mysql, monkeypatch):
+    fake = FakeWorkers()
+    monkeypatch.setattr(sqlite2mysql, 'ProcessPoolExecutor', ThreadPoolExecutor)
+    monkeypatch.setattr(sqlite2mysql, 'copy_table_in_worker', fake.copy)
+    return fake
+
+def copy(sqlite2mysql, workers, tables, dependencies, **kwargs):
+    catalog = {table: {} for table in tables}
+    sqlite2mysql.copy_tables_in_parallel(tables, dependencies, catalog, None, 3, on_table_loaded=workers.on_table_loaded, **kwargs)
+
+def test_tables_start_after_the_tables_they_reference(sqlite2mysql, workers):
+    # orders references customers and itself; audit references a table outside this run
+    dependencies = {'orders': {'customers', 'orders'}, 'lines': {'orders'}, 'audit': {'archive'}}
+    copy(sqlite2mysql, workers, ['customers', 'orders', 'lines', 'audit'], dependencies)
+
+    loaded_before = {table: loaded for table, key_range, loaded in workers.started}
+    assert 'customers' in loaded_before['orders']
+    assert 'orders' in loaded_before['lines']
+    # Neither the self reference nor the table outside the run holds anything up
+    assert sorted(workers.loaded) == ['audit', 'customers', 'lines', 'orders']
+
+def test_a_table_is_loaded_once_all_its_ranges_are(sqlite2mysql, workers):
+    ranges = [(0, 100), (100, 200), (200, 300)]
+    copy(sqlite2mysql, workers, ['events', 'details'], {'details': {'events'}}, table_ranges={'events': ('id', ranges)})
+
+    assert sorted(key_range for table, key_range, loaded in workers.started if table == 'events') == ranges
+    assert [(table, key_range) for table, key_range, loaded in workers.started if table == 'details'] == [('details', None)]
+    assert workers.loaded == ['events', 'details']
+
+def test_failed_ranges_are_retried(sqlite2mysql, workers):
+    workers.failures = {('events', (100, 200)): 2}
+    copy(sqlite2mysql, workers, ['events'], {}, table_ranges={'events': ('id', [(0, 100), (100, 200)])}, range_retries=2)
+    assert [key_range for table, key_range, loaded in workers.started].count((100, 200)) == 3
+    assert workers.loaded == ['events']
+
+def test_gives_up_after_range_retries(sqlite2mysql, workers):
+    workers.failures = {('events', None): 3}
+    with pytest.raises(RuntimeError, match='lost connection'):
+        copy(sqlite2mysql, workers, ['events', 'details'], {'details': {'events'}}, range_retries=2)
+    assert len(workers.started) == 3
+    assert workers.loaded == []
+
+def test_dependency_cycle_is_reported(sqlite2mysql, workers):
+    with pytest.raises(RuntimeError, match="can't be satisfied for tables: a, b"):
+        copy(sqlite2mysql, workers, ['a', 'b', 'c'], {'a': {'b'}, 'b': {'a'}})
+    assert [table for table, key_range, loaded in workers.started] == ['c']
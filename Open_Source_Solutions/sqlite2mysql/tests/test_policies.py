@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+def test_parse_table_policies(sqlite2mysql):
+    assert sqlite2mysql.parse_table_policies(None) == []
+    # The policy is after the last "=", so patterns can hold one
+    assert sqlite2mysql.parse_table_policies(['audit_*=append', 'a=b=upsert']) == [('audit_*', 'append'), ('a=b', 'upsert')]
+
+@pytest.mark.parametrize('value', ['audit_*', '=append', 'audit_*=merge', 'audit_*='])
+def test_parse_table_policies_rejects_bad_values(sqlite2mysql, value):
+    with pytest.raises(ValueError, match='Invalid table policy'):
+        sqlite2mysql.parse_table_policies([value])
+
+def test_get_table_policy(sqlite2mysql):
+    table_policies = [('audit_*', 'append'), ('audit_log', 'skip'), ('dim_?', 'upsert')]
+    # The first matching pattern wins, and patterns are case sensitive
+    assert sqlite2mysql.get_table_policy('audit_log', 'ask', table_policies) == 'append'
+    assert sqlite2mysql.get_table_policy('dim_a', 'ask', table_policies) == 'upsert'
+    assert sqlite2mysql.get_table_policy('dim_ab', 'replace', table_policies) == 'replace'
+    assert sqlite2mysql.get_table_policy('AUDIT_log', 'ask', table_policies) == 'ask'
+    assert sqlite2mysql.get_table_policy('orders') == 'ask'
+
+def test_load_policy_file(sqlite2mysql, tmp_path):
+    path = tmp_path / 'policies.json'
+    path.write_text(json.dumps({'database': 'append', 'default': 'skip', 'tables': {'audit_*': 'append', 'dim_*': 'upsert'}}))
+    assert sqlite2mysql.load_policy_file(str(path)) == ('append', 'skip', [('audit_*', 'append'), ('dim_*', 'upsert')])
+
+    # Missing entries are left to the command line
+    path.write_text('{}')
+    assert sqlite2mysql.load_policy_file(str(path)) == (None, None, [])
+
+@pytest.mark.parametrize('config, message', [({'database': 'merge'}, 'Invalid database policy'), ({'default': 'merge'}, 'Invalid default policy'),
+                                             ({'tables': {'audit_*': 'merge'}}, 'Invalid table policy')])
+def test_load_policy_file_rejects_bad_policies(sqlite2mysql, tmp_path, config, message):
+    path = tmp_path / 'policies.json'
+    path.write_text(json.dumps(config))
+    with pytest.raises(ValueError, match=message):
+        sqlite2mysql.load_policy_file(str(path))
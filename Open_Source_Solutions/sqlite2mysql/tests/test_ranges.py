@@ -0,0 +1,13 @@
+def test_split_key_range_minmax_covers_the_keys(sqlite2mysql, sqlite_conn):
+    ranges = sqlite2mysql.split_key_range(sqlite_conn.cursor(), 'events', 'id', 1, 100, 4)
+    assert ranges == [(1, 26), (26, 51), (51, 76), (76, 101)]
+    # More partitions than keys: duplicate boundaries are dropped, no range is empty
+    assert sqlite2mysql.split_key_range(sqlite_conn.cursor(), 'events', 'id', 5, 6, 4) == [(5, 6), (6, 7)]
+
+def test_split_key_range_quantile_follows_sparse_keys(sqlite2mysql, sqlite_conn):
+    sqlite_conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY)")
+    keys = list(range(1, 7)) + [1000, 2000]
+    sqlite_conn.executemany("INSERT INTO events VALUES (?)", [(key,) for key in keys])
+    ranges = sqlite2mysql.split_key_range(sqlite_conn.cursor(), 'events', 'id', 1, 2000, 2, split='quantile')
+    assert ranges == [(1, 5), (5, 2001)]
+    assert sum(1 for key in keys for low, high in ranges if low <= key < high) == len(keys)
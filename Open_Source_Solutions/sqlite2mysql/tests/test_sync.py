@@ -0,0 +1,50 @@
+import pytest
+
+@pytest.fixture
+def catalog(sqlite2mysql, sqlite_conn):
+    sqlite_conn.execute("CREATE TABLE orders (region INTEGER, number INTEGER, total REAL, PRIMARY KEY (region, number))")
+    return sqlite2mysql.read_sqlite_catalog(sqlite_conn)
+
+def test_has_upsert_key_finds_a_key_on_sqlite_columns(sqlite2mysql, catalog, mysql_cursor):
+    # SHOW KEYS rows: (Table, Non_unique, Key_name, Seq_in_index, Column_name)
+    mysql_cursor.results = [[('orders', 0, 'PRIMARY', 1, 'region'), ('orders', 0, 'PRIMARY', 2, 'number')]]
+    assert sqlite2mysql.has_upsert_key(catalog, mysql_cursor, 'orders')
+    assert mysql_cursor.queries == ["SHOW KEYS FROM orders WHERE Non_unique = 0"]
+
+def test_has_upsert_key_never_adds_a_key(sqlite2mysql, catalog, mysql_cursor):
+    mysql_cursor.results = [[]]
+    assert not sqlite2mysql.has_upsert_key(catalog, mysql_cursor, 'orders')
+    assert len(mysql_cursor.queries) == 1
+
+def test_has_upsert_key_ignores_keys_on_other_columns(sqlite2mysql, catalog, mysql_cursor):
+    # A key on a column that only exists in MySQL never matches the copied rows
+    mysql_cursor.results = [[('orders', 0, 'PRIMARY', 1, 'id'), ('orders', 0, 'by_number', 1, 'region'), ('orders', 0, 'by_number', 2, 'extra')]]
+    assert not sqlite2mysql.has_upsert_key(catalog, mysql_cursor, 'orders')
+    mysql_cursor.results = [[('orders', 0, 'PRIMARY', 1, 'id'), ('orders', 0, 'by_number', 1, 'Number')]]
+    assert sqlite2mysql.has_upsert_key(catalog, mysql_cursor, 'orders')
+
+class FakeConnection:
+    def commit(self):
+        pass
+
+def test_rows_with_a_null_sync_column_are_synced_every_time(sqlite2mysql, sqlite_conn, mysql_cursor):
+    sqlite_conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, name TEXT, updated_at TEXT)")
+    sqlite_conn.executemany("INSERT INTO events VALUES (?, ?, ?)", [(1, 'a', None), (2, 'b', '2024-01-01'), (3, 'c', '2024-01-02'), (4, 'd', '2024-01-03')])
+    catalog = sqlite2mysql.read_sqlite_catalog(sqlite_conn)
+    # A primary key in MySQL, and the mark of the last sync
+    mysql_cursor.results = [[('events', 0, 'PRIMARY', 1, 'id')], ('updated_at', '"2024-01-02"', 3)]
+    synced = sqlite2mysql.sync_table(sqlite_conn, FakeConnection(), mysql_cursor, catalog, 'events', {'': 'updated_at'}, True)
+
+    # The row with a NULL is upserted again along with the rows at and past the mark
+    assert synced == 3
+    insert = mysql_cursor.queries.index(next(query for query in mysql_cursor.queries if query.startswith("INSERT INTO events")))
+    assert [row[0] for row in mysql_cursor.params[insert]] == [1, 3, 4]
+    # and doesn't move the mark
+    assert mysql_cursor.params[-1][:3] == ('events', 'updated_at', '"2024-01-03"')
+
+def test_rows_with_a_null_key_are_only_read_with_nulls(sqlite2mysql, sqlite_conn):
+    sqlite_conn.execute("CREATE TABLE events (id INTEGER PRIMARY KEY, updated_at TEXT)")
+    sqlite_conn.executemany("INSERT INTO events VALUES (?, ?)", [(1, '2024-01-01'), (2, None), (3, '2024-01-02')])
+    for with_nulls, expected in [(False, [3]), (True, [2, 3])]:
+        rows = sqlite2mysql.iter_sqlite_rows_after(sqlite_conn, 'events', 'updated_at', '2024-01-02', inclusive=True, with_nulls=with_nulls)
+        assert [row[1] for chunk in rows for row in chunk] == expected
@@ -0,0 +1,68 @@
+"""
+Keep the modules shared by the converters identical.
+
+json_store.py, file_batch.py and conversion_cache.py are copied into every converter folder, so each folder can be
+downloaded and run on its own. The copies in cvs2json are the originals: change them there, then run this script to
+copy them to the other folders. With --check nothing is copied, and the script exits with status 1 if a copy differs
+from its original.
+"""
+import argparse
+import filecmp
+import os
+import shutil
+import sys
+
+SOURCE_TOOL = 'cvs2json'
+COPY_TOOLS = ['exl2json', 'xml2json', 'file2Base64']
+SHARED_MODULES = ['json_store.py', 'file_batch.py', 'conversion_cache.py']
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def find_diverged_copies(base_dir=BASE_DIR):
+    """
+    Compare every copy of the shared modules with its original.
+
+    Parameters:
+    - base_dir (str, optional): The folder holding the converter folders. Defaults to the folder of this script.
+
+    Returns:
+    - list of str: Paths of the copies that are missing or differ from the original, relative to base_dir.
+    """
+    diverged = []
+    for tool in COPY_TOOLS:
+        for module in SHARED_MODULES:
+            copy_path = os.path.join(base_dir, tool, module)
+            if not os.path.exists(copy_path) or not filecmp.cmp(os.path.join(base_dir, SOURCE_TOOL, module), copy_path, shallow=False):
+                diverged.append(os.path.join(tool, module))
+    return diverged
+
+def copy_shared_modules(base_dir=BASE_DIR):
+    """
+    Copy the original shared modules over the copies that differ.
+
+    Parameters:
+    - base_dir (str, optional): The folder holding the converter folders. Defaults to the folder of this script.
+
+    Returns:
+    - list of str: Paths of the copies that were replaced, relative to base_dir.
+    """
+    diverged = find_diverged_copies(base_dir)
+    for path in diverged:
+        tool, module = os.path.split(path)
+        shutil.copyfile(os.path.join(base_dir, SOURCE_TOOL, module), os.path.join(base_dir, path))
+    return diverged
+
+def main():
+    parser = argparse.ArgumentParser(description=f"Copy the shared modules of {SOURCE_TOOL} to the other converters.")
+    parser.add_argument('--check', action='store_true', help='Only report the copies that differ, and exit with status 1 if there are any.')
+    args = parser.parse_args()
+
+    if args.check:
+        diverged = find_diverged_copies()
+        for path in diverged:
+            print(f"{path} differs from {SOURCE_TOOL}/{os.path.basename(path)}")
+        sys.exit(1 if diverged else 0)
+    for path in copy_shared_modules():
+        print(f"Updated {path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+import glob
+import os
+import pickle
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+# Marks the end of an iterator
+STOP = object()
+
+def expand_input_paths(paths, extensions):
+    """
+    Expand directories and glob patterns in a list of input paths.
+
+    Parameters:
+    - paths (list of str): File paths, directories and glob patterns such as 'drops/*.csv' or 'drops/**/*.csv'.
+    - extensions (list of str or None): File extensions picked from directories, such as ['.csv']. None picks every file.
+
+    Returns:
+    - list of str: The input files in order, each listed once. Directories and patterns are expanded in sorted order.
+      A pattern that matches nothing is kept, so it is reported as a missing file.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            matches = sorted(os.path.join(path, name) for name in os.listdir(path)
+                             if (extensions is None or os.path.splitext(name)[1].lower() in extensions) and os.path.isfile(os.path.join(path, name)))
+        elif any(char in path for char in '*?['):
+            matches = sorted(glob.glob(path, recursive=True)) or [path]
+        else:
+            matches = [path]
+        files.extend(match for match in matches if match not in files)
+    return files
+
+def convert_file_to_spool(convert_file, spool_dir, path):
+    """
+    Convert one file in a worker process, writing its items to a temporary file as they are converted.
+
+    Neither the worker nor the main process holds the items of the whole file in memory.
+
+    Parameters:
+    - convert_file (callable): Function that takes a file path and yields its items.
+    - spool_dir (str): Directory where the temporary file is created.
+    - path (str): The file to convert.
+
+    Returns:
+    - str: Path of the temporary file, read back with read_spooled_items. Nothing is left when the conversion fails.
+    """
+    handle, spool_path = tempfile.mkstemp(suffix='.items', dir=spool_dir)
+    try:
+        with open(handle, 'wb') as spool:
+            for item in convert_file(path):
+                pickle.dump(item, spool, pickle.HIGHEST_PROTOCOL)
+    except BaseException:
+        os.remove(spool_path)
+        raise
+    return spool_path
+
+def read_spooled_items(spool_path):
+    """
+    Read back the items written by convert_file_to_spool, one at a time, and remove the file.
+
+    Parameters:
+    - spool_path (str): Path of the temporary file.
+
+    Yields:
+    - The items, in the order they were written.
+    """
+    try:
+        with open(spool_path, 'rb') as spool:
+            while True:
+                try:
+                    item = pickle.load(spool)
+                except EOFError:
+                    return
+                yield item
+    finally:
+        os.remove(spool_path)
+
+def iter_converted_files(paths, convert_file, jobs=1, errors=None, with_paths=False):
+    """
+    Convert files and yield their items in input order.
+
+    With one job the items are streamed straight from convert_file. With more jobs the files are converted in a
+    process pool; a few files per job are converted ahead into temporary files, and their items are read back and
+    yielded in input order.
+
+    Parameters:
+    - paths (list of str): The files to convert.
+    - convert_file (callable): Module-level function that takes a file path and yields its items.
+    - jobs (int, optional): Number of worker processes. Defaults to 1.
+    - errors (list, optional): (path, message) is appended to this list for every file that fails.
+    - with_paths (bool, optional): Yield (path, item) instead of the item alone. Defaults to False.
+
+    Yields:
+    - The items of every file that could be converted.
+    """
+    errors = errors if errors is not None else []
+    if jobs <= 1:
+        for path in paths:
+            converted = 0
+            try:
+                for item in convert_file(path):
+                    yield (path, item) if with_paths else item
+                    converted += 1
+            except Exception as e:
+                errors.append((path, f"{e} (after {converted} items)" if converted else str(e)))
+        return
+
+    spool_dir = tempfile.mkdtemp(prefix='opendata_')
+    results = map_in_order(partial(convert_file_to_spool, convert_file, spool_dir), paths, jobs)
+    try:
+        for path, spool_path, error in results:
+            if error is not None:
+                errors.append((path, str(error)))
+                continue
+            items = read_spooled_items(spool_path)
+            yield from (((path, item) for item in items) if with_paths else items)
+    finally:
+        # Files converted ahead are not read if the caller stops early
+        results.close()
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+def map_in_order(function, arguments, jobs, weigh=None, max_weight=None):
+    """
+    Call a function on every argument in a process pool and yield the results in input order.
+
+    A few calls per job are run ahead, so the pool stays busy while a result is being used.
+    Arguments are taken from the iterable only as they are needed.
+
+    Parameters:
+    - function (callable): Module-level function taking one argument.
+    - arguments (iterable): The arguments to call it with.
+    - jobs (int): Number of worker processes.
+    - weigh (callable, optional): Gives the weight of an argument, such as the bytes its result holds.
+    - max_weight (int, optional): Calls are run ahead only while their total weight is below this.
+
+    Yields:
+    - tuple: (argument, result, error) for every argument. error is the exception raised by the call, or None.
+    """
+    executor = ProcessPoolExecutor(max_workers=jobs)
+    try:
+        pending = deque()
+        remaining = iter(arguments)
+        in_flight = {'weight': 0}
+
+        def submit_more():
+            while len(pending) < jobs * 2 and (max_weight is None or not pending or in_flight['weight'] < max_weight):
+                argument = next(remaining, STOP)
+                if argument is STOP:
+                    return
+                weight = weigh(argument) if weigh else 0
+                pending.append((argument, weight, executor.submit(function, argument)))
+                in_flight['weight'] += weight
+
+        submit_more()
+        while pending:
+            argument, weight, future = pending.popleft()
+            in_flight['weight'] -= weight
+            # Keep the pool busy while this result is used
+            submit_more()
+            try:
+                result = future.result()
+            except Exception as e:
+                yield argument, None, e
+                continue
+            yield argument, result, None
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+def describe_file_errors(errors, total, kind):
+    """
+    Describe which input files failed.
+
+    Parameters:
+    - errors (list): (path, message) for every file that failed.
+    - total (int): Number of input files.
+    - kind (str): Kind of input file, such as 'CSV'.
+
+    Returns:
+    - str: One line for the failed files, and one line per failed file.
+    """
+    lines = [f"{len(errors)} of {total} {kind} files could not be converted and were left out:"]
+    lines.extend(f"- {path}: {message}" for path, message in errors)
+    return '\n'.join(lines)
@@ -0,0 +1,875 @@
+"""
+Append-in-place storage for the JSON files written by the OpenData Dynamics converters.
+
+A JSON file is kept as one document formatted like json.dump(data, indent=4), or without any whitespace. New items
+are written over the closing brackets of the last array, and a new key over the closing brace of the document,
+instead of rewriting the whole file. To find where those are, the file is scanned without being loaded: an indented
+document for the lines that start its top-level members, a compact one a value at a time. An append reads through
+the file once, but holds no more of it in memory than one item, so memory use does not grow with the file. A
+document in another layout, or whose array is not its last member, is loaded and rewritten once through a temporary
+file, with the array last.
+
+Writers hold an exclusive lock on <file>.lock, so several processes can append to the same file. While a writer
+writes in place, the lock file holds the closing brackets it wrote over; a writer that finds them there, left by one
+that was killed, puts the document back first. The lock file is removed when the write is done.
+
+The chunks written by the append functions can hold CHECKPOINT and ROLLBACK markers. ROLLBACK cuts the output back
+to where it was at the last CHECKPOINT, so the items of an input file that failed part way can be taken out again.
+
+Values are formatted by an encoder from get_json_encoder. It uses orjson or ujson when one is installed and the
+standard library otherwise, and writes either the indented layout above or a compact document without any
+whitespace. Every backend writes ASCII, with the same indentation as json.dump, so a file can be appended to with
+any of them. What they write parses to the same values, but is not always the same text: orjson and ujson write
+some floats differently, such as 1e-7 for 1e-07.
+"""
+import itertools
+import json
+import math
+import mmap
+import os
+import re
+from contextlib import contextmanager
+from json.encoder import encode_basestring_ascii as encode_string
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+INDENT = '    '
+# Written between two items of the array that new items are appended to
+ITEM_SEPARATOR = ',\n' + INDENT * 2
+# Starts the line of a top-level key in the indented layout. JSON strings can't hold a raw newline and deeper lines
+# are indented further, so it is found nowhere else.
+MEMBER_START = ('\n' + INDENT + '"').encode('ascii')
+# Text decoded at a time when scanning a compact document
+SCAN_WINDOW = 1024 * 1024
+DECODER = json.JSONDecoder()
+# JSON backends, fastest first. 'json' is the standard library and is always there.
+JSON_BACKENDS = ['orjson', 'ujson', 'json']
+# Dates are left to the standard library, which reports them, so every backend accepts the same values
+ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS) if orjson else 0
+COMPACT_ENCODER = json.JSONEncoder(separators=(',', ':'))
+NON_ASCII = re.compile(r'[^\x00-\x7f]')
+# Buffer of the files written by this module, so small pieces are written in large blocks
+WRITE_BUFFER_SIZE = 1024 * 1024
+# Items formatted into one chunk by encode_chunks
+CHUNK_ITEMS = 1000
+# Marks the end of an iterator
+STOP = object()
+# Chunks marking where the output of an input file starts, and that it is to be cut back there. Their count is None,
+# so they are passed over by code that only looks at chunks with items.
+CHECKPOINT = ('checkpoint', None)
+ROLLBACK = ('rollback', None)
+
+@contextmanager
+def lock_json_file(json_file_path):
+    """
+    Hold an exclusive lock on the lock file next to a JSON file, and remove the lock file when done.
+
+    A writer that was waiting on a lock file that has since been removed finds it is no longer the file at that
+    path, and locks a new one. A restore point found in the lock file was left by a writer that was killed while
+    writing in place, and the JSON file is put back from it first.
+
+    Parameters:
+    - json_file_path (str): Path to the JSON file.
+
+    Yields:
+    - file: The lock file, opened in binary mode, for save_restore_point.
+    """
+    lock_path = json_file_path + '.lock'
+    while True:
+        lock_file = open(lock_path, 'a+b')
+        if fcntl:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        else:
+            lock_file.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass  # LK_LOCK gives up after 10 seconds; keep waiting
+        try:
+            if os.path.samestat(os.fstat(lock_file.fileno()), os.stat(lock_path)):
+                break
+        except FileNotFoundError:
+            pass
+        lock_file.close()
+    try:
+        lock_file.seek(0)
+        restore_point = lock_file.read()
+        if restore_point:
+            restore_json_file(json_file_path, restore_point)
+            clear_restore_point(lock_file)
+        yield lock_file
+    finally:
+        if fcntl:
+            # Removed while still locked, so no one can lock it after it is gone
+            os.remove(lock_path)
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+            lock_file.close()
+        else:
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            lock_file.close()
+            try:
+                # Windows can't remove a file another writer has open; it is then removed by that writer
+                os.remove(lock_path)
+            except OSError:
+                pass
+
+def save_restore_point(lock_file, end, trailer):
+    """
+    Record in the lock file how to put the JSON file back, before writing over its end.
+
+    Parameters:
+    - lock_file (file): The lock file from lock_json_file.
+    - end (int): Byte offset the write starts at.
+    - trailer (bytes): What the JSON file holds from there to its end.
+    """
+    lock_file.seek(0)
+    lock_file.truncate()
+    lock_file.write(json.dumps({'end': end, 'trailer': trailer.decode('latin-1')}).encode('ascii'))
+    lock_file.flush()
+    os.fsync(lock_file.fileno())
+
+def clear_restore_point(lock_file):
+    # Forget the restore point once the JSON file is complete again
+    lock_file.seek(0)
+    lock_file.truncate()
+    lock_file.flush()
+    os.fsync(lock_file.fileno())
+
+def restore_json_file(json_file_path, restore_point):
+    """
+    Undo a write that was interrupted, by cutting the JSON file back to where it started and writing back what was there.
+
+    Parameters:
+    - json_file_path (str): Path to the JSON file.
+    - restore_point (bytes): The restore point saved by save_restore_point.
+    """
+    try:
+        restore_point = json.loads(restore_point)
+    except ValueError:
+        return  # The writer stopped while saving it, before touching the JSON file
+    with open(json_file_path, 'r+b') as json_file:
+        json_file.seek(restore_point['end'])
+        json_file.write(restore_point['trailer'].encode('latin-1'))
+        json_file.truncate()
+        json_file.flush()
+        os.fsync(json_file.fileno())
+
+def get_available_json_backends():
+    """
+    List the JSON backends that are installed.
+
+    Returns:
+    - list of str: The names from JSON_BACKENDS that can be used, fastest first.
+    """
+    modules = {'orjson': orjson, 'ujson': ujson, 'json': json}
+    return [name for name in JSON_BACKENDS if modules[name] is not None]
+
+def get_json_encoder(backend=None, compact=False):
+    """
+    Choose how values are formatted for a JSON file.
+
+    Parameters:
+    - backend (str, optional): 'orjson', 'ujson' or 'json'. Defaults to the fastest one installed; 'auto' does the same.
+      ujson is preferred for indented output, as orjson only indents by 2 spaces and its text has to be re-indented.
+    - compact (bool, optional): Write the document without indentation or spaces. Defaults to False, the layout
+      of json.dump with indent=4.
+
+    Returns:
+    - dict: The encoder, passed to the functions of this module. It can be sent to worker processes.
+    """
+    available = get_available_json_backends()
+    if backend in (None, 'auto'):
+        backend = 'ujson' if not compact and 'ujson' in available else available[0]
+    elif backend not in available:
+        raise ValueError(f"The JSON backend '{backend}' is not installed. Use one of: {', '.join(available)}.")
+    return {'backend': backend, 'compact': compact}
+
+# Used when no encoder is given: the standard library and json.dump's indentation
+DEFAULT_ENCODER = {'backend': 'json', 'compact': False}
+
+def get_layout(encoder=None):
+    """
+    Give the whitespace around the members and items of the document.
+
+    Parameters:
+    - encoder (dict, optional): The encoder from get_json_encoder.
+
+    Returns:
+    - dict: 'member' and 'item' go before every member and array item, 'colon' after every key, 'array_end'
+      before the "]" of a non-empty array and 'end' before the final "}" of a non-empty document.
+    """
+    if encoder and encoder['compact']:
+        return {'member': '', 'colon': ':', 'item': '', 'array_end': '', 'end': ''}
+    return {'member': '\n' + INDENT, 'colon': ': ', 'item': '\n' + INDENT * 2, 'array_end': '\n' + INDENT, 'end': '\n'}
+
+def get_item_separator(encoder=None):
+    """
+    Give the text written between two items of the array that new items are appended to.
+
+    Parameters:
+    - encoder (dict, optional): The encoder from get_json_encoder.
+
+    Returns:
+    - str: ITEM_SEPARATOR, or ',' for a compact document.
+    """
+    return ',' + get_layout(encoder)['item']
+
+def escape_character(match):
+    code = ord(match.group())
+    if code > 0xFFFF:
+        # Outside the Basic Multilingual Plane; written as a surrogate pair, as json does
+        code -= 0x10000
+        return '\\u{0:04x}\\u{1:04x}'.format(0xD800 | (code >> 10), 0xDC00 | (code & 0x3FF))
+    return '\\u{0:04x}'.format(code)
+
+def double_indent(text):
+    """
+    Turn JSON indented by 2 spaces, as orjson writes it, into JSON indented by 4 spaces.
+
+    JSON strings can't hold a raw newline, so every newline is followed by indentation only. Lines are replaced
+    from the deepest level up, each level with a placeholder that can't appear in JSON, so every pass is one
+    str.replace over the text.
+
+    Parameters:
+    - text (str): The JSON text.
+
+    Returns:
+    - str: The same JSON indented by 4 spaces.
+    """
+    depth = 0
+    while '\n' + '  ' * (depth + 1) in text:
+        depth += 1
+    for level in range(depth, 0, -1):
+        text = text.replace('\n' + '  ' * level, '\n' + '\0' * level)
+    return text.replace('\0', INDENT)
+
+def has_non_finite_float(value):
+    # True if the value holds infinity or NaN, which orjson writes as null
+    if isinstance(value, float):
+        return not math.isfinite(value)
+    if isinstance(value, dict):
+        return any(has_non_finite_float(item) for item in itertools.chain(value, value.values()))
+    if isinstance(value, (list, tuple)):
+        return any(has_non_finite_float(item) for item in value)
+    return False
+
+def dump_json(value, backend='json', indent=False):
+    """
+    Format a value with a JSON backend.
+
+    A value the backend can't write, such as an integer too large for orjson, is formatted by the standard
+    library, which reports the values no backend can write. So is a value holding infinity or NaN, which orjson
+    would write as null. The text parses to the same value with every backend, but floats are not always written
+    the same way.
+
+    Parameters:
+    - value: The value to format.
+    - backend (str, optional): 'orjson', 'ujson' or 'json'. Defaults to 'json'.
+    - indent (bool, optional): Indent by 4 spaces, like json.dumps(value, indent=4). Defaults to False, no whitespace.
+
+    Returns:
+    - str: The JSON text, in ASCII.
+    """
+    try:
+        if backend == 'orjson':
+            text = orjson.dumps(value, option=ORJSON_OPTIONS | (orjson.OPT_INDENT_2 if indent else 0)).decode('utf-8')
+            if 'null' not in text or not has_non_finite_float(value):
+                if indent:
+                    text = double_indent(text)
+                return text if text.isascii() else NON_ASCII.sub(escape_character, text)
+        if backend == 'ujson':
+            return ujson.dumps(value, indent=4 if indent else 0, ensure_ascii=True, escape_forward_slashes=False)
+    except (TypeError, ValueError, OverflowError):
+        pass
+    if indent:
+        return json.dumps(value, indent=4)
+    return COMPACT_ENCODER.encode(value)
+
+def format_json_value(value, indent_level, encoder=None):
+    """
+    Format a value the way json.dump with indent=4 would at the given nesting level, or without any whitespace if
+    the encoder is compact.
+
+    With the standard library, flat dicts of strings, such as CSV rows, are formatted directly instead of going
+    through json's slower indenting encoder.
+
+    Parameters:
+    - value: The value to format.
+    - indent_level (int): Nesting level of the value.
+    - encoder (dict, optional): The encoder from get_json_encoder. Defaults to DEFAULT_ENCODER.
+
+    Returns:
+    - str: The formatted value.
+    """
+    encoder = encoder or DEFAULT_ENCODER
+    if encoder['compact']:
+        return dump_json(value, encoder['backend'])
+    if encoder['backend'] == 'json' and isinstance(value, dict) and value and all(isinstance(name, str) and (item is None or isinstance(item, str)) for name, item in value.items()):
+        padding = '\n' + INDENT * (indent_level + 1)
+        fields = ','.join(padding + encode_string(name) + ': ' + ('null' if item is None else encode_string(item)) for name, item in value.items())
+        return '{' + fields + '\n' + INDENT * indent_level + '}'
+    return dump_json(value, encoder['backend'], indent=True).replace('\n', '\n' + INDENT * indent_level)
+
+def format_json_items(items, indent_level=2, encoder=None):
+    """
+    Format the items of an array, joined the way they are written inside it.
+
+    orjson and ujson format the whole list in one call and the brackets are cut off, which saves a call per item.
+
+    Parameters:
+    - items (list): The items to format.
+    - indent_level (int, optional): Nesting level of the items, at least 1. Defaults to 2, the items of the array
+      that new items are appended to.
+    - encoder (dict, optional): The encoder from get_json_encoder. Defaults to DEFAULT_ENCODER.
+
+    Returns:
+    - str: The formatted items, separated by commas and the layout's whitespace.
+    """
+    encoder = encoder or DEFAULT_ENCODER
+    if encoder['compact'] or encoder['backend'] == 'json' or not items:
+        separator = ',' + ('' if encoder['compact'] else '\n' + INDENT * indent_level)
+        return separator.join(format_json_value(item, indent_level, encoder) for item in items)
+    text = dump_json(list(items), encoder['backend'], indent=True).replace('\n', '\n' + INDENT * (indent_level - 1))
+    # Cut "[\n" and the indentation of the first item, and the "\n" and indentation before "]"
+    return text[2 + len(INDENT) * indent_level:-(2 + len(INDENT) * (indent_level - 1))]
+
+def format_json_lines(items, encoder=None):
+    """
+    Format items as JSON lines, one value per line.
+
+    Lines are written like json.dumps, with a space after commas and colons, or without any space if the
+    encoder is compact.
+
+    Parameters:
+    - items (iterable): The items to format.
+    - encoder (dict, optional): The encoder from get_json_encoder. Defaults to DEFAULT_ENCODER.
+
+    Returns:
+    - str: Every item followed by a newline.
+    """
+    encoder = encoder or DEFAULT_ENCODER
+    if encoder['compact']:
+        return ''.join(dump_json(item, encoder['backend']) + '\n' for item in items)
+    return ''.join(json.dumps(item) + '\n' for item in items)
+
+
+def read_json_string(document, start):
+    """
+    Decode the JSON string that starts at an offset of a document, reading no further than its closing quote.
+
+    Parameters:
+    - document (mmap): The document.
+    - start (int): Byte offset of the opening quote.
+
+    Returns:
+    - tuple: (the string, the byte offset after the closing quote).
+    """
+    end = start
+    while True:
+        end = document.find(b'"', end + 1)
+        if end < 0:
+            raise ValueError('Unterminated string.')
+        # A quote after an odd number of backslashes is escaped
+        backslashes = 0
+        while document[end - 1 - backslashes] == ord('\\'):
+            backslashes += 1
+        if backslashes % 2 == 0:
+            return json.loads(document[start:end + 1]), end + 1
+
+def scan_indented_document(document):
+    # Find the members of a document in the indented layout from the lines they start on
+    size = len(document)
+    description = {'keys': [], 'members_end': size - 2, 'array_key': None, 'items_end': None, 'items': 0}
+    if size == 2 and document[:] == b'{}':
+        description['members_end'] = 1
+        return description
+    if document[:len(MEMBER_START) + 1] != b'{' + MEMBER_START or document[size - 2:] != b'\n}':
+        return None
+
+    position = 0
+    while True:
+        position = document.find(MEMBER_START, position)
+        if position < 0:
+            break
+        key, position = read_json_string(document, position + len(MEMBER_START) - 1)
+        if document[position:position + 2] != b': ':
+            return None
+        description['keys'].append(key)
+        value_start = position + 2
+
+    if document[value_start:value_start + 1] == b'[':
+        array_trailer = get_array_trailer(1, get_layout()).encode('ascii')
+        if value_start == size - 4 and document[value_start:] == b'[]\n}':
+            description.update(array_key=key, items_end=value_start + 1)
+        elif document[size - len(array_trailer):] == array_trailer:
+            description.update(array_key=key, items_end=size - len(array_trailer), items=1)
+        else:
+            return None
+    return description
+
+def read_window(document, window, position, size):
+    # Decode the text of a document from position on, unless the window already holds size characters from there
+    window_end = window['start'] + len(window['text'])
+    if position < window['start'] or (position + size > window_end and window_end < len(document)):
+        window['start'] = position
+        window['text'] = document[position:position + max(size, SCAN_WINDOW)].decode('ascii')
+    return position - window['start']
+
+def read_character(document, window, position):
+    offset = read_window(document, window, position, 1)
+    return window['text'][offset:offset + 1]
+
+def decode_json_value(document, window, position):
+    """
+    Decode the JSON value that starts at an offset of a compact document, growing the window until it holds it.
+
+    Parameters:
+    - document (mmap): The document.
+    - window (dict): 'start' and 'text' of the decoded text kept between calls.
+    - position (int): Byte offset of the value.
+
+    Returns:
+    - tuple: (the value, the byte offset after it).
+    """
+    size = 0
+    while True:
+        offset = read_window(document, window, position, size)
+        text = window['text']
+        at_end = window['start'] + len(text) >= len(document)
+        try:
+            value, end = DECODER.raw_decode(text, offset)
+            # A number cut off by the end of the window still decodes, so the value has to be followed by something
+            if end < len(text) or at_end:
+                return value, window['start'] + end
+        except ValueError:
+            if at_end:
+                raise
+        size = 2 * (len(text) - offset) + 1
+
+def scan_compact_document(document):
+    # Find the members of a compact document by decoding it a value at a time, and an array an item at a time
+    size = len(document)
+    window = {'start': 0, 'text': ''}
+    description = {'keys': [], 'members_end': size - 1, 'array_key': None, 'items_end': None, 'items': 0}
+    if read_character(document, window, 0) != '{':
+        return None
+    if read_character(document, window, 1) == '}':
+        return description if size == 2 else None
+
+    position = 1
+    while True:
+        if read_character(document, window, position) != '"':
+            return None
+        key, position = decode_json_value(document, window, position)
+        if read_character(document, window, position) != ':':
+            return None
+        description['keys'].append(key)
+        description.update(array_key=None, items_end=None, items=0)
+        position += 1
+        if read_character(document, window, position) == '[':
+            items = 0
+            position += 1
+            if read_character(document, window, position) != ']':
+                while True:
+                    position = decode_json_value(document, window, position)[1]
+                    items += 1
+                    separator = read_character(document, window, position)
+                    if separator == ']':
+                        break
+                    if separator != ',':
+                        return None
+                    position += 1
+            description.update(array_key=key, items_end=position, items=items)
+            position += 1
+        else:
+            position = decode_json_value(document, window, position)[1]
+
+        separator = read_character(document, window, position)
+        position += 1
+        if separator == '}':
+            return description if position == size else None
+        if separator != ',':
+            return None
+
+def scan_json_document(json_file_path, encoder=None):
+    """
+    Find the top-level keys of a JSON file and where new data goes, without loading the document.
+
+    Parameters:
+    - json_file_path (str): Path to the JSON file.
+    - encoder (dict, optional): The encoder from get_json_encoder. Only a document in its layout is scanned.
+      Defaults to DEFAULT_ENCODER.
+
+    Returns:
+    - dict or None: 'keys' lists the top-level keys and 'members_end' is the byte offset where a new member goes.
+      When the last member is an array, 'array_key' is its key, 'items_end' the offset where new items go and
+      'items' the number of items in it, or 1 if it is only known not to be empty. None if there is no file, or it
+      is not a document in the layout of the encoder.
+    """
+    try:
+        with open(json_file_path, 'rb') as json_file, mmap.mmap(json_file.fileno(), 0, access=mmap.ACCESS_READ) as document:
+            if encoder and encoder['compact']:
+                return scan_compact_document(document)
+            return scan_indented_document(document)
+    except (OSError, ValueError):
+        # ValueError covers an empty file, which can't be mapped, and text that isn't JSON
+        return None
+
+def load_json_document(json_file_path):
+    """
+    Load the whole JSON document.
+
+    Parameters:
+    - json_file_path (str): Path to the JSON file.
+
+    Returns:
+    - dict: The data in the JSON file, or an empty dict if there is no file.
+    """
+    if not os.path.exists(json_file_path):
+        return {}
+    with open(json_file_path, 'r') as json_file:
+        return json.load(json_file)
+
+def encode_items(items, encoder=None):
+    """
+    Format items for the array that new items are appended to.
+
+    Parameters:
+    - items (iterable): The items to format.
+    - encoder (dict, optional): The encoder from get_json_encoder. Defaults to DEFAULT_ENCODER.
+
+    Yields:
+    - tuple: (text, 1) for every item, the form taken by append_encoded_items.
+    """
+    for item in items:
+        yield format_json_value(item, 2, encoder), 1
+
+def encode_chunks(items, lines=False, encoder=None):
+    """
+    Format items in chunks of CHUNK_ITEMS, so they can be formatted in one place and written in another.
+
+    Parameters:
+    - items (iterable): The items to format.
+    - lines (bool, optional): Format them as JSON lines instead of items of an array. Defaults to False.
+    - encoder (dict, optional): The encoder from get_json_encoder. Defaults to DEFAULT_ENCODER.
+
+    Yields:
+    - tuple: (text, count) for every chunk, as taken by append_encoded_items, or append_encoded_lines if lines.
+    """
+    items = iter(items)
+    while True:
+        chunk = list(itertools.islice(items, CHUNK_ITEMS))
+        if not chunk:
+            return
+        if lines:
+            yield format_json_lines(chunk, encoder), len(chunk)
+        else:
+            yield format_json_items(chunk, 2, encoder), len(chunk)
+
+def write_items(json_file, chunks, layout, items=0):
+    """
+    Write chunks of formatted items into the array that the file is positioned in.
+
+    Parameters:
+    - json_file (file): The JSON file, opened in binary mode and positioned where the next item goes.
+    - chunks (iterable of tuple): (text, count) chunks of formatted items, and CHECKPOINT and ROLLBACK markers.
+    - layout (dict): The layout from get_layout.
+    - items (int, optional): Number of items already in the array. Defaults to 0.
+
+    Returns:
+    - int: The number of items in the array. The file is positioned after the last one.
+    """
+    checkpoint = (json_file.tell(), items)
+    for chunk in chunks:
+        if chunk is CHECKPOINT:
+            checkpoint = (json_file.tell(), items)
+        elif chunk is ROLLBACK:
+            # What was written past the checkpoint is overwritten, and the rest cut off when the file is truncated
+            json_file.seek(checkpoint[0])
+            items = checkpoint[1]
+        elif chunk[1]:
+            json_file.write(((',' if items else '') + layout['item'] + chunk[0]).encode('ascii'))
+            items += chunk[1]
+    return items
+
+def get_array_trailer(items, layout):
+    # The closing brackets after the array written last, as json.dump writes them
+    return (layout['array_end'] + ']' + layout['end'] + '}') if items else (']' + layout['end'] + '}')
+
+
+def rewrite_json_document(json_file_path, data, last_key=None, new_chunks=(), encoder=None):
+    """
+    Rewrite the whole JSON document through a temporary file.
+
+    The member under last_key is written last, so later appends to it can be done in place.
+
+    Parameters:
+    - json_file_path (str): Path to the JSON file.
+    - data (dict): The document to write.
+    - last_key (str, optional): Key of the array written last. new_chunks are added to it.
+    - new_chunks (iterable, optional): (text, count) chunks of formatted items added to the end of the array under
+      last_key as they are produced, and CHECKPOINT and ROLLBACK markers. See append_encoded_items.
+    - encoder (dict, optional): The encoder from get_json_encoder, used for the data already in the document.
+      Defaults to DEFAULT_ENCODER.
+
+    Returns:
+    - int: The number of new items written.
+    """
+    layout = get_layout(encoder)
+    keys = [name for name in data if name != last_key]
+    temp_path = json_file_path + '.tmp'
+    written = 0
+    with open(temp_path, 'wb', buffering=WRITE_BUFFER_SIZE) as json_file:
+        json_file.write(b'{')
+        for position, name in enumerate(keys):
+            json_file.write(((',' if position else '') + layout['member'] + json.dumps(name) + layout['colon'] + format_json_value(data[name], 1, encoder)).encode('ascii'))
+
+        if last_key is None:
+            trailer = (layout['end'] + '}') if keys else '}'
+        else:
+            json_file.write(((',' if keys else '') + layout['member'] + json.dumps(last_key) + layout['colon'] + '[').encode('ascii'))
+            existing = encode_chunks(data.get(last_key, []), encoder=encoder)
+            items = write_items(json_file, itertools.chain(existing, new_chunks), layout)
+            written = items - len(data.get(last_key, []))
+            trailer = get_array_trailer(items, layout)
+        json_file.write(trailer.encode('ascii'))
+        json_file.truncate()
+        json_file.flush()
+        os.fsync(json_file.fileno())
+    os.replace(temp_path, json_file_path)
+    return written
+
+def write_in_place(json_file_path, lock_file, offset, write_content):
+    """
+    Write new content at an offset of the JSON file, over the closing brackets there, then the new closing brackets.
+
+    What was written over is kept as a restore point in the lock file until the write is done. If writing fails part
+    way, the file is put back as it was before; if the writer is killed, the next writer does that.
+
+    Parameters:
+    - json_file_path (str): Path to the JSON file.
+    - lock_file (file): The lock file from lock_json_file.
+    - offset (int): Byte offset where the new content goes.
+    - write_content (callable): Takes the file, opened in binary mode and positioned at offset, writes the new
+      content and returns the closing brackets to write after it.
+    """
+    with open(json_file_path, 'r+b', buffering=WRITE_BUFFER_SIZE) as json_file:
+        json_file.seek(offset)
+        old_trailer = json_file.read()
+        save_restore_point(lock_file, offset, old_trailer)
+        json_file.seek(offset)
+        try:
+            trailer = write_content(json_file)
+            json_file.write(trailer.encode('ascii'))
+            json_file.truncate()
+            json_file.flush()
+            os.fsync(json_file.fileno())
+        except BaseException:
+            json_file.seek(offset)
+            json_file.write(old_trailer)
+            json_file.truncate()
+            json_file.flush()
+            clear_restore_point(lock_file)
+            raise
+    clear_restore_point(lock_file)
+
+def append_json_items(json_file_path, key, items, encoder=None):
+    """
+    Append items to the array under a key of a JSON file, creating the file or key if needed.
+
+    Parameters:
+    - json_file_path (str): Path to the JSON file.
+    - key (str): The key of the array.
+    - items (iterable): The items to append. They are formatted and written CHUNK_ITEMS at a time.
+    - encoder (dict, optional): The encoder from get_json_encoder. Defaults to DEFAULT_ENCODER.
+
+    Returns:
+    - int: The number of items appended.
+    """
+    return append_encoded_items(json_file_path, key, encode_chunks(items, encoder=encoder), encoder)
+
+def append_encoded_items(json_file_path, key, chunks, encoder=None):
+    """
+    Append items that are already formatted to the array under a key of a JSON file.
+
+    This lets the items be formatted somewhere else, such as in worker processes, and only written here. They are
+    written in place when the array is the last member of the document, or the key is new. Otherwise, or when the
+    file is not in the layout of the encoder, the document is loaded and rewritten once, with the array last.
+
+    Parameters:
+    - json_file_path (str): Path to the JSON file.
+    - key (str): The key of the array.
+    - chunks (iterable of tuple): (text, count) for every chunk of items, where text is count items formatted with
+      format_json_items, or with format_json_value(item, 2, encoder) and joined with get_item_separator(encoder).
+      Chunks are written as they are produced. A ROLLBACK marker cuts the items written since the last CHECKPOINT.
+    - encoder (dict, optional): The encoder the chunks were formatted with. Defaults to DEFAULT_ENCODER.
+
+    Returns:
+    - int: The number of items appended.
+    """
+    with lock_json_file(json_file_path) as lock_file:
+        document = scan_json_document(json_file_path, encoder)
+        if document is None or (key in document['keys'] and document['array_key'] != key):
+            data = load_json_document(json_file_path)
+            if not isinstance(data.get(key, []), list):
+                raise ValueError(f"The value under key '{key}' in {json_file_path} is not a list.")
+            return rewrite_json_document(json_file_path, data, key, chunks, encoder)
+
+        layout = get_layout(encoder)
+        chunks = iter(chunks)
+        if document['array_key'] == key:
+            # Leave the file alone if there is nothing to append
+            markers = []
+            for first_chunk in chunks:
+                if first_chunk[1]:
+                    break
+                markers.append(first_chunk)
+            else:
+                return 0
+            chunks = itertools.chain(markers, [first_chunk], chunks)
+            offset, items, header = document['items_end'], document['items'], ''
+        else:
+            offset, items = document['members_end'], 0
+            header = (',' if document['keys'] else '') + layout['member'] + json.dumps(key) + layout['colon'] + '['
+        counts = {'items': items}
+
+        def write_content(json_file):
+            json_file.write(header.encode('ascii'))
+            counts['items'] = write_items(json_file, chunks, layout, items)
+            return get_array_trailer(counts['items'], layout)
+
+        write_in_place(json_file_path, lock_file, offset, write_content)
+        return counts['items'] - items
+
+def set_json_value(json_file_path, key, value, encoder=None):
+    """
+    Set a key of a JSON file to a value, creating the file if needed.
+
+    A new key is added in place at the end of the document. Replacing an existing key, or setting one in a file
+    that is not in the layout of the encoder, rewrites the file.
+
+    Parameters:
+    - json_file_path (str): Path to the JSON file.
+    - key (str): The key to set.
+    - value: The value to save under the key.
+    - encoder (dict, optional): The encoder from get_json_encoder. Defaults to DEFAULT_ENCODER.
+    """
+    with lock_json_file(json_file_path) as lock_file:
+        document = scan_json_document(json_file_path, encoder)
+        if document is None or key in document['keys']:
+            data = load_json_document(json_file_path)
+            data[key] = value
+            rewrite_json_document(json_file_path, data, encoder=encoder)
+            return
+
+        layout = get_layout(encoder)
+
+        def write_content(json_file):
+            json_file.write(((',' if document['keys'] else '') + layout['member'] + json.dumps(key) + layout['colon'] + format_json_value(value, 1, encoder)).encode('ascii'))
+            return layout['end'] + '}'
+
+        write_in_place(json_file_path, lock_file, document['members_end'], write_content)
+
+def set_json_string(json_file_path, key, chunks, encoder=None):
+    """
+    Set a key of a JSON file to a string that is produced in chunks, creating the file if needed.
+
+    The string is written in place at the end of the document as the chunks come, so it is never held in memory
+    whole. An existing key, or a file that is not in the layout of the encoder, is taken out by rewriting the file
+    first.
+
+    Parameters:
+    - json_file_path (str): Path to the JSON file.
+    - key (str): The key to set.
+    - chunks (iterable of str): The parts of the string, in order. They are escaped as they are written.
+    - encoder (dict, optional): The encoder from get_json_encoder. Defaults to DEFAULT_ENCODER.
+    """
+    with lock_json_file(json_file_path) as lock_file:
+        document = scan_json_document(json_file_path, encoder)
+        if document is None or key in document['keys']:
+            data = load_json_document(json_file_path)
+            data.pop(key, None)
+            rewrite_json_document(json_file_path, data, encoder=encoder)
+            document = scan_json_document(json_file_path, encoder)
+
+        layout = get_layout(encoder)
+
+        def write_content(json_file):
+            json_file.write(((',' if document['keys'] else '') + layout['member'] + json.dumps(key) + layout['colon'] + '"').encode('ascii'))
+            for chunk in chunks:
+                json_file.write(encode_string(chunk)[1:-1].encode('ascii'))
+            return '"' + layout['end'] + '}'
+
+        write_in_place(json_file_path, lock_file, document['members_end'], write_content)
+
+def append_json_lines(json_file_path, items, encoder=None):
+    """
+    Append items to a JSON lines (NDJSON) file, one JSON value per line.
+
+    Parameters:
+    - json_file_path (str): Path to the JSON lines file.
+    - items (iterable): The items to append. They are formatted and written CHUNK_ITEMS at a time.
+    - encoder (dict, optional): The encoder from get_json_encoder. Defaults to DEFAULT_ENCODER.
+
+    Returns:
+    - int: The number of items appended.
+    """
+    return append_encoded_lines(json_file_path, encode_chunks(items, True, encoder))
+
+def append_encoded_lines(json_file_path, chunks):
+    """
+    Append lines that are already formatted to a JSON lines (NDJSON) file.
+
+    If writing fails part way, or the writer is killed, the file is cut back to the lines it had before.
+
+    Parameters:
+    - json_file_path (str): Path to the JSON lines file.
+    - chunks (iterable of tuple): (text, count) for every chunk of lines, where text is count JSON values each
+      followed by a newline. Chunks are written as they are produced. A ROLLBACK marker cuts the lines written since
+      the last CHECKPOINT.
+
+    Returns:
+    - int: The number of lines appended.
+    """
+    written = 0
+    with lock_json_file(json_file_path) as lock_file:
+        with open(json_file_path, 'a', buffering=WRITE_BUFFER_SIZE) as json_file:
+            start = json_file.tell()
+            save_restore_point(lock_file, start, b'')
+            checkpoint = (start, written)
+            try:
+                for chunk in chunks:
+                    if chunk is CHECKPOINT:
+                        checkpoint = (json_file.tell(), written)
+                    elif chunk is ROLLBACK:
+                        # Writes in append mode go to the end of the file, wherever it was cut
+                        json_file.truncate(checkpoint[0])
+                        written = checkpoint[1]
+                    else:
+                        json_file.write(chunk[0])
+                        written += chunk[1]
+                json_file.flush()
+                os.fsync(json_file.fileno())
+            except BaseException:
+                json_file.truncate(start)
+                clear_restore_point(lock_file)
+                raise
+        clear_restore_point(lock_file)
+    return written
@@ -1,69 +1,232 @@
 
 import argparse
-import os
-import json
+import codecs
+import sqlite3
 import xml.etree.ElementTree as ET
+from functools import partial
+from conversion_cache import DEFAULT_CACHE_MB, close_cache, iter_cached_files, open_cache
+from file_batch import describe_file_errors, expand_input_paths, iter_converted_files
+from json_store import JSON_BACKENDS, append_encoded_items, append_encoded_lines, encode_chunks, get_item_separator, get_json_encoder
 
-def xml_to_json(xml_file_paths, json_file_path, encoding='utf-8', key=None):
+# Files picked from input directories
+XML_EXTENSIONS = ['.xml']
+
+def read_xml_record(xml_file_path, encoding=None):
+    """
+    Read one XML file as a record of its root element's children.
+
+    Parameters:
+    - xml_file_path (str): The path to the XML file.
+    - encoding (str, optional): The encoding of the file, used instead of the one it declares. Defaults to the declared one.
+
+    Yields:
+    - dict: The text of each child element, keyed by its tag.
+    """
+    tree = ET.parse(xml_file_path, ET.XMLParser(encoding=encoding))
+    root = tree.getroot()
+    data = {}
+    for elem in root:
+        data[elem.tag] = elem.text
+    yield data
+
+def parse_record_path(record_path):
+    """
+    Split a record path such as '/catalog/item' into its tags.
+
+    Parameters:
+    - record_path (str): Tags from the root element down to the record element, separated by '/'. '*' matches any tag.
+
+    Returns:
+    - list of str: The tags.
+    """
+    tags = [tag for tag in record_path.split('/') if tag]
+    if not tags:
+        raise ValueError(f"The record path '{record_path}' has no tags. Use a path such as /catalog/item.")
+    return tags
+
+def tag_matches(tag, pattern):
+    """
+    Check an element tag against one tag of a record path.
+
+    Parameters:
+    - tag (str): The tag of the element. Tags in a namespace look like '{uri}name'.
+    - pattern (str): The tag from the record path. It can be '*', the tag with its namespace, or the name alone.
+
+    Returns:
+    - bool: True if the tag matches.
+    """
+    return pattern == '*' or tag == pattern or tag.rpartition('}')[2] == pattern
+
+def element_to_value(elem):
+    """
+    Convert an element and everything inside it to a JSON value.
+
+    Attributes are keyed '@name'. Child elements are keyed by tag, and a tag that appears more than once becomes a
+    list in document order. An element with only text becomes its text. Text next to attributes or child
+    elements goes under '#text'.
+
+    Parameters:
+    - elem (xml.etree.ElementTree.Element): The element to convert.
+
+    Returns:
+    - dict, str or None: The converted element.
+    """
+    value = {'@' + name: attribute for name, attribute in elem.attrib.items()}
+    repeated = set()
+    for child in elem:
+        child_value = element_to_value(child)
+        if child.tag not in value:
+            value[child.tag] = child_value
+        elif child.tag in repeated:
+            value[child.tag].append(child_value)
+        else:
+            value[child.tag] = [value[child.tag], child_value]
+            repeated.add(child.tag)
+    if not value:
+        return elem.text
+
+    # Text around the child elements, such as "Hello " and " world" in "Hello <b>you</b> world"
+    texts = [text.strip() for text in [elem.text] + [child.tail for child in elem] if text and text.strip()]
+    if texts:
+        value['#text'] = ' '.join(texts)
+    return value
+
+def iter_xml_records(xml_file_path, record_path, encoding=None):
+    """
+    Stream the records of an XML file.
+
+    The file is read with iterparse. Each element at the record path is converted when its end tag is read, then
+    removed from the tree, so memory use stays the same however large the file is.
+
+    Parameters:
+    - xml_file_path (str): The path to the XML file.
+    - record_path (str): Path of the record elements, such as '/catalog/item'.
+    - encoding (str, optional): The encoding of the file, used instead of the one it declares. Defaults to the declared one.
+
+    Yields:
+    - dict, str or None: Every record element, converted with element_to_value.
+    """
+    tags = parse_record_path(record_path)
+    depth = len(tags)
+    path = []
+    for event, elem in ET.iterparse(xml_file_path, events=('start', 'end'), parser=ET.XMLParser(encoding=encoding)):
+        if event == 'start':
+            path.append(elem)
+            continue
+
+        if len(path) == depth and all(tag_matches(element.tag, tag) for element, tag in zip(path, tags)):
+            yield element_to_value(elem)
+        path.pop()
+        # Elements inside a record are kept until the record ends; everything else is dropped once read
+        if path and len(path) < depth:
+            path[-1].remove(elem)
+
+def encode_xml_file(xml_file_path, record_path=None, output_format='json', encoder=None, encoding=None):
+    """
+    Read the records of one XML file and format them in chunks for the JSON file.
+
+    Parameters:
+    - xml_file_path (str): The path to the XML file.
+    - record_path (str, optional): Path of the record elements, such as '/catalog/item'. Without it the file is one record.
+    - output_format (str, optional): 'json' or 'ndjson'. Defaults to 'json'.
+    - encoder (dict, optional): The JSON encoder from get_json_encoder.
+    - encoding (str, optional): The encoding of the file, used instead of the one it declares. Defaults to the declared one.
+
+    Yields:
+    - tuple: (text, count) for every chunk of records, as taken by append_encoded_items or append_encoded_lines.
+    """
+    records = iter_xml_records(xml_file_path, record_path, encoding) if record_path else read_xml_record(xml_file_path, encoding)
+    yield from encode_chunks(records, output_format == 'ndjson', encoder)
+
+def xml_to_json(xml_file_paths, json_file_path, encoding=None, key=None, *, jobs=1, record_path=None, use_cache=False, cache_dir=None, cache_mb=DEFAULT_CACHE_MB,
+                output_format='json', compact=False, json_backend=None):
     """
     Convert one or multiple XML files to a JSON file.
     
-    If the JSON file already exists, the function appends the new XML data to it.
+    If the JSON file already exists, the function appends the new XML data to it in place, without rewriting the file.
     If a key is specified, the new data will be nested under that key in the JSON file.
+    With more than one job the XML files are parsed in parallel and appended in input order.
+
+    Without a record path, each file gives one record with the text of the root element's children. With a record
+    path, the files are streamed and every element at that path gives one record with all its attributes and
+    child elements.
+
+    With use_cache, XML files converted before with the same record path are copied from the conversion cache instead
+    of being parsed again.
 
     Parameters:
-    - xml_file_paths (list): A list of paths to the XML files that need to be converted.
+    - xml_file_paths (list): A list of paths to the XML files that need to be converted. Directories and glob patterns are expanded.
     - json_file_path (str): The path where the JSON file will be saved or updated.
-    - encoding (str, optional): The encoding used in the XML files. Defaults to 'utf-8'.
+    - encoding (str, optional): The encoding of the XML files, used instead of the one they declare. Defaults to the declared one, or UTF-8 if they declare none.
     - key (str, optional): The key in the JSON file under which the XML data will be saved.
+    - jobs (int, optional): Number of XML files parsed at the same time. Defaults to 1.
+    - record_path (str, optional): Path of the record elements, such as '/catalog/item'.
+    - use_cache (bool, optional): Take unchanged files from the conversion cache and save the others to it. Defaults to False.
+    - cache_dir (str, optional): Directory of the conversion cache. Defaults to get_default_cache_dir('xml2json').
+    - cache_mb (int, optional): Size limit of the conversion cache in megabytes. Defaults to DEFAULT_CACHE_MB.
+    - output_format (str, optional): 'json' for one JSON document, or 'ndjson' to append one JSON object per line. Defaults to 'json'.
+    - compact (bool, optional): Write the JSON without indentation or spaces. Defaults to False.
+    - json_backend (str, optional): 'orjson', 'ujson' or 'json'. Defaults to the fastest one installed.
 
     Returns:
     - str: A message indicating whether the XML files were successfully converted and appended to the JSON file.
     """
-    
-    # Existing JSON data
-    existing_data = {}
-    if os.path.exists(json_file_path):
-        with open(json_file_path, 'r') as json_file:
-            existing_data = json.load(json_file)
-    
-    if key:
-        nested_data = existing_data.get(key, [])
-    else:
-        nested_data = existing_data.get('root', [])
-    
-    for xml_file_path in xml_file_paths:
-        try:
-            # Read XML file
-            tree = ET.parse(xml_file_path)
-            root = tree.getroot()
-            data = {}
-            for elem in root:
-                data[elem.tag] = elem.text
-                
-            nested_data.append(data)
-        except Exception as e:
-            print(f"An error occurred while converting {xml_file_path}: {e}")
-    
-    # Update existing JSON data
-    if key:
-        existing_data[key] = nested_data
-    else:
-        existing_data['root'] = nested_data
-    
-    # Write updated data to JSON file
-    with open(json_file_path, 'w') as json_file:
-        json.dump(existing_data, json_file, indent=4)
+    try:
+        encoder = get_json_encoder(json_backend, compact)
+        if record_path:
+            parse_record_path(record_path)
+        if encoding:
+            codecs.lookup(encoding)
+    except (ValueError, LookupError) as e:
+        return str(e)
 
+    paths = expand_input_paths(xml_file_paths, XML_EXTENSIONS)
+    errors = []
+    encode_file = partial(encode_xml_file, record_path=record_path, output_format=output_format, encoder=encoder, encoding=encoding)
+    convert_paths = partial(iter_converted_files, convert_file=encode_file, jobs=jobs, errors=errors, with_paths=True)
+
+    try:
+        cache = open_cache('xml2json', cache_dir, cache_mb) if use_cache else None
+    except (OSError, sqlite3.Error) as e:
+        return f"Could not open the conversion cache: {e}"
+    try:
+        # Append the records to the JSON file
+        options = {'record_path': record_path, 'format': output_format, 'encoder': encoder, 'encoding': encoding}
+        separator = '' if output_format == 'ndjson' else get_item_separator(encoder)
+        chunks = iter_cached_files(cache, paths, options, convert_paths, separator, errors)
+        if output_format == 'ndjson':
+            append_encoded_lines(json_file_path, chunks)
+        else:
+            append_encoded_items(json_file_path, key if key else 'root', chunks, encoder)
+    finally:
+        close_cache(cache)
+
+    if errors:
+        return describe_file_errors(errors, len(paths), 'XML')
+    if output_format == 'ndjson':
+        return "XML files converted and appended to NDJSON successfully."
     return "XML files converted and appended to JSON successfully."
 
-# Command-line arguments
-parser = argparse.ArgumentParser(description='Convert XML files to JSON.')
-parser.add_argument('--xml_files', type=str, nargs='+', required=True, help='The file paths to the XML files you want to convert.')
-parser.add_argument('--json_file', type=str, required=True, help='The file path where the JSON data will be saved.')
-parser.add_argument('--encoding', type=str, default='utf-8', help='The encoding used in the XML files. Optional.')
-parser.add_argument('--key', type=str, help='The key in the JSON file where the XML data will be saved. Optional.')
-args = parser.parse_args()
+def main():
+    # Command-line arguments
+    parser = argparse.ArgumentParser(description='Convert XML files to JSON.')
+    parser.add_argument('--xml_files', type=str, nargs='+', required=True, help='The file paths to the XML files you want to convert. Directories and glob patterns such as "drops/*.xml" are expanded.')
+    parser.add_argument('--json_file', type=str, required=True, help='The file path where the JSON data will be saved.')
+    parser.add_argument('--encoding', type=str, help='The encoding of the XML files, used instead of the one they declare. Optional.')
+    parser.add_argument('--key', type=str, help='The key in the JSON file where the XML data will be saved. Optional.')
+    parser.add_argument('--jobs', type=int, default=1, help='Number of XML files parsed at the same time. Optional.')
+    parser.add_argument('--record_path', type=str, help='Path of the elements to convert, such as /catalog/item. Each one becomes a record with its attributes and child elements, and files are streamed. Optional.')
+    parser.add_argument('--cache', action='store_true', help='Keep the output of every file in a conversion cache, and copy unchanged files from it instead of converting them again. Optional.')
+    parser.add_argument('--cache_dir', type=str, help='With --cache: directory of the conversion cache. Defaults to ~/.cache/opendata_dynamics/xml2json, or $OPENDATA_CACHE_DIR/xml2json. Optional.')
+    parser.add_argument('--cache_mb', type=int, default=DEFAULT_CACHE_MB, help='With --cache: size limit of the conversion cache in megabytes, 256 by default. The least recently used outputs are removed past it. Optional.')
+    parser.add_argument('--format', type=str, choices=['json', 'ndjson'], default='json', help='Write one JSON document, or append one JSON object per line (the key is not used). Optional.')
+    parser.add_argument('--compact', action='store_true', help='Write the JSON without indentation or spaces. Optional.')
+    parser.add_argument('--json_backend', type=str, choices=['auto'] + JSON_BACKENDS, default='auto', help='JSON encoder. auto uses orjson or ujson when installed, and the standard library otherwise. Optional.')
+    args = parser.parse_args()
+
+    message = xml_to_json(args.xml_files, args.json_file, args.encoding, args.key, jobs=args.jobs, record_path=args.record_path, use_cache=args.cache,
+                          cache_dir=args.cache_dir, cache_mb=args.cache_mb, output_format=args.format, compact=args.compact, json_backend=args.json_backend)
+    print(message)
 
-message = xml_to_json(args.xml_files, args.json_file, args.encoding, args.key)
-print(message)
+if __name__ == "__main__":
+    main()
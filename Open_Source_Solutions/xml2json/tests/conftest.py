@@ -0,0 +1,21 @@
+import importlib.util
+import os
+import sys
+
+import pytest
+
+TOOL_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# The shared modules are imported by name, as main.py imports them
+sys.path.insert(0, TOOL_DIR)
+
+def load_module(name, path):
+    # Loaded under its own name so it can't clash with the main.py of another
+    # tool in the same test run
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+@pytest.fixture(scope='session')
+def xml2json():
+    return load_module('xml2json_main', os.path.join(TOOL_DIR, 'main.py'))
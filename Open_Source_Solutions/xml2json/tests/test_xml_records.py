@@ -0,0 +1,77 @@
+import json
+
+CATALOG = """<?xml version="1.0" encoding="utf-8"?>
+<catalog xmlns:x="urn:extra">
+  <item id="1" lang="en">
+    <name>Lamp</name>
+    <tag>home</tag>
+    <tag>light</tag>
+    <tag>sale</tag>
+    <note>Only <b>today</b> cheaper</note>
+  </item>
+  <skip><item id="0"/></skip>
+  <item id="2"><name>Chair</name><x:price>10</x:price></item>
+</catalog>
+"""
+
+def write_xml(tmp_path, text, name='catalog.xml', encoding='utf-8'):
+    path = tmp_path / name
+    path.write_bytes(text.encode(encoding))
+    return str(path)
+
+def test_records_keep_attributes_children_and_text(xml2json, tmp_path):
+    records = list(xml2json.iter_xml_records(write_xml(tmp_path, CATALOG), '/catalog/item'))
+    assert records[0] == {
+        '@id': '1',
+        '@lang': 'en',
+        'name': 'Lamp',
+        'tag': ['home', 'light', 'sale'],
+        'note': {'b': 'today', '#text': 'Only cheaper'},
+    }
+    # Namespaced tags keep their namespace, and match a path without it
+    assert records[1] == {'@id': '2', 'name': 'Chair', '{urn:extra}price': '10'}
+
+def test_record_path_matches_whole_paths(xml2json, tmp_path):
+    path = write_xml(tmp_path, CATALOG)
+    assert [record['@id'] for record in xml2json.iter_xml_records(path, '/catalog/skip/item')] == ['0']
+    assert [record['@id'] for record in xml2json.iter_xml_records(path, '/*/item')] == ['1', '2']
+    assert list(xml2json.iter_xml_records(path, '/item')) == []
+    assert [record['@id'] for record in xml2json.iter_xml_records(path, 'catalog/item')] == ['1', '2']
+
+def test_processed_records_are_removed_from_the_tree(xml2json, tmp_path, monkeypatch):
+    items = ''.join(f'<item id="{i}"><name>n{i}</name></item>' for i in range(50))
+    path = write_xml(tmp_path, f'<catalog>{items}</catalog>')
+    # Keep the root element the parser builds, to look at what it still holds
+    started = []
+    iterparse = xml2json.ET.iterparse
+    def recording_iterparse(*args, **kwargs):
+        for event, elem in iterparse(*args, **kwargs):
+            if event == 'start':
+                started.append(elem)
+            yield event, elem
+    monkeypatch.setattr(xml2json.ET, 'iterparse', recording_iterparse)
+
+    for i, record in enumerate(xml2json.iter_xml_records(path, '/catalog/item')):
+        assert record == {'@id': str(i), 'name': f'n{i}'}
+        # The parser reads ahead, but every record before this one is gone
+        assert started[0][0].get('id') == str(i)
+    assert i == 49
+    assert len(started[0]) == 0
+
+def test_encoding_replaces_the_declared_one(xml2json, tmp_path):
+    text = '<?xml version="1.0" encoding="utf-8"?><catalog><item>café</item></catalog>'
+    path = write_xml(tmp_path, text, encoding='latin-1')
+    assert list(xml2json.iter_xml_records(path, '/catalog/item', 'latin-1')) == ['café']
+    assert list(xml2json.read_xml_record(path, 'latin-1')) == [{'item': 'café'}]
+
+    declared = write_xml(tmp_path, text.replace('utf-8', 'latin-1'), 'declared.xml', 'latin-1')
+    assert list(xml2json.iter_xml_records(declared, '/catalog/item')) == ['café']
+
+def test_xml_to_json_writes_the_records(xml2json, tmp_path):
+    json_path = str(tmp_path / 'out.json')
+    message = xml2json.xml_to_json([write_xml(tmp_path, CATALOG)], json_path, record_path='/catalog/item', key='items')
+    assert message == "XML files converted and appended to JSON successfully."
+    with open(json_path) as f:
+        assert [record['@id'] for record in json.load(f)['items']] == ['1', '2']
+
+    assert xml2json.xml_to_json([write_xml(tmp_path, CATALOG)], json_path, encoding='no-such-codec') == 'unknown encoding: no-such-codec'